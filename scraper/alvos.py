@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Configuração dos alvos (guild + mundo) trackeados pelos scrapers
+Lê dados/alvos.json e resolve os caminhos de saída de cada alvo
+"""
+import json
+import os
+import re
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+GUILD_PADRAO = "Diehard"
+WORLD_PADRAO = "Luminera"
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DADOS_DIR = os.environ.get('DADOS_DIR') or os.path.join(SCRIPT_DIR, '..', 'dados')
+ALVOS_PATH = os.path.join(DADOS_DIR, 'alvos.json')
+
+# Alvos sem "saida" explícita escrevem em dados/guilds/<slug>/
+GUILDS_DIR = os.path.join(DADOS_DIR, 'guilds')
+
+# ============================================================
+# FUNÇÕES
+# ============================================================
+def slug(texto):
+    """Converte nome de guild/mundo em nome de pasta seguro."""
+    return re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-')
+
+def resolver_alvo(config):
+    """Completa um alvo do alvos.json com diretório de saída e arquivo de extras.
+
+    "saida" é relativo a dados/ ("" = a própria dados/, usado pela Diehard
+    para manter os arquivos que o site já lê). "extras" é relativo à saída.
+    """
+    guild = config['guild']
+    world = config['world']
+
+    saida = config.get('saida')
+    if saida is None:
+        dir_saida = os.path.normpath(os.path.join(GUILDS_DIR, f"{slug(guild)}-{slug(world)}"))
+    else:
+        dir_saida = os.path.normpath(os.path.join(DADOS_DIR, saida))
+
+    extras = config.get('extras', 'extras.json')
+    return {
+        'guild': guild,
+        'world': world,
+        'dir': dir_saida,
+        'extras_path': os.path.join(dir_saida, extras) if extras else None
+    }
+
+def alvo_padrao():
+    """Alvo histórico do projeto (Diehard/Luminera escrevendo em dados/)."""
+    return resolver_alvo({'guild': GUILD_PADRAO, 'world': WORLD_PADRAO, 'saida': ''})
+
+def carregar_alvos(path=ALVOS_PATH):
+    """Carrega a lista de alvos; sem arquivo de configuração usa só o alvo padrão."""
+    if not os.path.exists(path):
+        return [alvo_padrao()]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    alvos = []
+    vistos = set()
+    for config in data.get('alvos', []):
+        if not config.get('guild') or not config.get('world'):
+            continue
+        chave = (config['guild'].lower(), config['world'].lower())
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        alvos.append(resolver_alvo(config))
+    return alvos or [alvo_padrao()]
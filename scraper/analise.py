@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Análise agregada (NumPy)
+Guarda o XP e as mortes de cada dia em xp_historico.json (um retrato por
+linha, sem limite de retenção) e, a partir dele, calcula numa passada só,
+com operações de matriz jogador × dia:
+  - totais e medianas de XP por vocação e por faixa de level;
+  - percentis do XP de quem jogou;
+  - sequência de dias com XP e de dias sem morrer;
+  - mortes por milhão de XP;
+  - variação de posição no ranking de ontem em relação ao dia anterior.
+O resultado vai para analise.json, pronto para o site. NumPy é opcional:
+sem ele só o xp_historico.json é atualizado.
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+import buscar_dados
+import buscar_mortes
+import calendario
+import metricas
+import roster
+from alvos import ALVOS_PATH, carregar_alvos
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+HISTORICO_ARQUIVO = 'xp_historico.json'
+ANALISE_ARQUIVO = 'analise.json'
+# Período -> dias (terminando no dia do XP de "ontem")
+PERIODOS = {'yesterday': 1, '7days': 7, '30days': 30}
+PERCENTIS = (50, 75, 90, 99)
+# Largura das faixas de level (500 -> "500-599")
+FAIXA_LEVEL = 100
+
+def log(msg, icon="ℹ️"):
+    buscar_dados.log(msg, icon)
+
+def _ler_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# ============================================================
+# HISTÓRICO DIÁRIO
+# ============================================================
+def carregar(path):
+    """{'dias': {'AAAA-MM-DD': {nome: [xp, mortes]}}, 'dias_xp': [dias com
+    execução]} (zeros omitidos). Dias só com mortes ficam fora de dias_xp."""
+    historico = _ler_json(path) or {'dias': {}}
+    # Arquivo de antes de dias_xp: todo dia gravado teve execução
+    historico.setdefault('dias_xp', sorted(historico['dias']))
+    return historico
+
+def salvar(historico, path):
+    """Um dia por linha, como o roster_historico.json."""
+    dias = sorted(historico['dias'].items())
+    linhas = [
+        f"    {json.dumps(data)}: {json.dumps(dict(sorted(valores.items())), ensure_ascii=False, separators=(',', ':'))}"
+        for data, valores in dias
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "dias": {\n' + ',\n'.join(linhas) + ('\n' if linhas else '') + '  },\n'
+                f'  "dias_xp": {json.dumps(sorted(historico["dias_xp"]))}\n}}\n')
+
+def registrar(historico, data, xp, mortes):
+    """Grava o XP do dia e refaz a contagem de mortes dos dias cobertos pelo
+    mortes_historico.json, inclusive dos dias sem execução (mortes buscadas
+    com atraso entram no dia certo).
+
+    xp: {nome: xp ganho em `data`}; mortes: mortes do histórico (com 'character').
+    """
+    por_dia = {}
+    for d in mortes:
+        dia = por_dia.setdefault(calendario.dia_da_morte(d), {})
+        dia[d.get('character', '')] = dia.get(d.get('character', ''), 0) + 1
+    primeiro = min(por_dia, default=data)
+
+    dias = historico['dias']
+    dias[data] = {nome: [valor, 0] for nome, valor in xp.items() if valor > 0}
+    medidos = set(historico['dias_xp']) | {data}
+    for dia in por_dia:
+        dias.setdefault(dia, {})
+    for dia, valores in dias.items():
+        if dia < primeiro:
+            continue
+        contagem = por_dia.get(dia, {})
+        for nome in list(valores):
+            valores[nome][1] = contagem.pop(nome, 0)
+            if valores[nome] == [0, 0]:
+                del valores[nome]
+        for nome, n in contagem.items():
+            valores[nome] = [0, n]
+    historico['dias'] = {dia: valores for dia, valores in dias.items() if valores or dia in medidos}
+    historico['dias_xp'] = sorted(medidos)
+
+# ============================================================
+# MATRIZES
+# ============================================================
+def matrizes(historico, nomes, data):
+    """Matrizes XP e mortes (jogador × dia do calendário, até `data`) e a
+    máscara dos dias com execução. Dias sem execução ficam com XP zerado e
+    com as mortes que houve."""
+    indice = {nome: i for i, nome in enumerate(nomes)}
+    dias = sorted(d for d in historico['dias'] if d <= data) or [data]
+    medidos = [d for d in historico['dias_xp'] if d <= data]
+    inicio = np.datetime64(dias[0], 'D')
+    total = int((np.datetime64(data, 'D') - inicio).astype(int)) + 1
+
+    linhas, colunas, xp, mortes = [], [], [], []
+    for dia in dias:
+        coluna = int((np.datetime64(dia, 'D') - inicio).astype(int))
+        for nome, (valor_xp, valor_mortes) in historico['dias'][dia].items():
+            if nome in indice:
+                linhas.append(indice[nome])
+                colunas.append(coluna)
+                xp.append(valor_xp)
+                mortes.append(valor_mortes)
+
+    X = np.zeros((len(nomes), total), dtype=np.int64)
+    M = np.zeros((len(nomes), total), dtype=np.int64)
+    X[linhas, colunas] = xp
+    M[linhas, colunas] = mortes
+    presente = np.zeros(total, dtype=bool)
+    presente[(np.array(medidos, dtype='datetime64[D]') - inicio).astype(int)] = True
+    return X, M, presente
+
+def _sequencia_final(ativo):
+    """Dias seguidos com True contando do último dia para trás."""
+    quebra = ~ativo[:, ::-1]
+    return np.where(quebra.any(axis=1), quebra.argmax(axis=1), ativo.shape[1])
+
+def _ranks(xp, ordem_nome):
+    """Posição por XP (1 = maior; 0 = sem XP), empate pelo nome."""
+    ordem = np.lexsort((ordem_nome, -xp))
+    rank = np.empty(len(xp), dtype=np.int64)
+    rank[ordem] = np.arange(1, len(xp) + 1)
+    positivos = xp > 0
+    # Quem tem XP vem antes de todos os zeros: as posições já são as finais
+    return np.where(positivos, rank, 0)
+
+def _por_milhao(mortes, xp):
+    return np.where(xp > 0, mortes * 1e6 / np.maximum(xp, 1), np.nan)
+
+def _mediana_grupos(grupo, valores, n_grupos):
+    """Mediana de `valores` por grupo (NaN para grupo vazio), sem laço."""
+    ordem = np.lexsort((valores, grupo))
+    v = valores[ordem].astype(np.float64)
+    contagem = np.bincount(grupo, minlength=n_grupos)
+    inicio = np.concatenate(([0], np.cumsum(contagem)[:-1]))
+    baixo = inicio + np.maximum(contagem - 1, 0) // 2
+    alto = inicio + contagem // 2
+    ok = contagem > 0
+    mediana = np.full(n_grupos, np.nan)
+    mediana[ok] = (v[baixo[ok]] + v[alto[ok]]) / 2
+    return mediana
+
+def _grupos(rotulos, grupo, xp, mortes):
+    """Totais por grupo (vocação ou faixa de level) num período."""
+    n = len(rotulos)
+    ativo = xp > 0
+    jogadores = np.bincount(grupo, minlength=n)
+    ativos = np.bincount(grupo, weights=ativo, minlength=n).astype(np.int64)
+    xp_total = np.zeros(n, dtype=np.int64)
+    np.add.at(xp_total, grupo, xp)
+    mortes_total = np.bincount(grupo, weights=mortes, minlength=n).astype(np.int64)
+    mediana = _mediana_grupos(grupo[ativo], xp[ativo], n)
+    por_milhao = _por_milhao(mortes_total, xp_total)
+    return {
+        rotulo: {
+            'jogadores': int(jogadores[i]),
+            'ativos': int(ativos[i]),
+            'xp_total': int(xp_total[i]),
+            'xp_mediana': _numero(mediana[i]),
+            'mortes': int(mortes_total[i]),
+            'mortes_por_milhao': _numero(por_milhao[i], 3)
+        }
+        for i, rotulo in enumerate(rotulos) if jogadores[i]
+    }
+
+def _numero(valor, casas=0):
+    if np.isnan(valor):
+        return None
+    return round(float(valor), casas) if casas else int(round(float(valor)))
+
+def _faixa(level):
+    inicio = level // FAIXA_LEVEL * FAIXA_LEVEL
+    return f"{inicio}-{inicio + FAIXA_LEVEL - 1}"
+
+# ============================================================
+# CÁLCULO
+# ============================================================
+def calcular(historico, jogadores, data):
+    """jogadores: {nome: {'vocation', 'level'}} do alvo hoje."""
+    nomes = sorted(jogadores)
+    X, M, presente = matrizes(historico, nomes, data)
+    T = X.shape[1]
+    ordem_nome = np.arange(len(nomes))
+
+    vocacoes, voc_idx = np.unique(np.array([jogadores[n]['vocation'] or '' for n in nomes], dtype=str),
+                                  return_inverse=True)
+    levels = np.array([jogadores[n]['level'] or 0 for n in nomes], dtype=np.int64)
+    faixas_unicas, faixa_idx = np.unique(levels // FAIXA_LEVEL, return_inverse=True)
+    rotulos_faixa = [_faixa(int(b) * FAIXA_LEVEL) for b in faixas_unicas]
+
+    periodos = {}
+    xp_periodo = {}
+    mortes_periodo = {}
+    for periodo, dias in PERIODOS.items():
+        janela = slice(max(T - dias, 0), T)
+        xp = X[:, janela].sum(axis=1)
+        mortes = M[:, janela].sum(axis=1)
+        xp_periodo[periodo], mortes_periodo[periodo] = xp, mortes
+        ativos = xp[xp > 0]
+        periodos[periodo] = {
+            'dias_com_dados': int(presente[janela].sum()),
+            'jogadores_ativos': int(len(ativos)),
+            'xp_total': int(xp.sum()),
+            'percentis': {str(p): int(v) for p, v in zip(PERCENTIS, np.percentile(ativos, PERCENTIS))} if len(ativos) else {},
+            'vocacoes': _grupos(list(vocacoes), voc_idx, xp, mortes),
+            'faixas_level': _grupos(rotulos_faixa, faixa_idx, xp, mortes),
+        }
+
+    # Dia sem execução não quebra sequência (não se sabe o que houve)
+    dias_ativo = _sequencia_final((X > 0) | ~presente)
+    dias_sem_morte = _sequencia_final(M == 0)
+
+    rank = _ranks(X[:, -1], ordem_nome)
+    anteriores = np.flatnonzero(presente[:-1])
+    rank_anterior = _ranks(X[:, anteriores[-1]], ordem_nome) if len(anteriores) else np.zeros_like(rank)
+    movimento = np.where((rank > 0) & (rank_anterior > 0), rank_anterior - rank, 0)
+
+    xp_30, mortes_30 = xp_periodo['30days'], mortes_periodo['30days']
+    por_milhao = _por_milhao(mortes_30, xp_30)
+    personagens = {}
+    for i, nome in enumerate(nomes):
+        personagens[nome] = {
+            'vocation': jogadores[nome]['vocation'],
+            'level': int(levels[i]),
+            'rank': int(rank[i]),
+            'rank_anterior': int(rank_anterior[i]),
+            'movimento': int(movimento[i]) if rank[i] and rank_anterior[i] else None,
+            'dias_ativo': int(dias_ativo[i]),
+            'dias_sem_morte': int(dias_sem_morte[i]),
+            'xp_30days': int(xp_30[i]),
+            'mortes_30days': int(mortes_30[i]),
+            'mortes_por_milhao': _numero(por_milhao[i], 3)
+        }
+
+    return {
+        'dia': data,
+        'dias_historico': int(presente.sum()),
+        'periodos': periodos,
+        'personagens': personagens
+    }
+
+# ============================================================
+# FUNÇÃO PRINCIPAL
+# ============================================================
+def jogadores_do_alvo(alvo, ranking, mortes_ranking):
+    """Nome -> vocação/level/is_extra: membros do último retrato do roster, quem está
+    em algum ranking de XP e quem está no ranking de mortes."""
+    jogadores = {}
+    for fonte in (ranking, mortes_ranking):
+        for entradas in ((fonte or {}).get('rankings') or {}).values():
+            for e in entradas:
+                info = jogadores.setdefault(e['name'], {'vocation': '', 'level': 0, 'is_extra': False})
+                info['vocation'] = info['vocation'] or e.get('vocation', '')
+                info['level'] = max(info['level'], e.get('level') or 0)
+                info['is_extra'] = info['is_extra'] or e.get('is_extra', False)
+    dias = roster.carregar(os.path.join(alvo['dir'], roster.ROSTER_ARQUIVO))['dias']
+    if dias:
+        for nome, level in dias[max(dias)].items():
+            info = jogadores.setdefault(nome, {'vocation': '', 'level': 0, 'is_extra': False})
+            info['level'] = max(info['level'], level)
+    return jogadores
+
+def main(alvo):
+    """Atualiza xp_historico.json e analise.json do alvo a partir do
+    ranking.json e do mortes_historico.json que acabaram de ser gravados."""
+    ranking = _ler_json(os.path.join(alvo['dir'], 'ranking.json'))
+    if not ranking:
+        log(f"{alvo['guild']}: sem ranking.json, análise pulada", "⚠️")
+        return None
+    mortes_ranking = _ler_json(os.path.join(alvo['dir'], 'mortes_ranking.json'))
+    mortes = buscar_mortes.carregar_historico(os.path.join(alvo['dir'], 'mortes_historico.json'))
+
+    metricas.etapa('analise')
+    # O XP de "ontem" do ranking é o do dia do servidor anterior à execução
+    execucao = datetime.strptime(ranking['last_update'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=buscar_dados.TIMEZONE)
+    data = calendario.dia_do_servidor(calendario.inicio_de_ontem(execucao))
+    historico_path = os.path.join(alvo['dir'], HISTORICO_ARQUIVO)
+    historico = carregar(historico_path)
+    # XP não medido (estimativa do roster, extra adiado) fica fora do
+    # histórico; numa reexecução do mesmo dia, o que já foi medido fica
+    ontem = ranking['rankings'].get('yesterday', [])
+    xp = {e['name']: e['points'] for e in ontem if not e.get('xp_estimado')}
+    gravado = historico['dias'].get(data, {})
+    xp.update({e['name']: gravado[e['name']][0] for e in ontem if e.get('xp_estimado') and e['name'] in gravado})
+    registrar(historico, data, xp, mortes)
+    salvar(historico, historico_path)
+    if np is None:
+        metricas.encerrar_etapa()
+        log("NumPy não instalado: análise agregada pulada", "⚠️")
+        return None
+
+    analise = {
+        'guild': alvo['guild'],
+        'world': alvo['world'],
+        'last_update': ranking['last_update'],
+        **calcular(historico, jogadores_do_alvo(alvo, ranking, mortes_ranking), data)
+    }
+    with open(os.path.join(alvo['dir'], ANALISE_ARQUIVO), 'w', encoding='utf-8') as f:
+        json.dump(analise, f, ensure_ascii=False, separators=(',', ':'))
+    metricas.encerrar_etapa()
+    log(f"{alvo['guild']}: análise de {len(analise['personagens'])} personagens "
+        f"({analise['dias_historico']} dias de histórico)", "📊")
+    return analise
+
+if __name__ == "__main__":
+    # Só arquivos locais: sem rede, sem gravação/replay
+    parser = argparse.ArgumentParser(description="Recalcula a análise agregada de todos os alvos")
+    parser.add_argument('--config', default=ALVOS_PATH, help="arquivo de alvos (padrão: dados/alvos.json)")
+    args = parser.parse_args()
+    for alvo in carregar_alvos(args.config):
+        main(alvo)
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Modo ao vivo (intradiário)
+A cada ciclo busca só a lista de online do mundo (/v4/world, uma requisição
+por mundo) e compara com a do ciclo anterior. /v4/character é consultado
+apenas para personagens trackeados que acabaram de sair ou mudaram de
+level, então o custo acompanha a atividade e não o tamanho do roster.
+Mortes novas e level-ups vão para eventos.jsonl de cada alvo; as mortes
+entram no mortes_historico.json e o mortes_ranking.json é recalculado, e
+os level-ups e mortes dos membros entram no roster_historico.json (mínimo
+de XP ganho no dia do servidor, usado pela execução diária).
+
+A lista de online fica em dados/_ao_vivo.json entre execuções, para o modo
+agendado (--ciclos N a cada poucos minutos) não perder quem saiu no meio.
+Os eventos da execução também ficam em _eventos_pendentes.jsonl de cada
+alvo até serem publicados: se o push perder para outra atualização, o
+workflow volta para a versão publicada e roda --reaplicar, que grava esses
+eventos de novo por cima dela.
+"""
+import argparse
+import json
+import os
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+import buscar_mortes
+import calendario
+import causas
+import crawler
+import gravacao
+import metricas
+import perfil
+import personagens
+import ritmo
+import roster
+from alvos import ALVOS_PATH, carregar_alvos
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+INTERVALO_PADRAO = 60           # segundos entre ciclos
+ESTADO_PATH = os.path.join(buscar_mortes.DADOS_DIR, '_ao_vivo.json')
+# Lista salva mais velha que isso não serve de comparação (vira nova linha de base)
+ESTADO_VALIDADE = timedelta(minutes=30)
+EVENTOS_ARQUIVO = 'eventos.jsonl'
+PENDENTES_ARQUIVO = '_eventos_pendentes.jsonl'
+EVENTOS_RETENCAO_DIAS = 7
+
+def agora():
+    return buscar_mortes.agora()
+
+def log(msg, icon="ℹ️"):
+    buscar_mortes.log(msg, icon)
+
+# ============================================================
+# LISTA DE ONLINE
+# ============================================================
+def buscar_online(world):
+    """{nome_lower: level} dos jogadores online no mundo; None se falhou."""
+    url = f"{buscar_mortes.TIBIADATA_API}/world/{urllib.parse.quote(world)}"
+    try:
+        resp = crawler.obter(url, timeout=20, memo=False)
+        if resp.status_code == 200:
+            jogadores = resp.json().get('world', {}).get('online_players') or []
+            return {j['name'].lower(): j.get('level', 0) for j in jogadores if j.get('name')}
+        log(f"Lista de online de {world}: status {resp.status_code}", "⚠️")
+    except Exception as e:
+        log(f"Erro ao buscar online de {world}: {e}", "❌")
+    return None
+
+def carregar_estado(path=ESTADO_PATH):
+    """Listas de online do último ciclo salvo, se ainda recentes."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+        if agora() - datetime.fromisoformat(estado['atualizado']) <= ESTADO_VALIDADE:
+            return estado['mundos']
+    except Exception:
+        pass
+    return {}
+
+def salvar_estado(mundos, path=ESTADO_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'atualizado': agora().isoformat(), 'mundos': mundos}, f, ensure_ascii=False)
+
+# ============================================================
+# ACOMPANHAMENTO POR ALVO
+# ============================================================
+class Acompanhamento:
+    """Personagens trackeados de um alvo e o histórico de mortes em memória.
+
+    Roster, extras, histórico e ranking são relidos do disco só quando
+    algum deles muda (ex.: a execução diária rodou no meio).
+    """
+    def __init__(self, alvo, pendentes=False):
+        self.alvo = alvo
+        self.eventos_path = os.path.join(alvo['dir'], EVENTOS_ARQUIVO)
+        # Só a execução que publica por git (main) guarda os pendentes
+        self.pendentes_path = os.path.join(alvo['dir'], PENDENTES_ARQUIVO) if pendentes else None
+        self.historico_path = os.path.join(alvo['dir'], 'mortes_historico.json')
+        self.ranking_path = os.path.join(alvo['dir'], 'mortes_ranking.json')
+        self.roster_path = os.path.join(alvo['dir'], roster.ROSTER_ARQUIVO)
+        self._versao = None
+        self.trackeados = {}    # nome_lower -> nome usado no histórico
+        self.membros = set()    # nomes do último retrato do roster
+        self.info = {}          # nome -> vocação/level/is_extra (para o ranking)
+        self.historico = []
+        self.chaves = set()
+        self.ranking = None
+
+    def _arquivos(self):
+        return (self.roster_path, self.alvo['extras_path'], self.historico_path, self.ranking_path)
+
+    def _versao_atual(self):
+        return tuple(os.path.getmtime(p) if p and os.path.exists(p) else None for p in self._arquivos())
+
+    def recarregar(self):
+        versao = self._versao_atual()
+        if versao == self._versao:
+            return
+        self._versao = versao
+
+        dias = roster.carregar(self.roster_path)['dias']
+        if dias:
+            membros = list(dias[max(dias)])
+        else:
+            membros = [m['name'] for m in buscar_mortes.buscar_membros_guild(self.alvo['guild']).values()]
+        self.trackeados = {nome.lower(): nome for nome in membros}
+        self.membros = set(membros) if dias else set()
+        extras = {}
+        for nome in buscar_mortes.carregar_extras(self.alvo['extras_path']):
+            if nome.lower() not in self.trackeados:
+                extras[nome.lower()] = nome
+        self.trackeados.update(extras)
+
+        self.historico = buscar_mortes.carregar_historico(self.historico_path)
+        self.chaves = {buscar_mortes.fazer_chave_morte(d.get('character', ''), d) for d in self.historico}
+        self.ranking = None
+        if os.path.exists(self.ranking_path):
+            with open(self.ranking_path, 'r', encoding='utf-8') as f:
+                self.ranking = json.load(f)
+        self.info = {
+            e['name']: {k: e[k] for k in ('name', 'vocation', 'level', 'is_extra')}
+            for e in (self.ranking or {}).get('rankings', {}).get('alltime', [])
+        }
+        for nome_lower, nome in extras.items():
+            self.info.setdefault(nome, {'name': nome, 'vocation': '', 'level': 0, 'is_extra': True})
+        log(f"{self.alvo['guild']}: {len(self.trackeados)} personagens acompanhados")
+
+    def aplicar(self, anterior, online, resultados):
+        """Gera os eventos do ciclo a partir da diferença das listas e das
+        consultas feitas; retorna quantos eventos foram gravados."""
+        quando = agora().isoformat()
+        # Mortes além da retenção sairiam do histórico e voltariam a cada ciclo
+        cutoff = (agora() - timedelta(days=buscar_mortes.RETENCAO_DIAS)).strftime('%Y-%m-%dT00:00:00Z')
+        eventos = []
+        for nome_lower, nome in self.trackeados.items():
+            if nome_lower not in anterior:
+                continue
+            level = online.get(nome_lower)
+            resultado = resultados.get(nome_lower)
+            if level is None and resultado:
+                level = resultado['level']
+            if level and level > anterior[nome_lower]:
+                eventos.append({'quando': quando, 'tipo': 'level', 'nome': nome,
+                                'de': anterior[nome_lower], 'para': level})
+            if not resultado:
+                continue
+
+            info = self.info.setdefault(nome, {'name': nome, 'vocation': '', 'level': 0, 'is_extra': False})
+            info['vocation'] = resultado['vocation'] or info['vocation']
+            info['level'] = resultado['level'] or info['level']
+            for death in resultado['deaths']:
+                if buscar_mortes.fazer_chave_morte(nome, death) in self.chaves or death['time'] < cutoff:
+                    continue
+                eventos.append({'quando': quando, 'tipo': 'morte', 'nome': nome, **death})
+
+        self.registrar(eventos)
+        if eventos and self.pendentes_path:
+            with open(self.pendentes_path, 'a', encoding='utf-8') as f:
+                for evento in eventos:
+                    f.write(json.dumps(evento, ensure_ascii=False, separators=(',', ':')) + '\n')
+        return len(eventos)
+
+    def registrar(self, eventos):
+        """Grava os eventos no eventos.jsonl e os leva aos históricos: mortes
+        que ainda não estão no mortes_historico.json e, dos membros,
+        level-ups e mortes no roster_historico.json."""
+        if not eventos:
+            return
+        with open(self.eventos_path, 'a', encoding='utf-8') as f:
+            for evento in eventos:
+                f.write(json.dumps(evento, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+        novas = []
+        historico_roster = roster.carregar(self.roster_path)
+        mudou_roster = False
+        for evento in eventos:
+            if evento['tipo'] == 'morte':
+                death = {k: v for k, v in evento.items() if k not in ('quando', 'tipo', 'nome')}
+                chave = buscar_mortes.fazer_chave_morte(evento['nome'], death)
+                if chave not in self.chaves:
+                    self.chaves.add(chave)
+                    novas.append({'character': evento['nome'], **death})
+                dia = calendario.dia_da_morte(death)
+            else:
+                dia = calendario.dia_do_servidor(datetime.fromisoformat(evento['quando']))
+            if evento['nome'] in self.membros:
+                roster.registrar_ao_vivo(historico_roster, dia, evento['nome'], evento.get('de'), evento.get('para'),
+                                         morreu=evento['tipo'] == 'morte')
+                mudou_roster = True
+        if mudou_roster:
+            roster.salvar(historico_roster, self.roster_path)
+        if novas:
+            self.historico.extend(novas)
+            self._gravar_mortes(novas)
+        # Os próprios arquivos mudaram: não é motivo para reler
+        self._versao = self._versao_atual()
+
+    def reaplicar(self):
+        """Grava de novo os eventos pendentes (ainda não publicados) por
+        cima dos arquivos atuais; retorna quantos eram."""
+        if not os.path.exists(self.pendentes_path):
+            return 0
+        with open(self.pendentes_path, 'r', encoding='utf-8') as f:
+            eventos = [json.loads(linha) for linha in f if linha.strip()]
+        self.recarregar()
+        self.registrar(eventos)
+        return len(eventos)
+
+    def limpar_pendentes(self):
+        """Nova execução: os pendentes da anterior já foram publicados ou perdidos."""
+        if os.path.exists(self.pendentes_path):
+            os.remove(self.pendentes_path)
+
+    def _gravar_mortes(self, novas):
+        referencia = agora()
+        cutoff = referencia - timedelta(days=buscar_mortes.RETENCAO_DIAS)
+        self.historico = buscar_mortes.salvar_historico(self.historico, cutoff, self.historico_path)
+        causas.atualizar_indice(os.path.join(self.alvo['dir'], causas.INDICE_ARQUIVO), self.historico, novas, referencia)
+        if self.ranking is not None:
+            self.ranking['rankings'] = buscar_mortes.calcular_rankings(self.historico, self.info, referencia)
+            self.ranking['last_live_update'] = referencia.strftime('%Y-%m-%d %H:%M:%S')
+            with open(self.ranking_path, 'w', encoding='utf-8') as f:
+                json.dump(self.ranking, f, ensure_ascii=False, indent=2)
+        # Só os arquivos de quem morreu mudam de hash e são regravados
+        personagens.main(self.alvo)
+
+    def podar_eventos(self):
+        """Mantém só os últimos EVENTOS_RETENCAO_DIAS do eventos.jsonl."""
+        if not os.path.exists(self.eventos_path):
+            return
+        limite = (agora() - timedelta(days=EVENTOS_RETENCAO_DIAS)).isoformat()
+        with open(self.eventos_path, 'r', encoding='utf-8') as f:
+            linhas = f.readlines()
+        mantidas = [l for l in linhas if json.loads(l).get('quando', '') >= limite]
+        if len(mantidas) != len(linhas):
+            with open(self.eventos_path, 'w', encoding='utf-8') as f:
+                f.writelines(mantidas)
+
+# ============================================================
+# CICLO
+# ============================================================
+def ciclo(mundos, anteriores):
+    """Um ciclo em todos os mundos; retorna o total de eventos."""
+    total = 0
+    for world, acompanhamentos in mundos.items():
+        online = buscar_online(world)
+        if online is None:
+            continue
+        anterior = anteriores.get(world)
+        anteriores[world] = online
+        if anterior is None:
+            log(f"{world}: {len(online)} online (linha de base)")
+            continue
+
+        for a in acompanhamentos:
+            a.recarregar()
+        # Quem saiu ou mudou de level, entre os trackeados de qualquer alvo do mundo
+        nomes = {}
+        for a in acompanhamentos:
+            for nome_lower, nome in a.trackeados.items():
+                if nome_lower in anterior and online.get(nome_lower) != anterior[nome_lower]:
+                    nomes.setdefault(nome_lower, nome)
+        consultar = sorted(nomes)
+        resultados = dict(zip(consultar, crawler.mapear(
+            lambda nome_lower: buscar_mortes.buscar_mortes_personagem(nomes[nome_lower], memo=False), consultar)))
+
+        eventos = sum(a.aplicar(anterior, online, resultados) for a in acompanhamentos)
+        log(f"{world}: {len(online)} online, {len(consultar)} consultados, {eventos} eventos")
+        total += eventos
+    return total
+
+def preparar(alvos, pendentes=False):
+    """{mundo: [Acompanhamento]} dos alvos (eventos antigos já podados;
+    com `pendentes`, os eventos desta execução vão para o arquivo de pendentes)."""
+    mundos = {}
+    for alvo in alvos:
+        a = Acompanhamento(alvo, pendentes)
+        a.podar_eventos()
+        if pendentes:
+            a.limpar_pendentes()
+        mundos.setdefault(alvo['world'], []).append(a)
+    return mundos
+
+def reaplicar(config):
+    """Depois de voltar à versão publicada (push recusado), grava de novo os
+    eventos pendentes de cada alvo."""
+    total = 0
+    for alvo in carregar_alvos(config):
+        n = Acompanhamento(alvo, pendentes=True).reaplicar()
+        if n:
+            log(f"{alvo['guild']}: {n} eventos pendentes gravados de novo", "🔁")
+        total += n
+    log(f"{total} eventos reaplicados", "✅")
+
+def executar(config, intervalo, ciclos):
+    mundos = preparar(carregar_alvos(config), pendentes=True)
+    anteriores = carregar_estado()
+
+    n = 0
+    try:
+        while not ciclos or n < ciclos:
+            inicio = time.monotonic()
+            metricas.etapa('ao_vivo.ciclo')
+            ciclo(mundos, anteriores)
+            metricas.encerrar_etapa()
+            salvar_estado(anteriores)
+            n += 1
+            if not ciclos or n < ciclos:
+                crawler.dormir(max(0.0, intervalo - (time.monotonic() - inicio)), 'ao_vivo')
+    except KeyboardInterrupt:
+        log("Interrompido", "⏹️")
+    log(f"{n} ciclos concluídos", "✅")
+
+def main():
+    parser = argparse.ArgumentParser(description="Acompanha a lista de online e registra mortes e level-ups")
+    parser.add_argument('--config', default=ALVOS_PATH, help="arquivo de alvos (padrão: dados/alvos.json)")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_PADRAO, help="segundos entre ciclos")
+    parser.add_argument('--ciclos', type=int, default=0, help="para após N ciclos (0 = até ser interrompido)")
+    parser.add_argument('--reaplicar', action='store_true',
+                        help="só grava de novo os eventos pendentes da última execução (push recusado)")
+    gravacao.adicionar_argumentos(parser)
+    perfil.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    if args.reaplicar:
+        reaplicar(args.config)
+        return
+
+    # metricas.json fica só com as execuções completas
+    with gravacao.sessao(args), metricas.execucao(gravar=False), \
+            ritmo.execucao(gravar=not args.replay), perfil.sessao(args):
+        executar(args.config, args.intervalo, args.ciclos)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Atualização parcial dos extras
+Compara o extras.json de cada alvo com os extras da última execução
+(status.json → extras_processados) e busca só os novos ou alterados.
+Eles entram no ranking.json, no mortes_ranking.json e no histórico de
+mortes já existentes; os ranks são recalculados sem buscar mais ninguém.
+Extras removidos saem dos rankings. Roda em segundos, disparado pelo push
+do extras.json (admin.html).
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+import buscar_dados
+import buscar_mortes
+import causas
+import crawler
+import gravacao
+import metricas
+import perfil
+import personagens
+import pipeline
+import ritmo
+import roster
+from alvos import ALVOS_PATH, carregar_alvos
+
+PERIODOS_XP = buscar_dados.PERIODOS_XP
+
+def log(msg, icon="ℹ️"):
+    buscar_dados.log(msg, icon)
+
+def _ler_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _gravar_json(path, dados):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+
+def _referencia(ranking):
+    """Horário da última execução completa: os períodos (ontem/7d/30d) dos
+    rankings continuam contados a partir dele."""
+    return datetime.strptime(ranking['last_update'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=buscar_dados.TIMEZONE)
+
+def membros_atuais(alvo):
+    """{nome: level} dos membros pelo último retrato do roster; sem retrato,
+    pela TibiaData."""
+    historico = roster.carregar(os.path.join(alvo['dir'], roster.ROSTER_ARQUIVO))
+    if historico['dias']:
+        return dict(historico['dias'][max(historico['dias'])])
+    return {m['name']: m['level'] for m in buscar_dados.buscar_membros_guild(alvo['guild']).values()}
+
+# ============================================================
+# XP
+# ============================================================
+def atualizar_xp(alvo, ranking, status, novos, removidos, membros):
+    """Busca os extras novos e regrava ranking.json e status.json."""
+    processados = dict(status['extras_processados'])
+    jogadores = buscar_dados.jogadores_do_ranking(ranking)
+
+    for nome in removidos:
+        nome_ranking = processados.pop(nome)
+        if nome_ranking and jogadores.get(nome_ranking, {}).get('is_extra'):
+            del jogadores[nome_ranking]
+            log(f"  {nome}: removido dos rankings", "🗑️")
+
+    # Nomes já no ranking e membros sem XP também contam como processados
+    vistos = membros | {nome.lower() for nome in jogadores}
+    resultados = pipeline.processar(
+        [(nome, nome) for nome in novos if nome.lower() not in vistos],
+        lambda nome: buscar_dados.buscar_extra(nome, alvo['world'], {}),
+        buscar_dados.interpretar_extra,
+        buscas=crawler.BUSCAS_SIMULTANEAS
+    )
+    for nome in novos:
+        jogador = buscar_dados.jogador_extra(nome, resultados.get(nome), alvo['world'], {}, vistos)
+        processados[nome] = jogador['name'] if jogador else None
+        if jogador:
+            jogadores[jogador['name']] = jogador
+            vistos.add(jogador['name'].lower())
+
+    jogadores = list(jogadores.values())
+    rankings = {periodo: buscar_dados.criar_ranking(jogadores, campo) for campo, periodo in PERIODOS_XP}
+    ranking['rankings'] = rankings
+    _gravar_json(os.path.join(alvo['dir'], 'ranking.json'), ranking)
+
+    status.update({
+        'total_extras': sum(1 for nome in processados.values() if nome),
+        'jogadores_com_xp_ontem': len(rankings['yesterday']),
+        'jogadores_com_xp_7dias': len(rankings['7days']),
+        'jogadores_com_xp_30dias': len(rankings['30days']),
+        'top5_ontem': [
+            {'pos': p['rank'], 'nome': p['name'], 'xp': buscar_dados.format_xp(p['points'])}
+            for p in rankings['yesterday'][:5]
+        ],
+        'extras_processados': processados,
+    })
+    _gravar_json(os.path.join(alvo['dir'], 'status.json'), status)
+
+# ============================================================
+# MORTES
+# ============================================================
+def atualizar_mortes(alvo, extras, novos, membros):
+    """Acrescenta as mortes dos extras novos ao histórico e recalcula o
+    mortes_ranking.json e o mortes_status.json (o scraper de mortes usa o
+    nome do extras.json).
+
+    Como em buscar_mortes.main, os jogadores são os membros atuais (do
+    roster) mais os extras; vocação e level de quem não foi buscado agora
+    vêm do ranking anterior. Quem saiu da guild ou da lista sai dos rankings.
+    """
+    ranking_path = os.path.join(alvo['dir'], 'mortes_ranking.json')
+    historico_path = os.path.join(alvo['dir'], 'mortes_historico.json')
+    status_path = os.path.join(alvo['dir'], 'mortes_status.json')
+    ranking = _ler_json(ranking_path)
+    if not ranking:
+        log("Sem mortes_ranking.json: mortes ficam para a próxima execução completa", "⚠️")
+        return
+
+    anteriores = {e['name']: e for e in ranking['rankings'].get('alltime', [])}
+    jogadores_info = {}
+    for nome, level in membros.items():
+        jogadores_info[nome] = {
+            'name': nome,
+            'vocation': anteriores.get(nome, {}).get('vocation', ''),
+            'level': level,
+            'is_extra': False
+        }
+    processados = {nome.lower() for nome in jogadores_info}
+    for nome in extras:
+        if nome.lower() not in processados:
+            anterior = anteriores.get(nome, {})
+            jogadores_info[nome] = {
+                'name': nome,
+                'vocation': anterior.get('vocation', ''),
+                'level': anterior.get('level', 0),
+                'is_extra': True
+            }
+            processados.add(nome.lower())
+
+    historico = buscar_mortes.carregar_historico(historico_path)
+    chaves = {buscar_mortes.fazer_chave_morte(d.get('character', ''), d) for d in historico}
+
+    membros_lower = {nome.lower() for nome in membros}
+    buscar = [nome for nome in novos if nome.lower() not in membros_lower and nome not in anteriores]
+    mortes_novas = []
+    falhas = 0
+    for nome, resultado in zip(buscar, crawler.mapear(buscar_mortes.buscar_mortes_personagem, buscar)):
+        if resultado is None:
+            log(f"  {nome}: mortes não encontradas", "⚠️")
+            falhas += 1
+            continue
+        jogadores_info[nome] = {
+            'name': nome,
+            'vocation': resultado['vocation'],
+            'level': resultado['level'],
+            'is_extra': True
+        }
+        for death in resultado['deaths']:
+            chave = buscar_mortes.fazer_chave_morte(nome, death)
+            if chave not in chaves:
+                mortes_novas.append({'character': nome, **death})
+                chaves.add(chave)
+
+    historico.extend(mortes_novas)
+    referencia = _referencia(ranking)
+    cutoff = referencia - timedelta(days=buscar_mortes.RETENCAO_DIAS)
+    historico = buscar_mortes.salvar_historico(historico, cutoff, historico_path)
+    causas.atualizar_indice(os.path.join(alvo['dir'], causas.INDICE_ARQUIVO), historico, mortes_novas, referencia)
+    rankings = buscar_mortes.calcular_rankings(historico, jogadores_info, referencia)
+    ranking['rankings'] = rankings
+    _gravar_json(ranking_path, ranking)
+
+    status = _ler_json(status_path) or {}
+    status.update({
+        'ultima_execucao': buscar_dados.agora().strftime('%d/%m/%Y às %H:%M:%S'),
+        'sucesso': True,
+        'total_jogadores_buscados': len(jogadores_info),
+        'mortes_novas': len(mortes_novas),
+        'total_historico': len(historico),
+        'falhas': falhas,
+        'jogadores_com_mortes_ontem': len(rankings['yesterday']),
+        'jogadores_com_mortes_7dias': len(rankings['7days']),
+        'jogadores_com_mortes_30dias': len(rankings['30days']),
+        'jogadores_com_mortes_alltime': len(rankings['alltime'])
+    })
+    _gravar_json(status_path, status)
+    log(f"Mortes: {len(mortes_novas)} novas de {len(buscar)} extras", "✅")
+
+# ============================================================
+# FUNÇÃO PRINCIPAL
+# ============================================================
+def atualizar(alvo):
+    """Atualização parcial de um alvo; retorna False se faltar a base."""
+    status = _ler_json(os.path.join(alvo['dir'], 'status.json'))
+    ranking = _ler_json(os.path.join(alvo['dir'], 'ranking.json'))
+    if not status or not ranking or 'extras_processados' not in status:
+        log(f"{alvo['guild']}: sem execução completa registrada, rode executar.py", "⚠️")
+        return False
+
+    extras = buscar_dados.carregar_extras(alvo['extras_path'])
+    anteriores = status['extras_processados']
+    novos = [nome for nome in extras if nome not in anteriores]
+    removidos = [nome for nome in anteriores if nome not in extras]
+    if not novos and not removidos:
+        log(f"{alvo['guild']}: extras sem mudanças")
+        return True
+
+    log(f"{alvo['guild']}: {len(novos)} extras novos, {len(removidos)} removidos", "🎯")
+    membros = membros_atuais(alvo)
+
+    metricas.etapa('extras.xp')
+    atualizar_xp(alvo, ranking, status, novos, removidos, {nome.lower() for nome in membros})
+    metricas.etapa('extras.mortes')
+    atualizar_mortes(alvo, extras, novos, membros)
+    metricas.etapa('extras.personagens')
+    personagens.main(alvo)
+    metricas.encerrar_etapa()
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza só os extras novos/removidos de todos os alvos")
+    parser.add_argument('--config', default=ALVOS_PATH, help="arquivo de alvos (padrão: dados/alvos.json)")
+    gravacao.adicionar_argumentos(parser)
+    perfil.adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    # metricas.json fica só com as execuções completas
+    with gravacao.sessao(args), metricas.execucao(gravar=False), \
+            ritmo.execucao(gravar=not args.replay), perfil.sessao(args):
+        for alvo in carregar_alvos(args.config):
+            atualizar(alvo)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos estágios dos scrapers
+Mede tempo e pico de memória de parsing, cálculo de rankings e I/O do
+histórico usando as fixtures versionadas (dados/debug_guildstats.html,
+tab_timeonline.html, tab_members.html, char_page.html, mortes_historico.json)
+e versões sintéticas 10×/100× maiores. Compara com benchmark_baseline.json.
+
+Uso:
+    python scraper/benchmark.py                       # compara com a baseline
+    python scraper/benchmark.py --salvar-baseline     # grava a baseline desta máquina
+    python scraper/benchmark.py --escalas 1,10,100    # inclui 100× jogadores (lento)
+    python scraper/benchmark.py --e2e                 # inclui execução completa contra o mock
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import alvos
+import buscar_dados
+import buscar_mortes
+import ritmo
+import servidor_mock
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RAIZ_DIR = os.path.join(SCRIPT_DIR, '..')
+DEBUG_GUILDSTATS_PATH = os.path.join(RAIZ_DIR, 'dados', 'debug_guildstats.html')
+HISTORICO_PATH = os.path.join(RAIZ_DIR, 'dados', 'mortes_historico.json')
+BASELINE_PATH = os.path.join(SCRIPT_DIR, 'benchmark_baseline.json')
+
+# Regressão: tempo acima de LIMITE_TEMPO × baseline (e pelo menos TOLERANCIA_S
+# a mais, para estágios de milissegundos não oscilarem) falha; memória idem,
+# com LIMITE_MEMORIA e TOLERANCIA_MB (picos de KB variam com o alocador)
+LIMITE_TEMPO = 1.50
+LIMITE_MEMORIA = 1.25
+TOLERANCIA_S = 0.02
+TOLERANCIA_MB = 1.0
+
+# Estágios repetidos em cada escala de jogadores / de mortes
+ESTAGIOS_JOGADORES = ['guildstats_timeonline', 'exp_individual']
+ESTAGIOS_MORTES = ['calcular_rankings', 'historico_carregar', 'historico_salvar']
+
+# Estágios que passam disso rodam uma vez só (escalas grandes)
+TEMPO_REPETICAO_MAX = 5.0
+
+def log(msg, icon="ℹ️"):
+    buscar_dados.log(msg, icon)
+
+# ============================================================
+# FIXTURES SINTÉTICAS
+# ============================================================
+def _ler(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def historico_escalado(mortes, fator):
+    """Replica o histórico com personagens renomeados (mesma distribuição de datas)."""
+    if fator == 1:
+        return list(mortes)
+    return [
+        {**m, 'character': f"{m['character']} #{i}"}
+        for i in range(fator)
+        for m in mortes
+    ]
+
+def jogadores_do_historico(mortes):
+    return {
+        m['character']: {'name': m['character'], 'vocation': 'Elite Knight', 'level': m.get('level', 0), 'is_extra': False}
+        for m in mortes
+    }
+
+# ============================================================
+# MEDIÇÃO
+# ============================================================
+def medir(funcao, repeticoes):
+    """Menor tempo entre as repetições e pico de memória (tracemalloc) de uma execução."""
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+        if tempos[-1] > TEMPO_REPETICAO_MAX:
+            break
+
+    gc.collect()
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'tempo_s': round(min(tempos), 6), 'pico_mb': round(pico / 1024 / 1024, 3)}
+
+def estagios(escalas_jogadores, escalas_mortes, filtro=''):
+    """Gera (nome, função) de cada estágio; as fixtures de cada escala só são
+    montadas quando algum estágio dela passa no filtro."""
+    debug_html = _ler(DEBUG_GUILDSTATS_PATH)
+    char_page = _ler(servidor_mock.CHAR_PAGE_PATH)
+    mortes = buscar_mortes.carregar_historico(HISTORICO_PATH)
+    cutoff = buscar_mortes.agora().replace(year=2000)
+    tmp = tempfile.mkdtemp(prefix='bench_')
+
+    def pedido(fator, bases):
+        return any(filtro in f'{base}_{fator}x' for base in bases)
+
+    yield 'guildstats_debug_html', lambda: buscar_dados.extrair_xp_guildstats(debug_html)
+    yield 'char_page', lambda: buscar_dados.extrair_dados_guildstats_individual({'pagina': char_page, 'exp': None})
+
+    # Jogadores: tabela timeonline com 161×N linhas e 40×N abas de XP individual
+    for fator in escalas_jogadores:
+        if not pedido(fator, ESTAGIOS_JOGADORES):
+            continue
+        modelos = servidor_mock.Modelos(161 * fator, 'Luminera')
+        timeonline = modelos.timeonline()
+        abas = [modelos.aba_experiencia(nome) for nome in modelos.membros[:40 * fator]]
+
+        def parse_abas(abas=abas):
+            for aba in abas:
+                buscar_dados.extrair_exp_individual(aba)
+
+        yield f'guildstats_timeonline_{fator}x', lambda t=timeonline: buscar_dados.extrair_xp_guildstats(t)
+        yield f'exp_individual_{fator}x', parse_abas
+
+    # Mortes: histórico replicado N vezes com personagens renomeados
+    for fator in escalas_mortes:
+        if not pedido(fator, ESTAGIOS_MORTES):
+            continue
+        hist = historico_escalado(mortes, fator)
+        jogadores = jogadores_do_historico(hist)
+        caminho = os.path.join(tmp, f'historico_{fator}x.json')
+        buscar_mortes.salvar_historico(hist, cutoff, caminho)
+
+        yield f'calcular_rankings_{fator}x', lambda h=hist, j=jogadores: buscar_mortes.calcular_rankings(h, j)
+        yield f'historico_carregar_{fator}x', lambda c=caminho: buscar_mortes.carregar_historico(c)
+        yield f'historico_salvar_{fator}x', lambda h=hist, c=caminho: buscar_mortes.salvar_historico(h, cutoff, c)
+
+def execucao_completa():
+    """Roda XP + mortes contra o servidor mock local (sem latência, sem ritmo)."""
+    modelos = servidor_mock.Modelos(161, 'Luminera')
+    comportamento = servidor_mock.Comportamento(0, 0, 0, 0, 0)
+    servidor = servidor_mock.ThreadingHTTPServer(('127.0.0.1', 0), servidor_mock.criar_handler(modelos, comportamento))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    bases_originais = (buscar_dados.GUILDSTATS_BASE, buscar_dados.TIBIADATA_API, buscar_mortes.TIBIADATA_API,
+                       buscar_dados.GUILDSTATS_URL, buscar_dados.GUILDSTATS_REFERER)
+    buscar_dados.GUILDSTATS_BASE = base
+    buscar_dados.TIBIADATA_API = buscar_mortes.TIBIADATA_API = base + '/v4'
+    buscar_dados.GUILDSTATS_URL = base + "/include/guild/tab.php?guild={guild}&tab=timeonline"
+    buscar_dados.GUILDSTATS_REFERER = base + "/guild?guild={guild}&world={world}&op=3"
+    ritmo_original = (ritmo.INTERVALO_PADRAO, ritmo.INTERVALO_MINIMO_PADRAO)
+    ritmo.INTERVALO_PADRAO = ritmo.INTERVALO_MINIMO_PADRAO = 0
+    ritmo.reiniciar()
+
+    saida = tempfile.mkdtemp(prefix='bench_e2e_')
+    alvo = alvos.resolver_alvo({'guild': 'Diehard', 'world': 'Luminera', 'saida': saida, 'extras': None})
+    try:
+        inicio = time.perf_counter()
+        buscar_dados.main(alvo)
+        buscar_mortes.main(alvo)
+        return {'tempo_s': round(time.perf_counter() - inicio, 6), 'pico_mb': None}
+    finally:
+        servidor.shutdown()
+        (buscar_dados.GUILDSTATS_BASE, buscar_dados.TIBIADATA_API, buscar_mortes.TIBIADATA_API,
+         buscar_dados.GUILDSTATS_URL, buscar_dados.GUILDSTATS_REFERER) = bases_originais
+        ritmo.INTERVALO_PADRAO, ritmo.INTERVALO_MINIMO_PADRAO = ritmo_original
+
+# ============================================================
+# COMPARAÇÃO
+# ============================================================
+def comparar(resultados, baseline):
+    """Lista de regressões (estágio, métrica, atual, baseline)."""
+    regressoes = []
+    for nome, atual in resultados.items():
+        base = baseline.get(nome)
+        if not base:
+            continue
+        if atual['tempo_s'] > base['tempo_s'] * LIMITE_TEMPO and atual['tempo_s'] - base['tempo_s'] > TOLERANCIA_S:
+            regressoes.append((nome, 'tempo_s', atual['tempo_s'], base['tempo_s']))
+        if (atual.get('pico_mb') and base.get('pico_mb') and atual['pico_mb'] > base['pico_mb'] * LIMITE_MEMORIA
+                and atual['pico_mb'] - base['pico_mb'] > TOLERANCIA_MB):
+            regressoes.append((nome, 'pico_mb', atual['pico_mb'], base['pico_mb']))
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos estágios dos scrapers")
+    # 100× jogadores = tabela de ~70 MB (minutos e ~2 GB de RAM); só sob pedido
+    parser.add_argument('--escalas', default='1,10', help="escalas de jogadores (padrão: 1,10; use 1,10,100 para a completa)")
+    parser.add_argument('--escalas-mortes', default='1,10,100', help="escalas do histórico de mortes (padrão: 1,10,100)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--filtro', default='', help="só estágios cujo nome contém este texto")
+    parser.add_argument('--e2e', action='store_true', help="inclui execução completa contra o servidor mock")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--salvar-baseline', action='store_true')
+    parser.add_argument('--json', metavar='ARQ', help="grava os resultados em ARQ")
+    args = parser.parse_args()
+
+    escalas = [int(e) for e in args.escalas.split(',') if e.strip()]
+    escalas_mortes = [int(e) for e in args.escalas_mortes.split(',') if e.strip()]
+    resultados = {}
+
+    print("=" * 70)
+    print(f"{'estágio':<32}{'tempo (s)':>12}{'pico (MB)':>12}{'baseline (s)':>14}")
+    print("-" * 70)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('estagios', {})
+
+    lista = estagios(escalas, escalas_mortes, args.filtro)
+    if args.e2e:
+        lista = itertools.chain(lista, [('execucao_completa_1x', None)])
+
+    for nome, funcao in lista:
+        if args.filtro and args.filtro not in nome:
+            continue
+        r = execucao_completa() if funcao is None else medir(funcao, args.repeticoes)
+        resultados[nome] = r
+        base = baseline.get(nome, {}).get('tempo_s')
+        pico = f"{r['pico_mb']:.2f}" if r['pico_mb'] is not None else '-'
+        print(f"{nome:<32}{r['tempo_s']:>12.4f}{pico:>12}{(f'{base:.4f}' if base else '-'):>14}")
+    print("=" * 70)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'gerado_em': buscar_dados.agora().strftime('%Y-%m-%d %H:%M:%S'),
+                'python': sys.version.split()[0],
+                'maquina': platform.platform(),
+                'estagios': {**baseline, **resultados}
+            }, f, ensure_ascii=False, indent=2)
+        log(f"Baseline salva em {args.baseline}", "💾")
+        return
+
+    regressoes = comparar(resultados, baseline)
+    for nome, metrica, atual, base in regressoes:
+        log(f"Regressão em {nome}: {metrica} {atual} (baseline {base})", "❌")
+    if regressoes:
+        sys.exit(1)
+    if baseline:
+        log("Sem regressões em relação à baseline", "✅")
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,27 @@
 Scraper de XP da guild Diehard - Tibia
 Gera ranking.json e status.json para o site
 """
-import requests
 from bs4 import BeautifulSoup
+import argparse
 import json
 import html as html_module
 import re
 import urllib.parse
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import os
-import time
-from http_client import fetch
+import calendario
+import causas
+import crawler
+import fragmentos
+import gravacao
+import metricas
+import perfil
+import pipeline
+import prioridade
+import ritmo
+import roster
+from alvos import alvo_padrao
 
 # ============================================================
 # CONFIGURAÇÕES
@@ -21,32 +31,46 @@ from http_client import fetch
 GUILD_NAME = "Diehard"
 WORLD = "Luminera"
 TIMEZONE = ZoneInfo('America/Sao_Paulo')
-GUILDSTATS_URL = f"https://guildstats.eu/include/guild/tab.php?guild={GUILD_NAME}&tab=timeonline"
-GUILDSTATS_REFERER = f"https://guildstats.eu/guild?guild={GUILD_NAME}&world={WORLD}&op=3"
+# Bases sobrescrevíveis por variável de ambiente (ex.: servidor_mock.py local)
+GUILDSTATS_BASE = os.environ.get('GUILDSTATS_BASE_URL', 'https://guildstats.eu').rstrip('/')
+TIBIADATA_API = os.environ.get('TIBIADATA_BASE_URL', 'https://api.tibiadata.com').rstrip('/') + '/v4'
+GUILDSTATS_URL = GUILDSTATS_BASE + "/include/guild/tab.php?guild={guild}&tab=timeonline"
+GUILDSTATS_REFERER = GUILDSTATS_BASE + "/guild?guild={guild}&world={world}&op=3"
 GUILDSTATS_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    'Accept-Language': 'en-US,en;q=0.5',
-    'Referer': GUILDSTATS_REFERER
+    'Accept-Language': 'en-US,en;q=0.5'
 }
 
 # Caminhos de saída
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-DADOS_DIR = os.path.join(SCRIPT_DIR, '..', 'dados')
+DADOS_DIR = os.environ.get('DADOS_DIR') or os.path.join(SCRIPT_DIR, '..', 'dados')
 RANKING_PATH = os.path.join(DADOS_DIR, 'ranking.json')
 STATUS_PATH = os.path.join(DADOS_DIR, 'status.json')
 EXTRAS_PATH = os.path.join(DADOS_DIR, 'extras.json')
 
+# Espera pelo GuildStats: tentativas e intervalo entre elas
+MAX_TENTATIVAS = 36
+INTERVALO_MINUTOS = 5
+
 # ============================================================
 # FUNÇÕES UTILITÁRIAS
 # ============================================================
 def agora():
-    """Retorna datetime atual no fuso horário de Brasília."""
-    return datetime.now(TIMEZONE)
+    """Retorna datetime atual no fuso horário de Brasília (gravado no --record)."""
+    return gravacao.agora(TIMEZONE)
+
+def logou_desde(last_login, inicio):
+    """False só com login da TibiaData comprovadamente anterior a `inicio`."""
+    try:
+        quando = datetime.strptime(last_login, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return True
+    return quando >= inicio
 
 def log(msg, icon="ℹ️"):
     """Log com timestamp."""
-    hora = agora().strftime('%H:%M:%S')
+    hora = datetime.now(TIMEZONE).strftime('%H:%M:%S')
     print(f"[{hora}] {icon} {msg}")
 
 def parse_exp_value(exp_str):
@@ -70,6 +94,9 @@ def encode_guildstats_nick(nome):
     escaped = html_module.escape(nome, quote=True).replace('&#x27;', '&apos;')
     return urllib.parse.quote(escaped, safe='')
 
+# Célula de tabela começando com data (AAAA-MM-DD), possivelmente dentro de tags
+RE_LINHA_EXP = re.compile(r'<td[^>]*>(?:\s|<[^>]+>)*\d{4}-\d{2}-\d{2}')
+
 def extrair_char_nick_param(html):
     """Extrai o charNickParam renderizado na página completa do personagem."""
     match = re.search(r"charNickParam\s*=\s*'([^']*)'", html)
@@ -78,10 +105,16 @@ def extrair_char_nick_param(html):
 # ============================================================
 # FUNÇÕES DE BUSCA DE DADOS
 # ============================================================
-def buscar_html_guildstats():
+def buscar_html_guildstats(guild=GUILD_NAME, world=WORLD):
     """Busca a tabela AJAX diretamente e usa o bypass anti-bot como fallback."""
+    url = GUILDSTATS_URL.format(guild=urllib.parse.quote(guild))
+    headers = {
+        **GUILDSTATS_HEADERS,
+        'Referer': GUILDSTATS_REFERER.format(guild=urllib.parse.quote(guild), world=world)
+    }
     try:
-        resp = requests.get(GUILDSTATS_URL, headers=GUILDSTATS_HEADERS, timeout=30)
+        # memo=False: o loop de espera precisa ver a tabela nova a cada tentativa
+        resp = crawler.obter(url, headers=headers, timeout=30, memo=False)
         resp.raise_for_status()
         html = resp.text
         if '<td' in html and ('character/' in html or 'character?nick=' in html):
@@ -91,14 +124,14 @@ def buscar_html_guildstats():
     except Exception as e:
         log(f"Falha na chamada direta ao GuildStats ({e}); tentando fallback", "⚠️")
 
-    return fetch(GUILDSTATS_URL)
+    return crawler.buscar_html(url, memo=False)
 
-def buscar_membros_guild():
+def buscar_membros_guild(guild=GUILD_NAME):
     """Busca lista de membros da guild via TibiaData API."""
-    log("Buscando membros da guild via TibiaData API...")
+    log(f"Buscando membros da guild {guild} via TibiaData API...")
     try:
-        url = f"https://api.tibiadata.com/v4/guild/{GUILD_NAME}"
-        resp = requests.get(url, timeout=30)
+        url = f"{TIBIADATA_API}/guild/{urllib.parse.quote(guild)}"
+        resp = crawler.obter(url, timeout=30)
         if resp.status_code == 200:
             data = resp.json()
             if 'guild' in data and 'members' in data['guild']:
@@ -116,62 +149,67 @@ def buscar_membros_guild():
         log(f"Erro ao buscar membros: {e}", "❌")
     return {}
 
-def buscar_xp_guildstats():
-    """Busca XP de todos os jogadores no GuildStats."""
-    log("Buscando XP do GuildStats...")
-    try:
-        html = buscar_html_guildstats()
+def extrair_xp_guildstats(html):
+    """Extrai XP (ontem/7d/30d) de todos os jogadores da tabela timeonline."""
+    soup = BeautifulSoup(html, 'html.parser')
+    jogadores = {}
+    xp_columns = {}
+
+    for table in soup.find_all('table'):
+        headers = [th.get_text(' ', strip=True).lower() for th in table.find_all('th')]
+        if 'exp yesterday' in headers and 'exp 7 days' in headers and 'exp 30 days' in headers:
+            xp_columns = {
+                'exp_yesterday': headers.index('exp yesterday'),
+                'exp_7days': headers.index('exp 7 days'),
+                'exp_30days': headers.index('exp 30 days')
+            }
+            break
+
+    if not xp_columns:
+        raise ValueError("Colunas de XP não encontradas na tabela do GuildStats")
+    
+    for row in soup.find_all('tr'):
+        cols = row.find_all('td')
+        if len(cols) <= max(xp_columns.values()):
+            continue
         
-        soup = BeautifulSoup(html, 'html.parser')
-        jogadores = {}
-        xp_columns = {}
-
-        for table in soup.find_all('table'):
-            headers = [th.get_text(' ', strip=True).lower() for th in table.find_all('th')]
-            if 'exp yesterday' in headers and 'exp 7 days' in headers and 'exp 30 days' in headers:
-                xp_columns = {
-                    'exp_yesterday': headers.index('exp yesterday'),
-                    'exp_7days': headers.index('exp 7 days'),
-                    'exp_30days': headers.index('exp 30 days')
-                }
+        # Encontra link do personagem
+        char_link = None
+        for col in cols:
+            link = col.find('a')
+            href = link.get('href', '') if link else ''
+            if link and ('character/' in href or 'character?nick=' in href):
+                char_link = link
                 break
-
-        if not xp_columns:
-            raise ValueError("Colunas de XP não encontradas na tabela do GuildStats")
         
-        for row in soup.find_all('tr'):
-            cols = row.find_all('td')
-            if len(cols) <= max(xp_columns.values()):
-                continue
-            
-            # Encontra link do personagem
-            char_link = None
-            for col in cols:
-                link = col.find('a')
-                href = link.get('href', '') if link else ''
-                if link and ('character/' in href or 'character?nick=' in href):
-                    char_link = link
-                    break
-            
-            if not char_link:
-                continue
-            
-            nome = char_link.text.strip()
-            nome_lower = nome.lower()
-            
-            def get_col_xp(col):
-                sv = col.get('data-sort-value')
-                if sv is not None:
-                    try: return int(sv)
-                    except: pass
-                return parse_exp_value(col.text.strip().split('\n')[0].strip())
-
-            jogadores[nome_lower] = {
-                'name': nome,
-                'exp_yesterday': get_col_xp(cols[xp_columns['exp_yesterday']]),
-                'exp_7days': get_col_xp(cols[xp_columns['exp_7days']]),
-                'exp_30days': get_col_xp(cols[xp_columns['exp_30days']])
-            }
+        if not char_link:
+            continue
+        
+        nome = char_link.text.strip()
+        nome_lower = nome.lower()
+        
+        def get_col_xp(col):
+            sv = col.get('data-sort-value')
+            if sv is not None:
+                try: return int(sv)
+                except: pass
+            return parse_exp_value(col.text.strip().split('\n')[0].strip())
+
+        jogadores[nome_lower] = {
+            'name': nome,
+            'exp_yesterday': get_col_xp(cols[xp_columns['exp_yesterday']]),
+            'exp_7days': get_col_xp(cols[xp_columns['exp_7days']]),
+            'exp_30days': get_col_xp(cols[xp_columns['exp_30days']])
+        }
+
+    return jogadores
+
+def buscar_xp_guildstats(guild=GUILD_NAME, world=WORLD):
+    """Busca XP de todos os jogadores no GuildStats."""
+    log(f"Buscando XP do GuildStats ({guild})...")
+    try:
+        html = buscar_html_guildstats(guild, world)
+        jogadores = pipeline.interpretar(extrair_xp_guildstats, html)
         
         # Conta quantos têm XP ontem (para validação)
         com_xp_ontem = sum(1 for j in jogadores.values() if j['exp_yesterday'] > 0)
@@ -183,16 +221,46 @@ def buscar_xp_guildstats():
         log(f"Erro ao buscar GuildStats: {e}", "❌")
         return {}, 0
 
+def aguardar_xp_guildstats(guild, world, max_tentativas=MAX_TENTATIVAS, intervalo_minutos=INTERVALO_MINUTOS):
+    """Repete buscar_xp_guildstats até a tabela ter XP de ontem (10+ jogadores)."""
+    xp_data = {}
+    com_xp_ontem = 0
+    
+    for tentativa in range(1, max_tentativas + 1):
+        log(f"Tentativa {tentativa}/{max_tentativas}", "🔄")
+        
+        try:
+            xp_data, com_xp_ontem = buscar_xp_guildstats(guild, world)
+            
+            if com_xp_ontem >= 10:
+                log(f"GuildStats atualizado! {com_xp_ontem} membros com XP ontem", "✅")
+                break
+            else:
+                log(f"GuildStats ainda não atualizou ({com_xp_ontem} jogadores com XP ontem, aguardando 10+)", "⚠️")
+        except Exception as e:
+            if "403" in str(e):
+                log(f"ERRO: Bloqueio anti-bot detectado (403).", "🚫")
+            else:
+                log(f"Erro inesperado: {e}", "❌")
+            
+            # Se falhou por bloqueio ou erro, tratamos como "não atualizou" para o retry loop seguir
+            com_xp_ontem = 0
+            
+        if tentativa < max_tentativas:
+            log(f"Aguardando {intervalo_minutos} minutos para próxima tentativa...", "🔄")
+            crawler.dormir(intervalo_minutos * 60, 'espera_guildstats')
+    
+    return xp_data, com_xp_ontem
+
 def buscar_vocacao_individual(nome, tentativas=3):
     """Busca vocação de um jogador específico (para extras) com retry.
-    Também extrai mortes e salva no cache para o scraper de mortes reaproveitar."""
-    import urllib.parse
-    url = f"https://api.tibiadata.com/v4/character/{urllib.parse.quote(nome)}"
+    Também extrai as mortes, que vão para o cache do scraper de mortes."""
+    url = f"{TIBIADATA_API}/character/{urllib.parse.quote(nome)}"
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
 
-    for tentativa in range(tentativas):
+    for _ in range(tentativas):
         try:
-            resp = requests.get(url, headers=headers, timeout=15)
+            resp = crawler.obter(url, headers=headers, timeout=15)
 
             if resp.status_code == 200 and resp.text.strip():
                 data = resp.json()
@@ -200,32 +268,19 @@ def buscar_vocacao_individual(nome, tentativas=3):
                 char = character.get('character', {})
                 if char and char.get('name'):
                     # Extrai mortes para o cache
-                    deaths_raw = character.get('deaths', [])
-                    deaths = []
-                    for death in deaths_raw:
-                        reason = death.get('reason', 'Unknown')
-                        involved = death.get('involved', [])
-                        is_pk = any(i.get('player', False) for i in involved)
-                        deaths.append({
-                            'time': death.get('time', ''),
-                            'level': death.get('level', 0),
-                            'reason': reason,
-                            'is_pk': is_pk
-                        })
-                    _salvar_cache_tibiadata(nome, deaths, char.get('vocation', ''), char.get('level', 0))
-
+                    deaths = [causas.morte(death) for death in character.get('deaths', [])]
                     return {
                         'name': char.get('name', nome),
                         'vocation': char.get('vocation', ''),
                         'level': char.get('level', 0),
-                        'world': char.get('world', '')
+                        'world': char.get('world', ''),
+                        'last_login': char.get('last_login', ''),
+                        'deaths': deaths
                     }
-            # Se resposta vazia ou erro, espera e tenta de novo
-            if tentativa < tentativas - 1:
-                time.sleep(5)
         except:
-            if tentativa < tentativas - 1:
-                time.sleep(5)
+            pass
+        # Resposta vazia ou erro: tenta de novo sem sleep fixo; depois de
+        # 429/erro o crawler já segura o host (Retry-After ou ritmo reduzido)
     return None
 
 
@@ -242,15 +297,20 @@ def _carregar_cache_tibiadata():
             pass
     return {}
 
-def _salvar_cache_tibiadata(nome, deaths, vocation, level):
-    """Salva dados de um personagem no cache."""
+def _salvar_cache_tibiadata(personagens):
+    """Salva no cache os dados (buscar_vocacao_individual) de cada personagem."""
+    if not personagens:
+        return
     cache = _carregar_cache_tibiadata()
-    cache[nome] = {
-        'deaths': deaths,
-        'vocation': vocation,
-        'level': level,
-        'fetched_at': agora().strftime('%Y-%m-%d %H:%M:%S')
-    }
+    fetched_at = agora().strftime('%Y-%m-%d %H:%M:%S')
+    for nome, dados in personagens.items():
+        cache[nome] = {
+            'deaths': dados['deaths'],
+            'vocation': dados['vocation'],
+            'level': dados['level'],
+            'last_login': dados.get('last_login', ''),
+            'fetched_at': fetched_at
+        }
     with open(CACHE_PATH, 'w', encoding='utf-8') as f:
         json.dump(cache, f, ensure_ascii=False, indent=2)
 
@@ -270,9 +330,9 @@ def buscar_html_exp_individual(nome, timeout=15, page_html=None):
 
     ultimo_erro = None
     for nick_param in nick_params:
-        url = f"https://guildstats.eu/include/character/tab.php?nick={nick_param}&tab=experience"
+        url = f"{GUILDSTATS_BASE}/include/character/tab.php?nick={nick_param}&tab=experience"
         try:
-            html = fetch(url, timeout=timeout)
+            html = crawler.buscar_html(url, timeout=timeout)
         except Exception as e:
             ultimo_erro = e
             continue
@@ -280,13 +340,17 @@ def buscar_html_exp_individual(nome, timeout=15, page_html=None):
         if "does not exsists" in html or "don't have in our datebase" in html:
             continue
 
-        if extrair_exp_individual(html):
+        if tem_registros_exp(html):
             return html
 
     if ultimo_erro:
         raise ultimo_erro
     return None
 
+def tem_registros_exp(html):
+    """Checagem barata (sem BeautifulSoup) de que a aba tem linhas de XP diário."""
+    return bool(RE_LINHA_EXP.search(html))
+
 def extrair_exp_individual(html):
     """Extrai XP diário da aba individual, ordenando do registro mais recente."""
     registros = []
@@ -326,48 +390,62 @@ def extrair_exp_individual(html):
         'exp_30days': sum(exp_values[:30])
     }
 
+def buscar_paginas_guildstats_individual(nome):
+    """Busca a página do personagem e a aba de XP no GuildStats (sem interpretar)."""
+    url = f"{GUILDSTATS_BASE}/character/{urllib.parse.quote(nome)}"
+    html = crawler.buscar_html(url, timeout=20)
+
+    if "does not exsists" in html or "don't have in our datebase" in html:
+        return None
+
+    # A aba de XP usa o charNickParam da página principal (regex, sem parsing)
+    html_xp = buscar_html_exp_individual(nome, timeout=20, page_html=html)
+    return {'pagina': html, 'exp': html_xp}
+
+def extrair_dados_guildstats_individual(paginas):
+    """Extrai vocação, level, mundo e XP das páginas buscadas por buscar_paginas_guildstats_individual."""
+    soup = BeautifulSoup(paginas['pagina'], 'html.parser')
+
+    # Busca vocação, level e mundo da página principal
+    vocation = ''
+    level = 0
+    world = ''
+
+    # Procura nas divs de informações do personagem
+    for div in soup.find_all('div'):
+        spans = div.find_all('span')
+        if len(spans) >= 2:
+            label = spans[0].text.strip().lower()
+            if label == 'vocation:':
+                vocation = spans[1].text.strip()
+            elif label == 'world:':
+                world = spans[1].text.strip()
+            elif label == 'level':
+                try:
+                    level = int(spans[1].text.strip().replace(',', '').replace('.', ''))
+                except ValueError:
+                    pass
+
+    xp = extrair_exp_individual(paginas['exp'] or '') or {
+        'exp_yesterday': 0,
+        'exp_7days': 0,
+        'exp_30days': 0
+    }
+
+    return {
+        'vocation': vocation,
+        'level': level,
+        'world': world,
+        **xp
+    }
+
 def buscar_dados_guildstats_individual(nome):
     """Busca dados completos de um jogador na página individual do GuildStats (vocação, level e XP)."""
     try:
-        url = f"https://guildstats.eu/character/{urllib.parse.quote(nome)}"
-        html = fetch(url, timeout=20)
-
-        if "does not exsists" in html or "don't have in our datebase" in html:
+        paginas = buscar_paginas_guildstats_individual(nome)
+        if not paginas:
             return None
-
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Busca vocação e level da página principal
-        vocation = ''
-        level = 0
-
-        # Procura nas divs de informações do personagem
-        for div in soup.find_all('div'):
-            spans = div.find_all('span')
-            if len(spans) >= 2:
-                label = spans[0].text.strip().lower()
-                if label == 'vocation:':
-                    vocation = spans[1].text.strip()
-                elif label == 'level':
-                    try:
-                        level = int(spans[1].text.strip().replace(',', '').replace('.', ''))
-                    except ValueError:
-                        pass
-
-        # Agora busca XP na aba de experiência
-        html_xp = buscar_html_exp_individual(nome, timeout=20, page_html=html)
-
-        xp = extrair_exp_individual(html_xp or '') or {
-            'exp_yesterday': 0,
-            'exp_7days': 0,
-            'exp_30days': 0
-        }
-
-        return {
-            'vocation': vocation,
-            'level': level,
-            **xp
-        }
+        return pipeline.interpretar(extrair_dados_guildstats_individual, paginas)
     except Exception as e:
         log(f"Erro ao buscar dados do GuildStats para {nome}: {e}", "⚠️")
         return None
@@ -379,75 +457,231 @@ def buscar_exp_individual(nome):
         if not html:
             return None
 
-        return extrair_exp_individual(html)
+        return pipeline.interpretar(extrair_exp_individual, html)
     except:
         return None
 
-def carregar_extras():
+def carregar_extras(path=EXTRAS_PATH):
     """Carrega lista de extras do arquivo JSON."""
-    if os.path.exists(EXTRAS_PATH):
+    if path and os.path.exists(path):
         try:
-            with open(EXTRAS_PATH, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 return [e.get('nome', '') for e in data.get('extras', []) if e.get('nome')]
         except:
             pass
     return []
 
+# ============================================================
+# ESTÁGIOS DO PIPELINE DE EXTRAS
+# ============================================================
+def identidade_completa(dados):
+    """Resposta de fonte com level, vocação e mundo (a corrida aceita a primeira assim)."""
+    return bool(dados.get('level') and dados.get('vocation') and dados.get('world'))
+
+def buscar_extra(nome, world, xp_data):
+    """Estágio de busca de um extra: TibiaData e GuildStats em corrida.
+
+    A primeira resposta completa define level/vocação/mundo; o XP vem da
+    tabela da guild, do GuildStats quando ele vence (já traz a aba de XP) ou
+    da aba de XP do nome atual, sem esperar o GuildStats que perdeu.
+    A resposta completa da TibiaData vai junto ('tibiadata') para o cache
+    de mortes, mesmo quando o GuildStats vence.
+    """
+    corrida = crawler.correr(f"extra {nome}", [
+        ('TibiaData', lambda: buscar_vocacao_individual(nome)),
+        ('GuildStats', lambda: buscar_dados_guildstats_individual(nome)),
+    ], identidade_completa)
+
+    dados = corrida.dados
+    fonte = corrida.vencedor
+    if not dados:
+        # Nenhuma fonte completa: GuildStats sem mundo ainda serve (fallback antigo)
+        dados = corrida.resultado('GuildStats')
+        fonte = 'GuildStats' if dados else None
+    if not dados:
+        return {'dados': None}
+
+    nome_atual = dados.get('name') or nome
+    mundo_atual = dados.get('world', '')
+    xp = None
+    html_xp = None
+    if (not mundo_atual or mundo_atual == world) and nome_atual.lower() not in xp_data:
+        if fonte == 'GuildStats' and nome_atual.lower() == nome.lower():
+            xp = {campo: dados[campo] for campo in ('exp_yesterday', 'exp_7days', 'exp_30days')}
+        else:
+            try:
+                html_xp = buscar_html_exp_individual(nome_atual)
+            except Exception:
+                pass
+    # As mortes da TibiaData seriam buscadas de novo pelo scraper de mortes:
+    # com o GuildStats vencendo, espera a requisição que já está em curso
+    tibiadata = dados if fonte == 'TibiaData' else corrida.resultado('TibiaData')
+    if not (tibiadata and identidade_completa(tibiadata)):
+        tibiadata = None
+    return {'dados': dados, 'fonte': fonte, 'xp': xp, 'html_exp': html_xp, 'tibiadata': tibiadata}
+
+def interpretar_extra(pacote):
+    """Estágio de parsing de um extra (roda no pool de processos)."""
+    html_xp = pacote.pop('html_exp', None)
+    if html_xp:
+        pacote['xp'] = extrair_exp_individual(html_xp)
+    return pacote
+
+def jogador_extra(nome, resultado, world, xp_data, processados):
+    """Linha do ranking de um extra a partir do resultado de buscar_extra
+    (None se não encontrado, de outro mundo ou já processado)."""
+    # Pula se já foi processado como membro da guild
+    if nome.lower() in processados:
+        log(f"  {nome}: já está na guild, pulando", "ℹ️")
+        return None
+
+    resultado = resultado or {}
+    dados = resultado.get('dados')
+
+    if not dados:
+        log(f"  {nome}: não encontrado em nenhuma fonte", "❌")
+        return None
+
+    nome_atual = dados.get('name') or nome
+    nome_atual_lower = nome_atual.lower()
+    mundo_atual = dados.get('world', '')
+
+    if mundo_atual and mundo_atual != world:
+        log(f"  {nome}: personagem atual é {nome_atual} em {mundo_atual}, pulando (esperado: {world})", "⚠️")
+        return None
+
+    if nome_atual_lower in processados:
+        log(f"  {nome}: já processado como {nome_atual}, pulando", "ℹ️")
+        return None
+
+    if nome_atual != nome:
+        log(f"  {nome}: nome atual detectado pela TibiaData é {nome_atual}", "ℹ️")
+
+    # XP da tabela da guild, do GuildStats ou da aba individual do nome atual
+    xp = xp_data.get(nome_atual_lower) or resultado.get('xp')
+
+    log(f"  {nome_atual}: Level {dados['level']} {dados['vocation']} ({resultado['fonte']})", "✅")
+    return {
+        'name': nome_atual,
+        'level': dados['level'],
+        'vocation': dados['vocation'],
+        'exp_yesterday': xp.get('exp_yesterday', 0) if xp else 0,
+        'exp_7days': xp.get('exp_7days', 0) if xp else 0,
+        'exp_30days': xp.get('exp_30days', 0) if xp else 0,
+        'is_extra': True
+    }
+
+# ============================================================
+# RANKINGS
+# ============================================================
+PERIODOS_XP = (('exp_yesterday', 'yesterday'), ('exp_7days', '7days'), ('exp_30days', '30days'))
+
+def jogadores_do_ranking(ranking):
+    """Reconstrói as linhas de jogador (XP dos três períodos) do ranking.json."""
+    jogadores = {}
+    for campo, periodo in PERIODOS_XP:
+        for entrada in ranking['rankings'].get(periodo, []):
+            jogador = jogadores.setdefault(entrada['name'], {
+                'name': entrada['name'],
+                'level': entrada['level'],
+                'vocation': entrada['vocation'],
+                'exp_yesterday': 0,
+                'exp_7days': 0,
+                'exp_30days': 0,
+                'is_extra': entrada.get('is_extra', False)
+            })
+            jogador[campo] = entrada['points']
+            if entrada.get('xp_estimado'):
+                jogador.setdefault('estimado', []).append(campo)
+    return jogadores
+
+def extras_anteriores(ranking_path, status_path):
+    """{nome no extras.json: linha de jogador} da execução anterior, com todo
+    o XP marcado como não medido (para extras adiados pelo prazo)."""
+    ranking = status = None
+    try:
+        with open(ranking_path, 'r', encoding='utf-8') as f:
+            ranking = json.load(f)
+        with open(status_path, 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    except Exception:
+        pass
+    if not ranking or not status:
+        return {}
+    jogadores = jogadores_do_ranking(ranking)
+    anteriores = {}
+    for nome, nome_ranking in status.get('extras_processados', {}).items():
+        jogador = jogadores.get(nome_ranking)
+        if jogador and jogador['is_extra']:
+            anteriores[nome] = {**jogador, 'estimado': [campo for campo, _ in PERIODOS_XP]}
+    return anteriores
+
+def criar_ranking(jogadores, campo):
+    filtrados = [j for j in jogadores if j.get(campo, 0) > 0]
+    filtrados.sort(key=lambda x: x.get(campo, 0), reverse=True)
+    return [{
+        'rank': i,
+        'name': j['name'],
+        'vocation': j['vocation'],
+        'level': j['level'],
+        'points': j[campo],
+        'is_extra': j.get('is_extra', False),
+        # XP não medido nesta execução (estimativa pelo roster ou entrada
+        # anterior de extra adiado pelo prazo)
+        **({'xp_estimado': True} if campo in j.get('estimado', ()) else {})
+    } for i, j in enumerate(filtrados, 1)]
+
 # ============================================================
 # FUNÇÃO PRINCIPAL
 # ============================================================
-def main():
-    # Configuração de retry
-    MAX_TENTATIVAS = 36
-    INTERVALO_MINUTOS = 5
-    
+def main(alvo=None):
+    # Alvo (guild/mundo/saída); sem parâmetro usa Diehard/Luminera em dados/
+    alvo = alvo or alvo_padrao()
+    guild = alvo['guild']
+    world = alvo['world']
+    ranking_path = os.path.join(alvo['dir'], 'ranking.json')
+    status_path = os.path.join(alvo['dir'], 'status.json')
+
     print("=" * 70)
-    log(f"INICIANDO ATUALIZAÇÃO DO RANKING - {GUILD_NAME}")
+    log(f"INICIANDO ATUALIZAÇÃO DO RANKING - {guild} ({world})")
     log(f"Data/Hora: {agora().strftime('%Y-%m-%d %H:%M:%S')}")
     log(f"Config: Max {MAX_TENTATIVAS} tentativas, intervalo {INTERVALO_MINUTOS} min")
     print("=" * 70)
     
     # Garante que o diretório de dados existe
     os.makedirs(DADOS_DIR, exist_ok=True)
+    os.makedirs(alvo['dir'], exist_ok=True)
     
+    metricas.etapa('xp.membros')
     # 1. Busca membros da guild (vocações e levels) - FONTE PRIMÁRIA
-    membros_guild = buscar_membros_guild()
+    membros_guild = fragmentos.compartilhado(alvo, 'membros', lambda: buscar_membros_guild(guild))
+
+    # Retrato diário dos levels: a variação dá limites para o XP ganho
+    roster_path = os.path.join(alvo['dir'], roster.ROSTER_ARQUIVO)
+    historico_roster = roster.carregar(roster_path)
+    hoje = agora().strftime('%Y-%m-%d')
+    roster.registrar(historico_roster, hoje, membros_guild)
+    roster.salvar(historico_roster, roster_path)
+    # Só o de ontem: 7d/30d ficam com o total do GuildStats (o meio de uma
+    # faixa de vários dias não é um total confiável)
+    faixas = roster.faixas(historico_roster, hoje, 1)
+    # Level-ups de ontem vistos pelo modo ao vivo: ganho certo (mínimo) mesmo
+    # com o retrato ambíguo
+    inicio = calendario.inicio_de_ontem(agora())
+    minimo_ontem = roster.minimo_ao_vivo(historico_roster, calendario.dia_do_servidor(inicio))
     
+    metricas.etapa('xp.guildstats')
     # 2. Loop de tentativas até GuildStats atualizar
-    xp_data = {}
-    com_xp_ontem = 0
-    
-    for tentativa in range(1, MAX_TENTATIVAS + 1):
-        log(f"Tentativa {tentativa}/{MAX_TENTATIVAS}", "🔄")
-        
-        try:
-            xp_data, com_xp_ontem = buscar_xp_guildstats()
-            
-            if com_xp_ontem >= 10:
-                log(f"GuildStats atualizado! {com_xp_ontem} membros com XP ontem", "✅")
-                break
-            else:
-                log(f"GuildStats ainda não atualizou ({com_xp_ontem} jogadores com XP ontem, aguardando 10+)", "⚠️")
-        except Exception as e:
-            if "403" in str(e):
-                log(f"ERRO: Bloqueio anti-bot detectado (403).", "🚫")
-            else:
-                log(f"Erro inesperado: {e}", "❌")
-            
-            # Se falhou por bloqueio ou erro, tratamos como "não atualizou" para o retry loop seguir
-            com_xp_ontem = 0
-            
-        if tentativa < MAX_TENTATIVAS:
-            log(f"Aguardando {INTERVALO_MINUTOS} minutos para próxima tentativa...", "🔄")
-            time.sleep(INTERVALO_MINUTOS * 60)
+    xp_data, com_xp_ontem = fragmentos.compartilhado(alvo, 'xp_guildstats', lambda: aguardar_xp_guildstats(guild, world))
     
     # 3. Monta lista de jogadores - COMEÇA PELOS MEMBROS DA GUILD (não pelo GuildStats)
     jogadores = []
     processados = set()
     
     # Primeiro: todos os membros da guild atual (com vocação garantida)
-    sem_xp = []  # membros sem XP em nenhum período no tab.php
+    sem_xp = []     # membros com XP ontem duvidoso: buscados individualmente
+    ambiguos = []   # level igual: buscados só se logaram desde o início de ontem
     for nome_lower, membro in membros_guild.items():
         xp = xp_data.get(nome_lower, {})
         exp_y = xp.get('exp_yesterday', 0)
@@ -463,17 +697,53 @@ def main():
             'is_extra': False
         })
         processados.add(nome_lower)
-        if exp_y == 0:  # busca individual para corrigir yesterday mesmo se 7d/30d ok
-            sem_xp.append(nome_lower)
-
-    log(f"Membros da guild: {len(jogadores)} ({len(sem_xp)} sem XP no tab.php — buscando individualmente...)", "✅")
-
-    # Busca individual para membros sem XP no tab.php
+        # Busca individual para corrigir yesterday mesmo se 7d/30d ok; é
+        # dispensada quando a variação de level descarta ganho (máximo <= 0).
+        # Level igual (ou sem retrato de ontem) é ambíguo: decide o login
+        faixa = faixas.get(nome_lower)
+        if exp_y == 0 and (faixa is None or faixa[1] > 0):
+            if (faixa and faixa[0] > 0) or minimo_ontem.get(nome_lower, 0) > 0:
+                sem_xp.append(nome_lower)
+            else:
+                ambiguos.append(nome_lower)
+
+    metricas.etapa('xp.login')
+    # Ambíguos: o último login na TibiaData mostra quem nem entrou no jogo
+    # ontem, e esses ficam com 0 sem ir ao GuildStats. O scraper de mortes
+    # buscaria esses personagens de qualquer jeito: as respostas vão para o
+    # cache dele, então a consulta não custa requisições a mais
+    logins = fragmentos.distribuir(alvo, 'xp.login', ambiguos, lambda chaves: dict(zip(
+        chaves, crawler.mapear(lambda nome_lower: buscar_vocacao_individual(membros_guild[nome_lower]['name']), chaves))))
+    _salvar_cache_tibiadata({
+        membros_guild[nome_lower]['name']: logins[nome_lower]
+        for nome_lower in ambiguos if logins.get(nome_lower)
+    })
+    ausentes = {nome_lower for nome_lower in ambiguos
+                if logins.get(nome_lower) and not logou_desde(logins[nome_lower]['last_login'], inicio)}
+    buscar = set(sem_xp) | (set(ambiguos) - ausentes)
+    sem_xp = [nome_lower for nome_lower in membros_guild if nome_lower in buscar]
+
+    log(f"Membros da guild: {len(jogadores)} ({len(ausentes)} sem login ontem, "
+        f"{len(sem_xp)} com XP ontem ambíguo — buscando individualmente...)", "✅")
+
+    metricas.etapa('xp.individual')
+    # Busca individual para membros sem XP no tab.php: a thread de busca segue
+    # no ritmo do crawler enquanto o pool de processos interpreta as abas.
+    # Os mais valiosos (ativos, topo do ranking) saem primeiro
+    valores = prioridade.valores(alvo['dir'], agora())
+    prazo = prioridade.Prazo('xp.individual')
+    resultados = fragmentos.distribuir(alvo, 'xp.individual', prioridade.ordenar(sem_xp, valores), lambda chaves: pipeline.processar(
+        [(nome_lower, membros_guild[nome_lower]['name']) for nome_lower in chaves],
+        prazo(buscar_html_exp_individual),
+        extrair_exp_individual,
+        buscas=crawler.BUSCAS_SIMULTANEAS
+    ))
+    if prazo.adiadas:
+        log(f"Prazo: {prazo.adiadas} membros de menor valor sem busca individual (vale a estimativa do roster)", "⏰")
     atualizados = 0
-    for i, nome_lower in enumerate(sem_xp):
+    for nome_lower in sem_xp:
         membro = membros_guild[nome_lower]
-        time.sleep(1)
-        xp = buscar_exp_individual(membro['name'])
+        xp = resultados.get(nome_lower)
         if xp and xp.get('exp_yesterday', 0) > 0:
             for j in jogadores:
                 if j['name'] == membro['name']:
@@ -485,99 +755,81 @@ def main():
                         j['exp_30days'] = xp.get('exp_30days', 0)
                     break
             atualizados += 1
-        if (i + 1) % 20 == 0:
-            log(f"  Busca individual: {i+1}/{len(sem_xp)}, {atualizados} com XP", "🔄")
 
     log(f"Busca individual concluída: {atualizados}/{len(sem_xp)} membros com XP encontrado", "✅")
+
+    # Quem continua com 0 mas certamente ganhou XP (GuildStats fora do ar ou
+    # sem a aba individual) recebe a estimativa pela variação de level, ou
+    # ao menos o mínimo dos level-ups vistos ao vivo
+    estimados = 0
+    for j in jogadores:
+        nome_lower = j['name'].lower()
+        if j['exp_yesterday'] != 0:
+            continue
+        faixa = faixas.get(nome_lower)
+        j['exp_yesterday'] = max(roster.estimativa(faixa) if faixa else 0, minimo_ontem.get(nome_lower, 0))
+        if j['exp_yesterday'] > 0:
+            j['estimado'] = ['exp_yesterday']
+            estimados += 1
+    if estimados:
+        log(f"XP estimado pela variação de level para {estimados} membros", "📐")
     
+    metricas.etapa('xp.extras')
     # 4. Processa extras (jogadores fora da guild que queremos trackear)
-    extras = carregar_extras()
+    extras = carregar_extras(alvo['extras_path'])
     total_extras = 0
+    # extras.json desta execução -> nome no ranking (None se ficou de fora);
+    # é a base do atualizar_extras.py
+    extras_processados = dict.fromkeys(extras)
 
     if extras:
-        log(f"Processando {len(extras)} extras...")
+        # Extras novos primeiro, depois por valor; inativos no lote do fim
+        fila = prioridade.ordenar([nome for nome in extras if nome.lower() not in processados], valores)
+        log(f"Processando {len(extras)} extras ({prioridade.resumo(fila, valores)})...")
+        prazo = prioridade.Prazo('xp.extras')
+        resultados = fragmentos.distribuir(
+            alvo, 'xp.extras', fila,
+            lambda chaves: pipeline.processar(
+                [(nome, nome) for nome in chaves],
+                prazo(lambda nome: buscar_extra(nome, world, xp_data), adiado={'dados': None, 'adiado': True}),
+                interpretar_extra,
+                buscas=crawler.BUSCAS_SIMULTANEAS
+            ))
+        if prazo.adiadas:
+            log(f"Prazo: {prazo.adiadas} extras de menor valor ficaram para a próxima execução", "⏰")
+        # Cache para o scraper de mortes (toda resposta completa da TibiaData,
+        # vencendo ou não a corrida), gravado aqui na ordem dos extras e não
+        # nas threads de busca
+        _salvar_cache_tibiadata({
+            nome: resultados[nome]['tibiadata'] for nome in extras
+            if (resultados.get(nome) or {}).get('tibiadata')
+        })
+        anteriores = None
         for nome in extras:
-            nome_lower = nome.lower()
-
-            # Pula se já foi processado como membro da guild
-            if nome_lower in processados:
-                log(f"  {nome}: já está na guild, pulando", "ℹ️")
-                continue
-
-            time.sleep(2)  # Rate limiting
-
-            # Tenta buscar vocação via TibiaData primeiro
-            dados = buscar_vocacao_individual(nome)
-
-            if dados:
-                nome_atual = dados.get('name') or nome
-                nome_atual_lower = nome_atual.lower()
-                mundo_atual = dados.get('world', '')
-
-                if mundo_atual and mundo_atual != WORLD:
-                    log(f"  {nome}: personagem atual é {nome_atual} em {mundo_atual}, pulando (esperado: {WORLD})", "⚠️")
-                    continue
-
-                if nome_atual_lower in processados:
-                    log(f"  {nome}: já processado como {nome_atual}, pulando", "ℹ️")
-                    continue
-
-                if nome_atual != nome:
-                    log(f"  {nome}: nome atual detectado pela TibiaData é {nome_atual}", "ℹ️")
-
-                # TibiaData funcionou - busca XP separadamente
-                xp = xp_data.get(nome_atual_lower)
-                if not xp:
-                    time.sleep(2)
-                    xp = buscar_exp_individual(nome_atual)
-
-                jogadores.append({
-                    'name': nome_atual,
-                    'level': dados['level'],
-                    'vocation': dados['vocation'],
-                    'exp_yesterday': xp.get('exp_yesterday', 0) if xp else 0,
-                    'exp_7days': xp.get('exp_7days', 0) if xp else 0,
-                    'exp_30days': xp.get('exp_30days', 0) if xp else 0,
-                    'is_extra': True
-                })
-                processados.add(nome_atual_lower)
-                total_extras += 1
-                log(f"  {nome_atual}: Level {dados['level']} {dados['vocation']} (TibiaData)", "✅")
-            else:
-                # TibiaData falhou - usa GuildStats como fonte completa (fallback)
-                log(f"  {nome}: TibiaData timeout, tentando GuildStats...", "⚠️")
-                time.sleep(2)
-                dados_gs = buscar_dados_guildstats_individual(nome)
-
-                if dados_gs:
-                    jogadores.append({
-                        'name': nome,
-                        'level': dados_gs['level'],
-                        'vocation': dados_gs['vocation'],
-                        'exp_yesterday': dados_gs['exp_yesterday'],
-                        'exp_7days': dados_gs['exp_7days'],
-                        'exp_30days': dados_gs['exp_30days'],
-                        'is_extra': True
-                    })
-                    processados.add(nome_lower)
+            if (resultados.get(nome) or {}).get('adiado'):
+                # Sem busca nesta execução: fica a entrada anterior (XP marcado
+                # como não medido) e o extra não conta como processado
+                if anteriores is None:
+                    anteriores = extras_anteriores(ranking_path, status_path)
+                extras_processados.pop(nome, None)
+                jogador = anteriores.get(nome)
+                if jogador and jogador['name'].lower() not in processados:
+                    log(f"  {nome}: adiado pelo prazo, mantida a entrada anterior", "⏰")
+                    jogadores.append(jogador)
+                    processados.add(jogador['name'].lower())
                     total_extras += 1
-                    log(f"  {nome}: Level {dados_gs['level']} {dados_gs['vocation']} (GuildStats)", "✅")
                 else:
-                    log(f"  {nome}: não encontrado em nenhuma fonte", "❌")
+                    log(f"  {nome}: adiado pelo prazo, sem entrada anterior", "⏰")
+                continue
+            jogador = jogador_extra(nome, resultados.get(nome), world, xp_data, processados)
+            if jogador:
+                jogadores.append(jogador)
+                processados.add(jogador['name'].lower())
+                total_extras += 1
+                extras_processados[nome] = jogador['name']
     
+    metricas.etapa('xp.saida')
     # 5. Cria rankings
-    def criar_ranking(jogadores, campo):
-        filtrados = [j for j in jogadores if j.get(campo, 0) > 0]
-        filtrados.sort(key=lambda x: x.get(campo, 0), reverse=True)
-        return [{
-            'rank': i,
-            'name': j['name'],
-            'vocation': j['vocation'],
-            'level': j['level'],
-            'points': j[campo],
-            'is_extra': j.get('is_extra', False)
-        } for i, j in enumerate(filtrados, 1)]
-    
     ranking_ontem = criar_ranking(jogadores, 'exp_yesterday')
     ranking_7d = criar_ranking(jogadores, 'exp_7days')
     ranking_30d = criar_ranking(jogadores, 'exp_30days')
@@ -588,8 +840,8 @@ def main():
     data_xp = ontem.strftime('%d/%m')
     
     ranking_data = {
-        'guild': GUILD_NAME,
-        'world': WORLD,
+        'guild': guild,
+        'world': world,
         'last_update': agora_br.strftime('%Y-%m-%d %H:%M:%S'),
         'last_update_display': agora_br.strftime('%d/%m/%Y às %H:%M'),
         'total_members': len(membros_guild),
@@ -601,7 +853,7 @@ def main():
     }
     
     # 7. Salva ranking.json
-    with open(RANKING_PATH, 'w', encoding='utf-8') as f:
+    with open(ranking_path, 'w', encoding='utf-8') as f:
         json.dump(ranking_data, f, ensure_ascii=False, indent=2)
     
     # 8. Gera status.json para o banner
@@ -614,6 +866,8 @@ def main():
         'fonte_xp': 'GuildStats.eu',
         'total_membros_guild': len(membros_guild),
         'total_extras': total_extras,
+        'xp_estimado': estimados,
+        'extras_processados': extras_processados,
         'jogadores_com_xp_ontem': len(ranking_ontem),
         'jogadores_com_xp_7dias': len(ranking_7d),
         'jogadores_com_xp_30dias': len(ranking_30d),
@@ -627,9 +881,11 @@ def main():
         }
     }
     
-    with open(STATUS_PATH, 'w', encoding='utf-8') as f:
+    with open(status_path, 'w', encoding='utf-8') as f:
         json.dump(status_data, f, ensure_ascii=False, indent=2)
     
+    metricas.encerrar_etapa()
+
     # 9. Log final
     print("=" * 70)
     log("ATUALIZAÇÃO CONCLUÍDA!")
@@ -639,4 +895,10 @@ def main():
     print("=" * 70)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Atualiza o ranking de XP")
+    gravacao.adicionar_argumentos(parser)
+    perfil.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    with gravacao.sessao(args), metricas.execucao(gravar=not args.replay), \
+            ritmo.execucao(gravar=not args.replay), perfil.sessao(args):
+        main()
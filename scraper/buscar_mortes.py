@@ -4,13 +4,21 @@ Scraper de Mortes da guild Diehard - Tibia
 Gera mortes_ranking.json e mortes_status.json para o site
 Acumula histórico em mortes_historico.json
 """
-import requests
+import argparse
 import json
 import urllib.parse
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import os
-import time
+import causas
+import crawler
+import fragmentos
+import gravacao
+import metricas
+import perfil
+import prioridade
+import ritmo
+from alvos import alvo_padrao
 
 # ============================================================
 # CONFIGURAÇÕES
@@ -18,11 +26,12 @@ import time
 GUILD_NAME = "Diehard"
 WORLD = "Luminera"
 TIMEZONE = ZoneInfo('America/Sao_Paulo')
-TIBIADATA_API = "https://api.tibiadata.com/v4"
+# Base sobrescrevível por variável de ambiente (ex.: servidor_mock.py local)
+TIBIADATA_API = os.environ.get('TIBIADATA_BASE_URL', 'https://api.tibiadata.com').rstrip('/') + '/v4'
 
 # Caminhos de saída
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-DADOS_DIR = os.path.join(SCRIPT_DIR, '..', 'dados')
+DADOS_DIR = os.environ.get('DADOS_DIR') or os.path.join(SCRIPT_DIR, '..', 'dados')
 HISTORICO_PATH = os.path.join(DADOS_DIR, 'mortes_historico.json')
 RANKING_PATH = os.path.join(DADOS_DIR, 'mortes_ranking.json')
 STATUS_PATH = os.path.join(DADOS_DIR, 'mortes_status.json')
@@ -36,23 +45,23 @@ RETENCAO_DIAS = 90
 # FUNÇÕES UTILITÁRIAS
 # ============================================================
 def agora():
-    """Retorna datetime atual no fuso horário de Brasília."""
-    return datetime.now(TIMEZONE)
+    """Retorna datetime atual no fuso horário de Brasília (gravado no --record)."""
+    return gravacao.agora(TIMEZONE)
 
 def log(msg, icon="ℹ️"):
     """Log com timestamp."""
-    hora = agora().strftime('%H:%M:%S')
+    hora = datetime.now(TIMEZONE).strftime('%H:%M:%S')
     print(f"[{hora}] {icon} {msg}")
 
 # ============================================================
 # FUNÇÕES DE BUSCA DE DADOS
 # ============================================================
-def buscar_membros_guild():
+def buscar_membros_guild(guild=GUILD_NAME):
     """Busca lista de membros da guild via TibiaData API."""
-    log("Buscando membros da guild via TibiaData API...")
+    log(f"Buscando membros da guild {guild} via TibiaData API...")
     try:
-        url = f"{TIBIADATA_API}/guild/{GUILD_NAME}"
-        resp = requests.get(url, timeout=30)
+        url = f"{TIBIADATA_API}/guild/{urllib.parse.quote(guild)}"
+        resp = crawler.obter(url, timeout=30)
         if resp.status_code == 200:
             data = resp.json()
             if 'guild' in data and 'members' in data['guild']:
@@ -70,29 +79,32 @@ def buscar_membros_guild():
         log(f"Erro ao buscar membros: {e}", "❌")
     return {}
 
-def carregar_extras():
+def carregar_extras(path=EXTRAS_PATH):
     """Carrega lista de extras do arquivo JSON."""
-    if os.path.exists(EXTRAS_PATH):
+    if path and os.path.exists(path):
         try:
-            with open(EXTRAS_PATH, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 return [e.get('nome', '') for e in data.get('extras', []) if e.get('nome')]
         except:
             pass
     return []
 
-def carregar_historico():
-    """Carrega histórico de mortes do arquivo JSON."""
-    if os.path.exists(HISTORICO_PATH):
+def carregar_historico(path=HISTORICO_PATH):
+    """Carrega histórico de mortes do arquivo JSON (mortes antigas ganham
+    os assassinos interpretados do texto)."""
+    if os.path.exists(path):
         try:
-            with open(HISTORICO_PATH, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                return data.get('deaths', [])
+                deaths = data.get('deaths', [])
+                causas.completar(deaths)
+                return deaths
         except:
             pass
     return []
 
-def salvar_historico(deaths, cutoff_date):
+def salvar_historico(deaths, cutoff_date, path=HISTORICO_PATH):
     """Salva histórico de mortes, removendo mortes mais antigas que cutoff_date."""
     cutoff_str = cutoff_date.isoformat()
     pruned = [d for d in deaths if d.get('time', '') >= cutoff_str]
@@ -101,7 +113,7 @@ def salvar_historico(deaths, cutoff_date):
         'last_update': agora().strftime('%Y-%m-%d %H:%M:%S'),
         'deaths': pruned
     }
-    with open(HISTORICO_PATH, 'w', encoding='utf-8') as f:
+    with open(path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
     removed = len(deaths) - len(pruned)
@@ -109,43 +121,30 @@ def salvar_historico(deaths, cutoff_date):
         log(f"Pruning: removidas {removed} mortes antigas (>{RETENCAO_DIAS} dias)", "🗑️")
     return pruned
 
-def buscar_mortes_personagem(nome, tentativas=3):
-    """Busca mortes de um personagem via TibiaData API."""
+def buscar_mortes_personagem(nome, tentativas=3, memo=True):
+    """Busca mortes de um personagem via TibiaData API (memo=False ignora a
+    resposta memorizada pelo crawler, para o modo ao vivo)."""
     url = f"{TIBIADATA_API}/character/{urllib.parse.quote(nome)}"
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
 
-    for tentativa in range(tentativas):
+    for _ in range(tentativas):
         try:
-            resp = requests.get(url, headers=headers, timeout=20)
+            resp = crawler.obter(url, headers=headers, timeout=20, memo=memo)
             if resp.status_code == 200 and resp.text.strip():
                 data = resp.json()
                 character = data.get('character', {})
                 char_info = character.get('character', {})
-                deaths_raw = character.get('deaths', [])
-
-                deaths = []
-                for death in deaths_raw:
-                    reason = death.get('reason', 'Unknown')
-                    involved = death.get('involved', [])
-                    is_pk = any(i.get('player', False) for i in involved)
-
-                    deaths.append({
-                        'time': death.get('time', ''),
-                        'level': death.get('level', 0),
-                        'reason': reason,
-                        'is_pk': is_pk
-                    })
+                deaths = [causas.morte(death) for death in character.get('deaths', [])]
 
                 return {
                     'deaths': deaths,
                     'vocation': char_info.get('vocation', ''),
-                    'level': char_info.get('level', 0)
+                    'level': char_info.get('level', 0),
+                    'last_login': char_info.get('last_login', '')
                 }
-            if tentativa < tentativas - 1:
-                time.sleep(5)
         except:
-            if tentativa < tentativas - 1:
-                time.sleep(5)
+            pass
+        # Sem sleep fixo entre tentativas: o crawler segura o host após 429/erro
     return None
 
 def fazer_chave_morte(character, death):
@@ -170,9 +169,10 @@ def limpar_cache_tibiadata():
 # ============================================================
 # CÁLCULO DE RANKINGS
 # ============================================================
-def calcular_rankings(historico, jogadores_info):
-    """Calcula rankings de mortes por período."""
-    agora_br = agora()
+def calcular_rankings(historico, jogadores_info, referencia=None):
+    """Calcula rankings de mortes por período (contados a partir de
+    referencia; padrão: agora)."""
+    agora_br = referencia or agora()
     hoje_inicio = agora_br.replace(hour=0, minute=0, second=0, microsecond=0)
     ontem_inicio = hoje_inicio - timedelta(days=1)
     inicio_7d = hoje_inicio - timedelta(days=7)
@@ -251,27 +251,41 @@ def calcular_rankings(historico, jogadores_info):
 # ============================================================
 # FUNÇÃO PRINCIPAL
 # ============================================================
-def main():
+def main(alvo=None, limpar_cache=True):
+    """limpar_cache=False mantém o cache do TibiaData para os próximos alvos
+    de uma execução multi-guild (executar.py limpa ao final)."""
+    # Alvo (guild/mundo/saída); sem parâmetro usa Diehard/Luminera em dados/
+    alvo = alvo or alvo_padrao()
+    guild = alvo['guild']
+    world = alvo['world']
+    historico_path = os.path.join(alvo['dir'], 'mortes_historico.json')
+    ranking_path = os.path.join(alvo['dir'], 'mortes_ranking.json')
+    status_path = os.path.join(alvo['dir'], 'mortes_status.json')
+
     print("=" * 70)
-    log(f"INICIANDO SCRAPER DE MORTES - {GUILD_NAME}")
+    log(f"INICIANDO SCRAPER DE MORTES - {guild} ({world})")
     log(f"Data/Hora: {agora().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 70)
 
     os.makedirs(DADOS_DIR, exist_ok=True)
+    os.makedirs(alvo['dir'], exist_ok=True)
 
+    metricas.etapa('mortes.historico')
     # 1. Carrega histórico existente
-    historico = carregar_historico()
+    historico = carregar_historico(historico_path)
+    total_carregado = len(historico)
     chaves_existentes = set()
     for d in historico:
         chave = fazer_chave_morte(d.get('character', ''), d)
         chaves_existentes.add(chave)
     log(f"Histórico carregado: {len(historico)} mortes existentes")
 
+    metricas.etapa('mortes.membros')
     # 2. Busca membros da guild
-    membros_guild = buscar_membros_guild()
+    membros_guild = fragmentos.compartilhado(alvo, 'membros', lambda: buscar_membros_guild(guild))
 
     # 3. Carrega extras
-    extras = carregar_extras()
+    extras = carregar_extras(alvo['extras_path'])
 
     # 4. Monta lista completa de jogadores
     jogadores_info = {}
@@ -298,17 +312,21 @@ def main():
 
     log(f"Total de jogadores a buscar: {len(jogadores_info)}")
 
+    metricas.etapa('mortes.api')
     # 5. Carrega cache do buscar_dados.py (extras já buscados)
     cache = carregar_cache_tibiadata()
     cache_hits = 0
     mortes_novas = 0
     jogadores_com_mortes = 0
+    logins = {}
 
-    def processar_mortes(nome, deaths, vocation, level):
+    def processar_mortes(nome, deaths, vocation, level, last_login=''):
         """Processa mortes de um jogador (cache ou API)."""
         nonlocal mortes_novas, jogadores_com_mortes
         info = jogadores_info[nome]
 
+        if last_login:
+            logins[nome.lower()] = last_login
         if vocation:
             info['vocation'] = vocation
         if level:
@@ -326,7 +344,8 @@ def main():
                     'time': death['time'],
                     'level': death['level'],
                     'reason': death['reason'],
-                    'is_pk': death['is_pk']
+                    'is_pk': death['is_pk'],
+                    'killers': death['killers']
                 })
                 chaves_existentes.add(chave)
                 mortes_novas += 1
@@ -335,7 +354,8 @@ def main():
     for nome in list(jogadores_info.keys()):
         if nome in cache:
             cached = cache[nome]
-            processar_mortes(nome, cached.get('deaths', []), cached.get('vocation', ''), cached.get('level', 0))
+            processar_mortes(nome, cached.get('deaths', []), cached.get('vocation', ''), cached.get('level', 0),
+                             cached.get('last_login', ''))
             cache_hits += 1
 
     if cache_hits > 0:
@@ -347,46 +367,63 @@ def main():
 
     falhas = 0
 
+    # Busca em paralelo no ritmo adaptativo do crawler, dos mais valiosos
+    # (ativos, topo do ranking, mortes recentes) para os inativos; processa
+    # na ordem original
+    valores = prioridade.valores(alvo['dir'], agora(), historico)
+    fila = prioridade.ordenar(jogadores_restantes, valores)
+    log(f"Fila: {prioridade.resumo(fila, valores)}", "🎯")
+    prazo = prioridade.Prazo('mortes')
+    resultados = fragmentos.distribuir(alvo, 'mortes', fila, lambda nomes: dict(
+        zip(nomes, crawler.mapear(prazo(buscar_mortes_personagem), nomes))))
     for i, nome in enumerate(jogadores_restantes, 1):
-        if i > 1:
-            time.sleep(1.5)
-
+        resultado = resultados.get(nome)
         if i % 20 == 0:
             log(f"Progresso: {i}/{len(jogadores_restantes)} jogadores processados...")
 
-        resultado = buscar_mortes_personagem(nome)
         if resultado is None:
             falhas += 1
             continue
 
-        processar_mortes(nome, resultado['deaths'], resultado['vocation'], resultado['level'])
+        processar_mortes(nome, resultado['deaths'], resultado['vocation'], resultado['level'],
+                         resultado.get('last_login', ''))
 
     log(f"Busca concluída: {mortes_novas} mortes novas, {jogadores_com_mortes} jogadores com mortes, {falhas} falhas", "✅")
+    if prazo.adiadas:
+        log(f"Prazo: {prazo.adiadas} jogadores de menor valor ficaram para a próxima execução", "⏰")
+    prioridade.atualizar_logins(os.path.join(alvo['dir'], prioridade.LOGIN_ARQUIVO), logins, jogadores_info)
 
     # Limpa cache após uso
-    limpar_cache_tibiadata()
+    if limpar_cache:
+        limpar_cache_tibiadata()
 
+    metricas.etapa('mortes.historico')
     # 6. Pruning e salvar histórico
     cutoff = agora() - timedelta(days=RETENCAO_DIAS)
     cutoff_naive = cutoff.strftime('%Y-%m-%dT00:00:00Z')
+    novas = historico[total_carregado:]
     historico = [d for d in historico if d.get('time', '') >= cutoff_naive]
-    salvar_historico(historico, cutoff)
+    salvo = salvar_historico(historico, cutoff, historico_path)
+    # Índice de assassinos: só as mortes novas são somadas
+    causas.atualizar_indice(os.path.join(alvo['dir'], causas.INDICE_ARQUIVO), salvo, novas, agora())
 
+    metricas.etapa('mortes.rankings')
     # 7. Calcula rankings
     rankings = calcular_rankings(historico, jogadores_info)
 
+    metricas.etapa('mortes.saida')
     # 8. Salva mortes_ranking.json
     agora_br = agora()
     ranking_data = {
-        'guild': GUILD_NAME,
-        'world': WORLD,
+        'guild': guild,
+        'world': world,
         'last_update': agora_br.strftime('%Y-%m-%d %H:%M:%S'),
         'last_update_display': agora_br.strftime('%d/%m/%Y às %H:%M'),
         'total_members': len(membros_guild),
         'rankings': rankings
     }
 
-    with open(RANKING_PATH, 'w', encoding='utf-8') as f:
+    with open(ranking_path, 'w', encoding='utf-8') as f:
         json.dump(ranking_data, f, ensure_ascii=False, indent=2)
 
     # 9. Salva mortes_status.json
@@ -403,9 +440,11 @@ def main():
         'jogadores_com_mortes_alltime': len(rankings['alltime'])
     }
 
-    with open(STATUS_PATH, 'w', encoding='utf-8') as f:
+    with open(status_path, 'w', encoding='utf-8') as f:
         json.dump(status_data, f, ensure_ascii=False, indent=2)
 
+    metricas.encerrar_etapa()
+
     # 10. Log final
     print("=" * 70)
     log("SCRAPER DE MORTES CONCLUÍDO!")
@@ -415,4 +454,10 @@ def main():
     print("=" * 70)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Atualiza o ranking de mortes")
+    gravacao.adicionar_argumentos(parser)
+    perfil.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    with gravacao.sessao(args), metricas.execucao(gravar=not args.replay), \
+            ritmo.execucao(gravar=not args.replay), perfil.sessao(args):
+        main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Dia do servidor do Tibia
+O dia do jogo vira no server save (10h de Berlim), não à meia-noite. O XP
+de "ontem" do GuildStats, as mortes do xp_historico.json e do
+mortes_indice.json e os level-ups do modo ao vivo contam nesse mesmo dia.
+"""
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+SERVER_SAVE_FUSO = ZoneInfo('Europe/Berlin')
+SERVER_SAVE_HORA = 10
+
+def dia_do_servidor(momento):
+    """'AAAA-MM-DD' do dia do servidor de um datetime com fuso."""
+    local = momento.astimezone(SERVER_SAVE_FUSO)
+    return (local - timedelta(hours=SERVER_SAVE_HORA)).strftime('%Y-%m-%d')
+
+def inicio_de_ontem(referencia):
+    """Começo do dia do servidor que o GuildStats chama de "ontem": o server
+    save anterior ao último. O server save desconecta todo mundo, então quem
+    logou antes disso (e não voltou) não ganhou XP ontem."""
+    local = referencia.astimezone(SERVER_SAVE_FUSO)
+    ultimo = local.replace(hour=SERVER_SAVE_HORA, minute=0, second=0, microsecond=0)
+    if ultimo > local:
+        ultimo -= timedelta(days=1)
+    return (ultimo - timedelta(days=1)).astimezone(timezone.utc)
+
+def dia_da_morte(morte):
+    """Dia do servidor da morte (o 'time' da TibiaData é UTC)."""
+    try:
+        quando = datetime.strptime(morte.get('time', ''), '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return morte.get('time', '')[:10]
+    return dia_do_servidor(quando)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Causas de morte
+Interpreta o texto da morte ("Killed at Level 790 by X and Y. Assisted by
+Z.") numa lista de assassinos, com criatura x jogador e assistência, no
+momento em que a morte entra no histórico. Mantém também o índice
+agregado mortes_indice.json (por criatura, por jogador e por período),
+atualizado só com as mortes novas, para que "top criaturas" ou "quem mais
+matou" custem o tamanho da resposta, não o do histórico.
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import timedelta
+import calendario
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+INDICE_ARQUIVO = 'mortes_indice.json'
+# Muda quando o parser passa a gerar outros nomes: o índice salvo é refeito
+INDICE_VERSAO = 3
+# Entradas por lista do índice exportado
+TOP_INDICE = 20
+# Período -> dias antes de hoje (None = tudo que está no histórico)
+PERIODOS = {'yesterday': 1, '7days': 7, '30days': 30, 'alltime': None}
+
+# Qualquer verbo: Killed, Died, Annihilated, Eliminated, Slain, Crushed...
+_PADRAO = re.compile(r'^\w+ at Level \d+ by (.+)$', re.S)
+_SEPARADOR = re.compile(r',\s*|\s+and\s+')
+_INVOCADOR = re.compile(r'^(.+?)\s*\(summoned by (.+)\)$')
+_ARTIGO = re.compile(r'^(?:a|an|the)\s', re.I)
+# "a dragon lord" e "dragon lord" são a mesma criatura no índice
+_ARTIGO_CRIATURA = re.compile(r'^(?:a|an)\s+', re.I)
+
+# ============================================================
+# PARSER
+# ============================================================
+def _nomes(trecho):
+    return [nome.strip() for nome in _SEPARADOR.split(trecho.strip().rstrip('.')) if nome.strip()]
+
+def analisar(reason, involved=None, is_pk=None):
+    """Lista de {'name', 'player', 'assist'} a partir do texto da morte.
+
+    involved (TibiaData) diz quem é jogador; sem ele (mortes antigas do
+    histórico) vale o is_pk da morte e, se houve jogador, a forma do nome
+    ("a dragon lord", "The Pale Worm" e "fire" não são jogadores).
+    Criatura invocada ("a fire elemental (summoned by Bob)") conta pelo
+    próprio nome e leva o invocador em 'summoner'.
+    """
+    involved = involved or []
+    jogadores = {i.get('name', '').lower(): bool(i.get('player')) for i in involved}
+    principal, _, assistencias = (reason or '').partition('. Assisted by ')
+    m = _PADRAO.match(principal.strip())
+    if not m:
+        return [{'name': i.get('name', ''), 'player': bool(i.get('player')), 'assist': False} for i in involved]
+
+    assassinos = []
+    for assist, trecho in ((False, m.group(1)), (True, assistencias)):
+        for nome in _nomes(trecho):
+            invocado = _INVOCADOR.match(nome)
+            if invocado:
+                nome = invocado.group(1)
+            if jogadores:
+                player = jogadores.get(nome.lower(), False)
+            elif is_pk is False:
+                player = False
+            else:
+                player = nome[0].isupper() and not _ARTIGO.match(nome)
+            assassino = {'name': nome, 'player': player, 'assist': assist}
+            if invocado:
+                assassino['summoner'] = invocado.group(2)
+            assassinos.append(assassino)
+    return assassinos
+
+def morte(death):
+    """Morte da TibiaData no formato do histórico (sem o personagem)."""
+    reason = death.get('reason', 'Unknown')
+    involved = death.get('involved', [])
+    return {
+        'time': death.get('time', ''),
+        'level': death.get('level', 0),
+        'reason': reason,
+        'is_pk': any(i.get('player', False) for i in involved),
+        'killers': analisar(reason, involved)
+    }
+
+def completar(historico):
+    """Refaz 'killers' das mortes do histórico com o parser atual: as
+    gravadas antes do parser existir e as que ele ainda não reconhecia
+    (outros verbos, invocador colado ao nome). Quem é jogador vem dos
+    killers já gravados (da TibiaData) e, sem eles, do is_pk."""
+    for d in historico:
+        killers = d.get('killers')
+        if killers:
+            involved = [{'name': k['name'], 'player': k['player']} for k in killers]
+            d['killers'] = analisar(d.get('reason'), involved)
+        else:
+            d['killers'] = analisar(d.get('reason'), is_pk=d.get('is_pk'))
+
+# ============================================================
+# ÍNDICE AGREGADO
+# ============================================================
+def _vazio():
+    return {'n': 0, 'h': 0, 'criaturas': {}, 'jogadores': {}, 'assistencias': {}, 'pks': {}}
+
+def _somar(contagem, chave, n=1):
+    contagem[chave] = contagem.get(chave, 0) + n
+
+def _nome(k):
+    """Nome do assassino no índice: criatura sem o artigo."""
+    return k['name'] if k['player'] else _ARTIGO_CRIATURA.sub('', k['name'])
+
+def _hash(d):
+    """Hash da chave da morte (a mesma de buscar_mortes.fazer_chave_morte).
+    Somado por dia, identifica o conjunto de mortes contado, não só o total."""
+    chave = f"{d.get('character', '')}|{d.get('time', '')}|{d.get('level', 0)}"
+    return int.from_bytes(hashlib.sha256(chave.encode('utf-8')).digest()[:8], 'big')
+
+def _hash_conjunto(hashes):
+    return sum(hashes) % (1 << 64)
+
+def _aplicar(dias, d):
+    """Soma uma morte nos contadores do dia (do servidor) dela."""
+    dia = dias.setdefault(calendario.dia_da_morte(d), _vazio())
+    dia['n'] += 1
+    dia['h'] = _hash_conjunto((dia['h'], _hash(d)))
+    for k in d.get('killers') or []:
+        if k['assist']:
+            _somar(dia['assistencias'], _nome(k))
+        elif k['player']:
+            _somar(dia['jogadores'], k['name'])
+            _somar(dia['pks'].setdefault(d.get('character', ''), {}), k['name'])
+        else:
+            _somar(dia['criaturas'], _nome(k))
+
+def reconstruir(historico):
+    dias = {}
+    for d in historico:
+        _aplicar(dias, d)
+    return dias
+
+def _top(contagem):
+    return [{'nome': nome, 'mortes': n}
+            for nome, n in sorted(contagem.items(), key=lambda item: (-item[1], item[0]))[:TOP_INDICE]]
+
+def exportar(dias, referencia):
+    """Listas prontas por período, a partir dos contadores diários. Os
+    períodos contam em dias do servidor, como as chaves dos contadores."""
+    hoje = calendario.dia_do_servidor(referencia)
+    periodos = {}
+    for periodo, dias_atras in PERIODOS.items():
+        inicio = calendario.dia_do_servidor(referencia - timedelta(days=dias_atras)) if dias_atras else ''
+        soma = _vazio()
+        for dia, contagem in dias.items():
+            if not (inicio <= dia < hoje if periodo == 'yesterday' else dia >= inicio):
+                continue
+            for tipo in ('criaturas', 'jogadores', 'assistencias'):
+                for nome, n in contagem[tipo].items():
+                    _somar(soma[tipo], nome, n)
+            if periodo == 'alltime':
+                for vitima, pks in contagem['pks'].items():
+                    for nome, n in pks.items():
+                        _somar(soma['pks'].setdefault(vitima, {}), nome, n)
+        periodos[periodo] = {tipo: _top(soma[tipo]) for tipo in ('criaturas', 'jogadores', 'assistencias')}
+        if periodo == 'alltime':
+            pks = {vitima: _top(contagem) for vitima, contagem in sorted(soma['pks'].items())}
+    return {'periodos': periodos, 'pks': pks}
+
+def atualizar_indice(path, historico, novas, referencia):
+    """Soma as mortes novas (já incluídas em historico) aos contadores
+    salvos, descarta os dias que saíram do histórico e regrava o JSON. Se
+    os contadores não baterem com o histórico (arquivo ausente, histórico
+    editado à mão), são refeitos do zero: além do total, compara o hash do
+    conjunto de chaves das mortes, que pega uma morte trocada por outra."""
+    dias = None
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                salvo = json.load(f)
+            dias = salvo['dias'] if salvo.get('versao') == INDICE_VERSAO else None
+        except Exception:
+            dias = None
+
+    if dias is not None:
+        # Novas que já caíram no corte da retenção não entram
+        presentes = {id(d) for d in historico}
+        for d in novas:
+            if id(d) in presentes:
+                _aplicar(dias, d)
+        # Mesmo corte (por data) do histórico
+        primeiro = min((calendario.dia_da_morte(d) for d in historico), default='9999')
+        dias = {dia: contagem for dia, contagem in dias.items() if dia >= primeiro}
+        if (sum(contagem['n'] for contagem in dias.values()) != len(historico)
+                or _hash_conjunto(c['h'] for c in dias.values()) != _hash_conjunto(_hash(d) for d in historico)):
+            dias = None
+    if dias is None:
+        dias = reconstruir(historico)
+
+    dados = {
+        'versao': INDICE_VERSAO,
+        'last_update': referencia.strftime('%Y-%m-%d %H:%M:%S'),
+        'mortes': len(historico),
+        **exportar(dias, referencia),
+        'dias': dict(sorted(dias.items()))
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, separators=(',', ':'))
+    return dados
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Crawler compartilhado dos scrapers
+Toda requisição HTTP passa por aqui: segue o ritmo adaptativo de cada host
+(ritmo.py) e memoriza as respostas da execução, para que personagens em
+comum entre guilds (ou entre os dois scrapers) sejam buscados uma única vez
+"""
+import threading
+import time
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+import gravacao
+import http_client
+import metricas
+import perfil
+import ritmo
+from http_client import fetch
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+# Threads de busca de mapear(); o limite real de cada host é do ritmo
+BUSCAS_SIMULTANEAS = ritmo.CONCORRENCIA_MAXIMA
+
+_lock = threading.Lock()
+_memo = {}          # url -> resposta já obtida nesta execução
+_sessoes = {}       # host -> requests.Session (keep-alive)
+_contadores = {'requisicoes': 0, 'reaproveitadas': 0}
+
+# ============================================================
+# FUNÇÕES INTERNAS
+# ============================================================
+def _host(url):
+    return urllib.parse.urlsplit(url).hostname or ''
+
+def _aguardar_vez(host):
+    """Reserva uma vaga e o próximo horário livre do host e dorme até ele."""
+    controle = ritmo.controle(host)
+    espera = controle.reservar()
+    with _lock:
+        _contadores['requisicoes'] += 1
+    if espera > 0:
+        dormir(espera, 'ritmo')
+    return controle
+
+def _sinal(status):
+    """Como a resposta conta para o ritmo do host."""
+    if status == 429 or status == 403 or status >= 500:
+        return 'sobrecarga'
+    if status < 400:
+        return 'ok'
+    return 'neutro'
+
+def _sessao(host):
+    with _lock:
+        if host not in _sessoes:
+            _sessoes[host] = requests.Session()
+        return _sessoes[host]
+
+def _memorizado(chave):
+    with _lock:
+        if chave in _memo:
+            _contadores['reaproveitadas'] += 1
+            return True, _memo[chave]
+    return False, None
+
+# ============================================================
+# API PÚBLICA
+# ============================================================
+def obter(url, headers=None, timeout=30, memo=True):
+    """GET simples (equivalente a requests.get) agendado pelo crawler.
+
+    Respostas 200 ficam memorizadas por URL; memo=False força nova busca
+    (ex.: tabela do GuildStats no loop de espera pela atualização diária).
+    """
+    if memo:
+        achou, resp = _memorizado(('get', url))
+        if achou:
+            return resp
+
+    host = _host(url)
+    controle = _aguardar_vez(host)
+    inicio = time.monotonic()
+    try:
+        if gravacao.reproduzindo():
+            resp = gravacao.reproduzir('get', url)
+        else:
+            try:
+                # Liberação do Cloudflare obtida pelo http_client, se houver
+                liberacao = http_client.liberacao(host)
+                if liberacao:
+                    headers = {**(headers or {}), 'User-Agent': liberacao.user_agent}
+                resp = _sessao(host).get(url, headers=headers, timeout=timeout,
+                                         cookies=liberacao.cookies if liberacao else None)
+            except Exception as e:
+                gravacao.registrar('get', url, erro=e)
+                raise
+            gravacao.registrar('get', url, resp)
+    except Exception:
+        # Timeout / erro de conexão
+        metricas.registrar_requisicao(host, url, time.monotonic() - inicio, 'erro', 0)
+        controle.concluir('sobrecarga')
+        raise
+    latencia = time.monotonic() - inicio
+    metricas.registrar_requisicao(host, url, latencia, resp.status_code, len(resp.content))
+    controle.concluir(_sinal(resp.status_code), latencia, ritmo.retry_after(resp.headers))
+
+    if memo and resp.status_code == 200:
+        with _lock:
+            _memo[('get', url)] = resp
+    return resp
+
+def buscar_html(url, timeout=30, memo=True):
+    """HTML via http_client.fetch (bypass anti-bot) agendado pelo crawler."""
+    if memo:
+        achou, html = _memorizado(('html', url))
+        if achou:
+            return html
+
+    host = _host(url)
+    controle = _aguardar_vez(host)
+    inicio = time.monotonic()
+    try:
+        if gravacao.reproduzindo():
+            html = gravacao.reproduzir('html', url)
+        else:
+            try:
+                html = fetch(url, timeout=timeout)
+            except Exception as e:
+                gravacao.registrar('html', url, erro=e)
+                raise
+            gravacao.registrar('html', url, html)
+    except Exception:
+        # Bloqueio 403 em todas as estratégias, timeout ou erro de conexão
+        metricas.registrar_requisicao(host, url, time.monotonic() - inicio, 'erro', 0)
+        controle.concluir('sobrecarga')
+        raise
+    latencia = time.monotonic() - inicio
+    metricas.registrar_requisicao(host, url, latencia, 200, len(html.encode('utf-8')))
+    controle.concluir('ok', latencia)
+
+    if memo:
+        with _lock:
+            _memo[('html', url)] = html
+    return html
+
+def mapear(funcao, itens):
+    """[funcao(item) for item in itens] com até BUSCAS_SIMULTANEAS em paralelo,
+    na ordem original; cada host limita a própria concorrência."""
+    with ThreadPoolExecutor(max_workers=BUSCAS_SIMULTANEAS) as executor:
+        return list(executor.map(funcao, itens))
+
+class Corrida:
+    """Resultado de correr(): a fonte vencedora, a resposta dela e acesso às
+    demais (resultado() espera a fonte terminar; falha vira None)."""
+    def __init__(self, vencedor, futuros):
+        self.vencedor = vencedor
+        self._futuros = futuros
+
+    def resultado(self, nome):
+        return self._futuros[nome].result()
+
+    @property
+    def dados(self):
+        return self.resultado(self.vencedor) if self.vencedor else None
+
+def correr(chave, fontes, completa):
+    """Consulta todas as fontes em paralelo e fica com a primeira resposta
+    completa (completa(resposta) verdadeiro).
+
+    fontes: lista de (nome, função sem argumentos); a mais rápida nas
+        execuções anteriores (ritmo.ordenar_fontes) sai primeiro e vence empates
+    A latência de cada fonte vai para as métricas e para o ritmo; o
+    vencedor é gravado no --record e repetido no --replay.
+    """
+    funcoes = dict(fontes)
+    ordem = ritmo.ordenar_fontes([nome for nome, _ in fontes])
+    inicio = time.monotonic()
+
+    def consultar(nome):
+        try:
+            resposta = funcoes[nome]()
+        except Exception:
+            resposta = None
+        latencia = time.monotonic() - inicio
+        ok = bool(resposta) and completa(resposta)
+        metricas.registrar_fonte(nome, latencia, ok)
+        if not gravacao.reproduzindo():
+            ritmo.registrar_fonte(nome, latencia)
+        return resposta
+
+    executor = ThreadPoolExecutor(max_workers=len(ordem))
+    futuros = {nome: executor.submit(consultar, nome) for nome in ordem}
+    executor.shutdown(wait=False)
+
+    gravado, vencedor = gravacao.decisao_gravada(chave)
+    if not gravado:
+        vencedor = None
+        pendentes = set(futuros.values())
+        while pendentes and vencedor is None:
+            feitos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            vencedor = next((nome for nome in ordem
+                             if futuros[nome] in feitos and futuros[nome].result() and completa(futuros[nome].result())), None)
+        gravacao.registrar_decisao(chave, vencedor)
+    if vencedor:
+        metricas.registrar_vitoria(vencedor)
+    return Corrida(vencedor, futuros)
+
+def dormir(segundos, motivo='outro'):
+    """Todo sleep dos scrapers passa por aqui (no --replay não dorme; no
+    --profile fica fora do perfil)."""
+    if not gravacao.reproduzindo():
+        metricas.registrar_sono(segundos, motivo)
+        with perfil.pausa():
+            time.sleep(segundos)
+
+def reiniciar():
+    """Esquece as respostas memorizadas e zera os contadores; as sessões
+    (keep-alive) continuam abertas. Usado entre execuções do servico.py."""
+    with _lock:
+        _memo.clear()
+        for chave in _contadores:
+            _contadores[chave] = 0
+
+def estatisticas():
+    """Contadores da execução (requisições reais e respostas reaproveitadas)."""
+    with _lock:
+        return dict(_contadores)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Execução multi-guild dos scrapers
+Roda buscar_dados, buscar_mortes e a análise agregada para todos os alvos
+de dados/alvos.json em um único processo, compartilhando o crawler (ritmo
+por host + respostas memorizadas) e o cache do TibiaData entre as guilds
+"""
+import argparse
+import sys
+import analise
+import buscar_dados
+import buscar_mortes
+import crawler
+import gravacao
+import metricas
+import perfil
+import personagens
+import ritmo
+from alvos import ALVOS_PATH, carregar_alvos
+
+def log(msg, icon="ℹ️"):
+    buscar_dados.log(msg, icon)
+
+def executar(config):
+    """Roda todos os alvos; retorna False se o XP de algum falhou."""
+    alvos = carregar_alvos(config)
+    log(f"Alvos: {', '.join(a['guild'] + '/' + a['world'] for a in alvos)}", "🎯")
+
+    # XP primeiro para todos: o cache do TibiaData gerado pelos extras
+    # é reaproveitado pelo scraper de mortes de qualquer guild
+    falhas_xp = []
+    for alvo in alvos:
+        try:
+            buscar_dados.main(alvo)
+        except Exception as e:
+            log(f"Scraper de XP falhou para {alvo['guild']}: {e}", "❌")
+            falhas_xp.append(alvo['guild'])
+
+    for alvo in alvos:
+        try:
+            buscar_mortes.main(alvo, limpar_cache=False)
+        except Exception as e:
+            log(f"Scraper de mortes falhou para {alvo['guild']}: {e}", "❌")
+
+    buscar_mortes.limpar_cache_tibiadata()
+
+    # Análise agregada e arquivos por personagem só sobre os arquivos
+    # gravados acima (sem rede)
+    for alvo in alvos:
+        try:
+            analise.main(alvo)
+            personagens.main(alvo)
+        except Exception as e:
+            log(f"Análise falhou para {alvo['guild']}: {e}", "❌")
+
+    stats = crawler.estatisticas()
+    log(f"Crawler: {stats['requisicoes']} requisições, {stats['reaproveitadas']} reaproveitadas entre alvos", "📊")
+    for host, estado in ritmo.estados().items():
+        log(f"Ritmo {host}: intervalo {estado['intervalo']}s, até {int(estado['concorrencia'])} simultâneas", "📊")
+
+    return not falhas_xp
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza rankings de XP e mortes de todos os alvos")
+    parser.add_argument('--config', default=ALVOS_PATH, help="arquivo de alvos (padrão: dados/alvos.json)")
+    gravacao.adicionar_argumentos(parser)
+    perfil.adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    with gravacao.sessao(args), metricas.execucao(gravar=not args.replay), \
+            ritmo.execucao(gravar=not args.replay), perfil.sessao(args):
+        ok = executar(args.config)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
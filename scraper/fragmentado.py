@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Execução fragmentada (vários processos ou jobs)
+Divide a coleta por personagem em N fragmentos (ver fragmentos.py):
+
+    python scraper/fragmentado.py preparar                         # membros + tabela do GuildStats
+    python scraper/fragmentado.py coletar --fragmento 0 --total 4  # um por processo/job
+    python scraper/fragmentado.py juntar --total 4                 # grava os arquivos de sempre
+
+ou tudo numa máquina, com os fragmentos em processos paralelos:
+
+    python scraper/fragmentado.py local --total 4
+
+Base e partes ficam em dados/_fragmentos/. Os fragmentos rodam os scrapers
+numa cópia temporária dos dados do alvo, então nada em dados/ muda até a
+junção; repetir a junção com as mesmas partes dá o mesmo resultado.
+Cada processo tem o próprio ritmo por host: N fragmentos no mesmo IP somam
+N vezes o ritmo de um.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import buscar_dados
+import buscar_mortes
+import executar
+import fragmentos
+import gravacao
+import metricas
+import perfil
+import ritmo
+from alvos import ALVOS_PATH, carregar_alvos, slug
+
+def log(msg, icon="ℹ️"):
+    buscar_dados.log(msg, icon)
+
+# ============================================================
+# ETAPAS
+# ============================================================
+def preparar(config):
+    """Buscas únicas de cada alvo, gravadas na base dos fragmentos."""
+    fragmentos.preparar()
+    for alvo in carregar_alvos(config):
+        log(f"Preparando {alvo['guild']}/{alvo['world']}", "🎯")
+        fragmentos.compartilhado(alvo, 'membros', lambda: buscar_dados.buscar_membros_guild(alvo['guild']))
+        fragmentos.compartilhado(alvo, 'xp_guildstats',
+                                 lambda: buscar_dados.aguardar_xp_guildstats(alvo['guild'], alvo['world']))
+    fragmentos.gravar_base()
+    fragmentos.encerrar()
+
+def _copia(alvo, raiz):
+    """Alvo apontando para uma cópia dos arquivos dele (só o nível de cima e
+    o extras.json), para o fragmento não mexer em dados/."""
+    destino = os.path.join(raiz, f"{slug(alvo['guild'])}-{slug(alvo['world'])}")
+    os.makedirs(destino, exist_ok=True)
+    for nome in os.listdir(alvo['dir']) if os.path.isdir(alvo['dir']) else []:
+        origem = os.path.join(alvo['dir'], nome)
+        if os.path.isfile(origem):
+            shutil.copy2(origem, destino)
+    copia = {**alvo, 'dir': destino}
+    if alvo['extras_path']:
+        copia['extras_path'] = os.path.join(destino, os.path.relpath(alvo['extras_path'], alvo['dir']))
+        if os.path.exists(alvo['extras_path']):
+            os.makedirs(os.path.dirname(copia['extras_path']), exist_ok=True)
+            shutil.copy2(alvo['extras_path'], copia['extras_path'])
+    return copia
+
+def coletar(config, indice, total):
+    """Roda os scrapers de todos os alvos buscando só as chaves do fragmento."""
+    fragmentos.coletar(indice, total)
+    raiz = tempfile.mkdtemp(prefix=f"fragmento-{indice}-")
+    # Cache TibiaData do XP -> mortes também fica na cópia
+    cache_original = buscar_dados.CACHE_PATH, buscar_mortes.CACHE_PATH
+    buscar_dados.CACHE_PATH = buscar_mortes.CACHE_PATH = os.path.join(raiz, '_cache_tibiadata.json')
+    try:
+        for alvo in carregar_alvos(config):
+            copia = _copia(alvo, raiz)
+            try:
+                buscar_dados.main(copia)
+                buscar_mortes.main(copia, limpar_cache=False)
+            except Exception as e:
+                log(f"Fragmento {indice} falhou em {alvo['guild']}: {e}", "❌")
+                raise
+        fragmentos.gravar_parte()
+    finally:
+        buscar_dados.CACHE_PATH, buscar_mortes.CACHE_PATH = cache_original
+        fragmentos.encerrar()
+        shutil.rmtree(raiz, ignore_errors=True)
+
+def juntar(config, total):
+    """executar.py com as buscas por personagem servidas pelas partes."""
+    fragmentos.juntar(total)
+    try:
+        return executar.executar(config)
+    finally:
+        fragmentos.encerrar()
+
+def local(config, total):
+    """Preparação e junção neste processo, fragmentos em processos paralelos."""
+    preparar(config)
+    processos = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), 'coletar',
+                          '--fragmento', str(i), '--total', str(total), '--config', config])
+        for i in range(total)
+    ]
+    falhas = [i for i, p in enumerate(processos) if p.wait() != 0]
+    if falhas:
+        log(f"Fragmentos com erro: {falhas} (as chaves deles são buscadas na junção)", "⚠️")
+    return juntar(config, total)
+
+def main():
+    parser = argparse.ArgumentParser(description="Coleta fragmentada por personagem com junção determinística")
+    parser.add_argument('etapa', choices=('preparar', 'coletar', 'juntar', 'local'))
+    parser.add_argument('--config', default=ALVOS_PATH, help="arquivo de alvos (padrão: dados/alvos.json)")
+    parser.add_argument('--total', type=int, default=4, help="número de fragmentos")
+    parser.add_argument('--fragmento', type=int, help="índice do fragmento (coletar)")
+    gravacao.adicionar_argumentos(parser)
+    perfil.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    if args.etapa == 'coletar' and args.fragmento is None:
+        parser.error("coletar precisa de --fragmento")
+
+    # metricas.json e ritmo.json ficam com a execução que grava os dados
+    completa = args.etapa in ('juntar', 'local') and not args.replay
+    ok = True
+    with gravacao.sessao(args), metricas.execucao(gravar=completa), \
+            ritmo.execucao(gravar=completa), perfil.sessao(args):
+        if args.etapa == 'preparar':
+            preparar(args.config)
+        elif args.etapa == 'coletar':
+            coletar(args.config, args.fragmento, args.total)
+        elif args.etapa == 'juntar':
+            ok = juntar(args.config, args.total)
+        else:
+            ok = local(args.config, args.total)
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Coleta fragmentada por personagem
+Os personagens (membros + extras) são divididos em N fragmentos por um hash
+estável do nome. Cada fragmento é coletado por um processo ou job próprio
+e só guarda os resultados por personagem; a junção roda os scrapers de
+sempre, servindo as buscas a partir desses resultados, e grava os mesmos
+ranking.json, mortes_historico.json e status de uma execução serial.
+
+Os scrapers passam por aqui nos dois tipos de busca:
+  - compartilhado(): buscas únicas do alvo (membros, tabela do GuildStats),
+    feitas uma vez na preparação e lidas da base pelos fragmentos e pela
+    junção, para que todos vejam o mesmo roster e o mesmo XP;
+  - distribuir(): buscas por personagem; cada fragmento busca só as suas
+    chaves e a junção usa o resultado do fragmento dono de cada chave.
+Fora do modo fragmentado as duas funções só chamam a busca.
+"""
+import hashlib
+import json
+import os
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FRAGMENTOS_DIR = os.path.join(os.environ.get('DADOS_DIR') or os.path.join(SCRIPT_DIR, '..', 'dados'), '_fragmentos')
+BASE_ARQUIVO = 'base.json'
+
+_modo = None            # None, 'preparar', 'coletar' ou 'juntar'
+_fragmento = None
+_total = None
+_base = {}              # chave compartilhada -> resultado
+_parte = {}             # etapa -> {chave: resultado} (coletar: o deste fragmento; juntar: de todos)
+
+def log(msg, icon="ℹ️"):
+    print(f"  [fragmentos] {icon} {msg}")
+
+def fragmento(chave, total):
+    """Fragmento dono da chave: hash estável do nome em minúsculas, igual em
+    qualquer processo ou máquina (o hash() do Python muda a cada execução).
+    Todas as buscas de um personagem caem no mesmo fragmento."""
+    return int(hashlib.sha1(chave.lower().encode('utf-8')).hexdigest(), 16) % total
+
+def _etapa(alvo, nome):
+    return f"{alvo['guild']}/{alvo['world']}:{nome}"
+
+def caminho_base(diretorio=FRAGMENTOS_DIR):
+    return os.path.join(diretorio, BASE_ARQUIVO)
+
+def caminho_parte(indice, total, diretorio=FRAGMENTOS_DIR):
+    return os.path.join(diretorio, f"parte-{indice}-de-{total}.json")
+
+def _hash_base(base):
+    return hashlib.sha256(json.dumps(base, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def _ler(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _gravar(path, dados):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, separators=(',', ':'))
+
+# ============================================================
+# MODOS
+# ============================================================
+def preparar():
+    """Buscas compartilhadas vão para a base (gravar_base ao final)."""
+    global _modo
+    _modo = 'preparar'
+    _base.clear()
+
+def gravar_base(diretorio=FRAGMENTOS_DIR):
+    _gravar(caminho_base(diretorio), _base)
+    log(f"Base gravada: {len(_base)} buscas compartilhadas", "💾")
+
+def coletar(indice, total, diretorio=FRAGMENTOS_DIR):
+    """Fragmento `indice` de `total`: lê a base e busca só as suas chaves."""
+    global _modo, _fragmento, _total
+    if not 0 <= indice < total:
+        raise ValueError(f"fragmento {indice} fora de 0..{total - 1}")
+    _modo, _fragmento, _total = 'coletar', indice, total
+    _base.clear()
+    _base.update(_ler(caminho_base(diretorio)))
+    _parte.clear()
+
+def gravar_parte(diretorio=FRAGMENTOS_DIR):
+    path = caminho_parte(_fragmento, _total, diretorio)
+    _gravar(path, {
+        'fragmento': _fragmento,
+        'total': _total,
+        'base': _hash_base(_base),
+        'etapas': _parte
+    })
+    log(f"Fragmento {_fragmento}/{_total}: {sum(len(r) for r in _parte.values())} resultados em {os.path.basename(path)}", "💾")
+
+def juntar(total, diretorio=FRAGMENTOS_DIR):
+    """Carrega a base e as partes 0..total-1. Cada chave vem só da parte do
+    seu fragmento (resto de execuções anteriores com outro total ou parte
+    repetida não entra); partes de outra base são recusadas. Retorna os
+    índices das partes ausentes: as chaves delas são buscadas na junção."""
+    global _modo, _total
+    _modo, _total = 'juntar', total
+    _base.clear()
+    _base.update(_ler(caminho_base(diretorio)))
+    _parte.clear()
+    hash_base = _hash_base(_base)
+
+    ausentes = []
+    for indice in range(total):
+        path = caminho_parte(indice, total, diretorio)
+        if not os.path.exists(path):
+            ausentes.append(indice)
+            continue
+        parte = _ler(path)
+        if parte.get('base') != hash_base or parte.get('total') != total or parte.get('fragmento') != indice:
+            log(f"{os.path.basename(path)} é de outra preparação, ignorada", "⚠️")
+            ausentes.append(indice)
+            continue
+        for etapa, resultados in parte['etapas'].items():
+            destino = _parte.setdefault(etapa, {})
+            for chave, resultado in resultados.items():
+                if fragmento(chave, total) == indice:
+                    destino[chave] = resultado
+    if ausentes:
+        log(f"Partes ausentes: {ausentes} (as chaves delas serão buscadas agora)", "⚠️")
+    return ausentes
+
+def encerrar():
+    global _modo, _fragmento, _total
+    _modo = _fragmento = _total = None
+    _base.clear()
+    _parte.clear()
+
+# ============================================================
+# PONTOS DE BUSCA (usados pelos scrapers)
+# ============================================================
+def compartilhado(alvo, nome, buscar):
+    """Busca única do alvo; fora da preparação vem da base, se estiver lá."""
+    chave = _etapa(alvo, nome)
+    if _modo in ('coletar', 'juntar') and chave in _base:
+        return _base[chave]
+    resultado = buscar()
+    if _modo == 'preparar':
+        _base[chave] = resultado
+    return resultado
+
+def distribuir(alvo, nome, chaves, buscar):
+    """{chave: resultado} das buscas por personagem.
+
+    buscar(lista de chaves) -> {chave: resultado}. Coletando, só as chaves
+    deste fragmento são buscadas (as demais ficam sem resultado); juntando,
+    os resultados vêm das partes e só o que nenhuma parte trouxe é buscado.
+    """
+    if _modo == 'coletar':
+        minhas = [c for c in chaves if fragmento(c, _total) == _fragmento]
+        resultados = buscar(minhas) if minhas else {}
+        _parte.setdefault(_etapa(alvo, nome), {}).update(resultados)
+        return resultados
+    if _modo == 'juntar':
+        prontos = _parte.get(_etapa(alvo, nome), {})
+        faltando = [c for c in chaves if c not in prontos]
+        resultados = {c: prontos[c] for c in chaves if c in prontos}
+        if faltando:
+            log(f"{nome}: {len(faltando)} chaves sem parte, buscando", "⚠️")
+            resultados.update(buscar(faltando))
+        return resultados
+    return buscar(chaves)
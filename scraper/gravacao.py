@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Gravação e reprodução offline do tráfego HTTP dos scrapers
+--record ARQ  grava cada requisição/resposta do crawler, as leituras de
+              relógio e um retrato dos JSONs de dados/ num arquivo .json.gz
+--replay ARQ  roda o mesmo comando num processo filho com DADOS_DIR numa
+              pasta temporária: restaura o retrato lá, responde tudo a partir
+              do arquivo, sem rede e sem sleeps, e confere se a saída bate
+              byte a byte. O dados/ de verdade não é tocado
+"""
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# DADOS_DIR no ambiente troca a pasta de dados em todos os módulos
+DADOS_DIR = os.path.normpath(os.environ.get('DADOS_DIR') or os.path.join(SCRIPT_DIR, '..', 'dados'))
+
+VERSAO = 1
+
+# Marca do processo filho do --replay (já roda na pasta temporária)
+COPIA_ENV = 'GRAVACAO_COPIA'
+
+# Arquivos de dados/ que mudam a cada execução por natureza (fora do retrato e da comparação)
+NAO_DETERMINISTICOS = {'metricas.json', 'ritmo.json'}
+
+_lock = threading.Lock()
+_modo = None         # None, 'gravar' ou 'reproduzir'
+_arquivo = None
+_respostas = {}      # "tipo url" -> lista de respostas na ordem em que ocorreram
+_relogio = []        # leituras de agora() na ordem
+_decisoes = {}       # chave -> decisões dependentes de tempo (ex.: vencedor de corrida)
+_posicoes = {}       # reprodução: próxima resposta de cada chave
+_pos_relogio = 0
+_retrato = {}        # caminho relativo a dados/ -> conteúdo
+_hashes = {}         # caminho relativo a dados/ -> sha256 ao fim da gravação
+
+class RespostaGravada:
+    """Resposta reproduzida com a mesma interface usada de requests.Response."""
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"{self.status_code} (resposta gravada)")
+
+class RequisicaoNaoGravada(Exception):
+    pass
+
+# ============================================================
+# ESTADO
+# ============================================================
+def gravando():
+    return _modo == 'gravar'
+
+def reproduzindo():
+    return _modo == 'reproduzir'
+
+def _chave(tipo, url):
+    return f"{tipo} {url}"
+
+def _arquivos_dados():
+    """JSONs e feeds .jsonl versionados em dados/ (caches temporários com _ inclusos)."""
+    arquivos = []
+    for raiz, _, nomes in os.walk(DADOS_DIR):
+        for nome in nomes:
+            if nome.endswith(('.json', '.jsonl')) and nome not in NAO_DETERMINISTICOS:
+                caminho = os.path.join(raiz, nome)
+                arquivos.append(os.path.relpath(caminho, DADOS_DIR))
+    return sorted(arquivos)
+
+def _sha256(caminho):
+    with open(caminho, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# ============================================================
+# GRAVAÇÃO
+# ============================================================
+def iniciar_gravacao(caminho):
+    global _modo, _arquivo
+    _modo = 'gravar'
+    _arquivo = caminho
+    _respostas.clear()
+    _relogio.clear()
+    _decisoes.clear()
+    _retrato.clear()
+    for rel in _arquivos_dados():
+        with open(os.path.join(DADOS_DIR, rel), 'r', encoding='utf-8') as f:
+            _retrato[rel] = f.read()
+
+def registrar(tipo, url, resposta=None, erro=None):
+    """Guarda uma resposta (requests.Response ou HTML) ou o erro ocorrido."""
+    if not gravando():
+        return
+    if erro is not None:
+        item = {'erro': str(erro)}
+    elif isinstance(resposta, str):
+        item = {'html': resposta}
+    else:
+        item = {
+            'status': resposta.status_code,
+            'text': resposta.text,
+            'headers': {k: v for k, v in resposta.headers.items() if k.lower() == 'retry-after'}
+        }
+    with _lock:
+        _respostas.setdefault(_chave(tipo, url), []).append(item)
+
+def finalizar_gravacao():
+    global _modo
+    hashes = {rel: _sha256(os.path.join(DADOS_DIR, rel)) for rel in _arquivos_dados()}
+    conteudo = {
+        'versao': VERSAO,
+        'respostas': _respostas,
+        'relogio': _relogio,
+        'decisoes': _decisoes,
+        'retrato': _retrato,
+        'hashes': hashes
+    }
+    with gzip.open(_arquivo, 'wt', encoding='utf-8') as f:
+        json.dump(conteudo, f, ensure_ascii=False, separators=(',', ':'))
+    total = sum(len(v) for v in _respostas.values())
+    print(f"[gravacao] 💾 {total} respostas gravadas em {_arquivo}")
+    _modo = None
+
+# ============================================================
+# REPRODUÇÃO
+# ============================================================
+def iniciar_reproducao(caminho):
+    global _modo, _arquivo, _pos_relogio
+    with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+        conteudo = json.load(f)
+    if conteudo.get('versao') != VERSAO:
+        raise ValueError(f"Versão de gravação não suportada: {conteudo.get('versao')}")
+
+    _modo = 'reproduzir'
+    _arquivo = caminho
+    _respostas.clear()
+    _respostas.update(conteudo['respostas'])
+    _relogio[:] = conteudo['relogio']
+    _decisoes.clear()
+    _decisoes.update(conteudo.get('decisoes', {}))
+    _posicoes.clear()
+    _pos_relogio = 0
+    _hashes.clear()
+    _hashes.update(conteudo.get('hashes', {}))
+
+    # Restaura a pasta de dados (a temporária) como estava no início da gravação
+    for rel in _arquivos_dados():
+        if rel not in conteudo['retrato']:
+            os.remove(os.path.join(DADOS_DIR, rel))
+    for rel, texto in conteudo['retrato'].items():
+        destino = os.path.join(DADOS_DIR, rel)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    print(f"[gravacao] ▶️ Reproduzindo {caminho} ({DADOS_DIR} restaurado do retrato)")
+
+def reproduzir(tipo, url):
+    """Próxima resposta gravada para a URL; repete a última se acabarem."""
+    chave = _chave(tipo, url)
+    with _lock:
+        itens = _respostas.get(chave)
+        if not itens:
+            raise RequisicaoNaoGravada(f"Requisição não gravada: {chave}")
+        pos = _posicoes.get(chave, 0)
+        _posicoes[chave] = pos + 1
+        item = itens[min(pos, len(itens) - 1)]
+
+    if 'erro' in item:
+        raise Exception(item['erro'])
+    if 'html' in item:
+        return item['html']
+    return RespostaGravada(item['status'], item['text'], item.get('headers'))
+
+def finalizar_reproducao():
+    """Compara a saída com os hashes gravados; retorna True se idêntica."""
+    global _modo
+    _modo = None
+    atuais = {rel: _sha256(os.path.join(DADOS_DIR, rel)) for rel in _arquivos_dados()}
+    diferentes = sorted(rel for rel in set(atuais) | set(_hashes) if atuais.get(rel) != _hashes.get(rel))
+    if diferentes:
+        print(f"[gravacao] ❌ Saída difere da gravação: {', '.join(diferentes)}")
+        return False
+    print(f"[gravacao] ✅ Saída idêntica à gravação ({len(atuais)} arquivos)")
+    return True
+
+# ============================================================
+# RELÓGIO
+# ============================================================
+def agora(tz):
+    """datetime.now(tz) gravado/reproduzido, para a saída ser reprodutível."""
+    global _pos_relogio
+    if reproduzindo():
+        with _lock:
+            if _relogio:
+                valor = _relogio[min(_pos_relogio, len(_relogio) - 1)]
+                _pos_relogio += 1
+                return datetime.fromisoformat(valor)
+    valor = datetime.now(tz)
+    if gravando():
+        with _lock:
+            _relogio.append(valor.isoformat())
+    return valor
+
+# ============================================================
+# DECISÕES
+# ============================================================
+def decisao_gravada(chave):
+    """No --replay, (True, valor) da próxima decisão gravada com essa chave;
+    fora dele, (False, None)."""
+    if not reproduzindo():
+        return False, None
+    with _lock:
+        itens = _decisoes.get(chave)
+        if not itens:
+            raise RequisicaoNaoGravada(f"Decisão não gravada: {chave}")
+        pos = _posicoes.get(('decisao', chave), 0)
+        _posicoes[('decisao', chave)] = pos + 1
+        return True, itens[min(pos, len(itens) - 1)]
+
+def registrar_decisao(chave, valor):
+    """Guarda uma decisão que depende de tempo (ex.: qual fonte respondeu
+    primeiro), para o --replay repetir a mesma."""
+    if gravando():
+        with _lock:
+            _decisoes.setdefault(chave, []).append(valor)
+
+# ============================================================
+# LINHA DE COMANDO
+# ============================================================
+def _reproduzir_em_copia():
+    """Roda o mesmo comando num processo filho com DADOS_DIR numa pasta
+    temporária (os caminhos são montados na importação dos módulos).
+    Retorna o código de saída; com saída diferente a pasta fica para
+    comparar."""
+    temporario = tempfile.mkdtemp(prefix='replay-')
+    env = {**os.environ, 'DADOS_DIR': temporario, COPIA_ENV: '1'}
+    codigo = subprocess.call([sys.executable] + sys.argv, env=env)
+    if codigo == 0:
+        shutil.rmtree(temporario, ignore_errors=True)
+    else:
+        print(f"[gravacao] Saída da reprodução mantida em {temporario}")
+    return codigo
+
+def adicionar_argumentos(parser):
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--record', metavar='ARQ', help="grava o tráfego HTTP em ARQ (.json.gz)")
+    grupo.add_argument('--replay', metavar='ARQ', help="reproduz ARQ sem rede e sem sleeps")
+
+@contextlib.contextmanager
+def sessao(args):
+    """Envolve uma execução conforme --record/--replay."""
+    if getattr(args, 'record', None):
+        iniciar_gravacao(args.record)
+    elif getattr(args, 'replay', None):
+        if not os.environ.get(COPIA_ENV):
+            raise SystemExit(_reproduzir_em_copia())
+        iniciar_reproducao(args.replay)
+
+    try:
+        yield
+    finally:
+        # Gravação parcial também é salva (útil para depurar a falha)
+        if gravando():
+            finalizar_gravacao()
+
+    if reproduzindo() and not finalizar_reproducao():
+        raise SystemExit(1)
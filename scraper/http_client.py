@@ -1,76 +1,269 @@
-
+import collections
+import os
+import queue
+import threading
 import time
+import urllib.parse
+from datetime import datetime
 import requests
+import metricas
+import perfil
 
-def fetch(url, timeout=30) -> str:
-    """
-    Retorna HTML da URL, tentando múltiplas estratégias anti-bot:
-    1. cloudscraper
-    2. curl_cffi
-    3. Playwright
-    """
-    
-    # 1. curl_cffi (Impersonate browser TLS fingerprint)
-    try:
-        from curl_cffi import requests as curl_requests
-        # print(f"  [http_client] Tentando curl_cffi (chrome) para {url}...")
-        resp = curl_requests.get(url, impersonate="chrome", timeout=timeout)
-        if resp.status_code == 200 and "Just a moment..." not in resp.text:
-            print(f"  [http_client] ✅ Sucesso com curl_cffi ({url[:50]}...)")
-            return resp.text
-        if resp.status_code == 403 or "Just a moment..." in resp.text:
-            print(f"  [http_client] ⚠️ curl_cffi falhou (403 ou block)")
-    except ImportError:
-        pass
-    except Exception as e:
-        print(f"  [http_client] ❌ Erro no curl_cffi: {e}")
+# Hedging (HTTP_HEDGE=1): se a estratégia em curso não responder dentro do
+# p90 recente dela, a próxima começa em paralelo; a primeira resposta válida
+# vence e as outras são canceladas. Sem hedging, uma estratégia por vez.
+HEDGE = os.environ.get('HTTP_HEDGE') == '1'
+HEDGE_AMOSTRAS = 50             # latências de sucesso guardadas por estratégia
+HEDGE_AMOSTRAS_MINIMAS = 5
+HEDGE_LIMIAR_PADRAO = 5.0       # segundos, enquanto não há amostras suficientes
+HEDGE_LIMIAR_MINIMO = 0.5
 
-    # 2. cloudscraper (Tenta resolver Cloudflare v1/v2)
-    try:
-        import cloudscraper
-        # print(f"  [http_client] Tentando cloudscraper para {url}...")
-        scraper = cloudscraper.create_scraper()
-        resp = scraper.get(url, timeout=timeout)
-        if resp.status_code == 200 and "Just a moment..." not in resp.text:
-            print(f"  [http_client] ✅ Sucesso com cloudscraper ({url[:50]}...)")
-            return resp.text
-        if resp.status_code == 403 or "Just a moment..." in resp.text:
-            print(f"  [http_client] ⚠️ cloudscraper falhou (403 ou block)")
-    except ImportError:
-        pass
-    except Exception as e:
-        print(f"  [http_client] ❌ Erro no cloudscraper: {e}")
+DESAFIO = "Just a moment..."
+# User Agent moderno para evitar bloqueios triviais
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+
+# Validade assumida da liberação quando o cf_clearance não traz expiração
+LIBERACAO_VALIDADE_PADRAO = 30 * 60   # segundos
+
+_lock = threading.Lock()
+_latencias = collections.defaultdict(lambda: collections.deque(maxlen=HEDGE_AMOSTRAS))
+_liberacoes = {}                      # host -> Liberacao
+_resolvendo = {}                      # host -> Lock (um navegador resolvendo por host)
+
+class Bloqueado(Exception):
+    """403 ou página de desafio do Cloudflare."""
+
+class Cancelada(Exception):
+    """Outra estratégia já respondeu."""
+
+# ============================================================
+# LIBERAÇÃO DO CLOUDFLARE
+# ============================================================
+# O Playwright resolve o desafio uma vez por host; os cookies da página
+# (cf_clearance) e o user agent com que foram obtidos passam a acompanhar as
+# requisições do curl_cffi, do cloudscraper e do crawler.obter até expirarem
+# ou o desafio voltar, quando o próximo Playwright resolve de novo. Fica só
+# em memória: nada de cookie em disco ou no cache.
+class Liberacao:
+    def __init__(self, cookies, user_agent, expira):
+        self.cookies = cookies          # {nome: valor}
+        self.user_agent = user_agent
+        self.expira = expira            # time.time()
+
+    def valida(self):
+        return time.time() < self.expira
+
+def _host(url):
+    return urllib.parse.urlsplit(url).hostname or ''
+
+def liberacao(host):
+    """Liberação ainda válida do host, ou None."""
+    with _lock:
+        atual = _liberacoes.get(host)
+    return atual if atual and atual.valida() else None
+
+def invalidar(host, usada):
+    """Descarta a liberação que levou desafio (só se ainda for a mesma:
+    outra thread pode já ter resolvido de novo)."""
+    with _lock:
+        if _liberacoes.get(host) is not usada:
+            return
+        del _liberacoes[host]
+    print(f"  [http_client] 🔒 Liberação de {host} recusada, será resolvida de novo")
+
+def _guardar_liberacao(host, cookies, user_agent):
+    """cookies: lista do Playwright (context.cookies). Retorna a Liberacao ou
+    None se a página não deixou cf_clearance."""
+    clearance = next((c for c in cookies if c['name'] == 'cf_clearance'), None)
+    if not clearance:
+        return None
+    expira = clearance.get('expires', -1)
+    if not expira or expira <= 0:
+        expira = time.time() + LIBERACAO_VALIDADE_PADRAO
+    nova = Liberacao({c['name']: c['value'] for c in cookies}, user_agent, expira)
+    with _lock:
+        _liberacoes[host] = nova
+    print(f"  [http_client] 🔑 Liberação de {host} obtida, válida até {datetime.fromtimestamp(expira):%H:%M}")
+    return nova
+
+def _trava_resolucao(host):
+    with _lock:
+        return _resolvendo.setdefault(host, threading.Lock())
+
+# ============================================================
+# ESTRATÉGIAS
+# ============================================================
+def _validar(status, texto):
+    if status == 200 and DESAFIO not in texto:
+        return texto
+    if status == 403 or DESAFIO in texto:
+        raise Bloqueado(f"status {status}")
+    raise Exception(f"status {status}")
 
-    # 3. Playwright (Último recurso, renderiza JS completo)
+def _com_liberacao(url, obter):
+    """Chama obter(cookies, headers) com a liberação do host, se houver; um
+    desafio com liberação aplicada a invalida."""
+    host = _host(url)
+    atual = liberacao(host)
+    if not atual:
+        return obter(None, None)
     try:
-        from playwright.sync_api import sync_playwright
+        return obter(atual.cookies, {'User-Agent': atual.user_agent})
+    except Bloqueado:
+        invalidar(host, atual)
+        raise
+
+def _curl_cffi(url, timeout, cancelado):
+    """Impersonate browser TLS fingerprint."""
+    from curl_cffi import requests as curl_requests
+
+    def obter(cookies, headers):
+        resp = curl_requests.get(url, impersonate="chrome", timeout=timeout, cookies=cookies, headers=headers)
+        return _validar(resp.status_code, resp.text)
+    return _com_liberacao(url, obter)
+
+def _cloudscraper(url, timeout, cancelado):
+    """Tenta resolver Cloudflare v1/v2."""
+    import cloudscraper
+    scraper = cloudscraper.create_scraper()
+
+    def obter(cookies, headers):
+        resp = scraper.get(url, timeout=timeout, cookies=cookies, headers=headers)
+        return _validar(resp.status_code, resp.text)
+    return _com_liberacao(url, obter)
+
+def _playwright(url, timeout, cancelado):
+    """Último recurso, renderiza JS completo e guarda a liberação do host."""
+    from playwright.sync_api import sync_playwright
+    host = _host(url)
+    anterior = liberacao(host)
+    # Um navegador por host: quem chega enquanto outro resolve espera e usa
+    # a liberação que ele deixar
+    with _trava_resolucao(host):
+        if cancelado.is_set():
+            raise Cancelada()
+        atual = liberacao(host)
+        if atual and atual is not anterior:
+            return _curl_cffi(url, timeout, cancelado)
+
         print(f"  [http_client] ⚠️ Iniciando Playwright para {url}...")
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
-            # User Agent moderno para evitar bloqueios triviais
-            ua = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-            page = browser.new_page(user_agent=ua)
-            
-            # Navega até a URL
-            response = page.goto(url, wait_until="networkidle", timeout=timeout * 1000)
-            
-            # Pequena espera extra para segurança
-            time.sleep(3)
-            
-            if response and response.status == 200:
-                content = page.content()
+            try:
+                context = browser.new_context(user_agent=USER_AGENT)
+                page = context.new_page()
+
+                # Navega até a URL
+                response = page.goto(url, wait_until="networkidle", timeout=timeout * 1000)
+
+                # Desafio: o JS do Cloudflare grava o cf_clearance e recarrega a página
+                desafio = DESAFIO in page.title()
+                if desafio:
+                    page.wait_for_function(f"() => !document.title.includes({DESAFIO!r})",
+                                           timeout=timeout * 1000)
+                    page.wait_for_load_state("networkidle")
+
+                # Pequena espera extra para segurança (interrompida se outra estratégia venceu)
+                with perfil.pausa():
+                    cancelado.wait(3)
+                _guardar_liberacao(host, context.cookies(url), USER_AGENT)
+                if cancelado.is_set():
+                    raise Cancelada()
+
+                status = 200 if desafio else (response.status if response else "unknown")
+                return _validar(status, page.content())
+            finally:
                 browser.close()
-                print(f"  [http_client] ✅ Sucesso com Playwright ({url[:50]}...)")
-                return content
-            
-            status = response.status if response else "unknown"
-            browser.close()
-            print(f"  [http_client] ❌ Playwright falhou com status {status}")
-                
+
+ESTRATEGIAS = [
+    ('curl_cffi', _curl_cffi),
+    ('cloudscraper', _cloudscraper),
+    ('playwright', _playwright),
+]
+
+# ============================================================
+# EXECUÇÃO
+# ============================================================
+def _executar(nome, funcao, url, timeout, cancelado):
+    """Roda uma estratégia; retorna o HTML ou None (falhou, ausente ou cancelada)."""
+    inicio = time.monotonic()
+    try:
+        html = funcao(url, timeout, cancelado)
     except ImportError:
-        print("  [http_client] ❌ Playwright não instalado")
+        if nome == 'playwright':
+            print("  [http_client] ❌ Playwright não instalado")
+        return None
     except Exception as e:
-        print(f"  [http_client] ❌ Erro crítico no Playwright: {e}")
+        if cancelado.is_set():
+            metricas.registrar_estrategia(nome, 'cancelada', time.monotonic() - inicio)
+        elif isinstance(e, Bloqueado):
+            metricas.registrar_estrategia(nome, 'bloqueio', time.monotonic() - inicio)
+            print(f"  [http_client] ⚠️ {nome} falhou (403 ou block)")
+        else:
+            metricas.registrar_estrategia(nome, 'erro', time.monotonic() - inicio)
+            print(f"  [http_client] ❌ Erro no {nome}: {e}")
+        return None
+
+    latencia = time.monotonic() - inicio
+    if cancelado.is_set():
+        metricas.registrar_estrategia(nome, 'cancelada', latencia)
+        return None
+    metricas.registrar_estrategia(nome, 'sucesso', latencia)
+    with _lock:
+        _latencias[nome].append(latencia)
+    return html
+
+def limiar_hedge(nome):
+    """p90 das latências de sucesso recentes da estratégia (segundos)."""
+    with _lock:
+        amostras = list(_latencias[nome])
+    if len(amostras) < HEDGE_AMOSTRAS_MINIMAS:
+        return HEDGE_LIMIAR_PADRAO
+    return max(HEDGE_LIMIAR_MINIMO, metricas.percentil(amostras, 90))
+
+def fetch(url, timeout=30, hedge=None) -> str:
+    """
+    Retorna HTML da URL, tentando múltiplas estratégias anti-bot:
+    1. curl_cffi
+    2. cloudscraper
+    3. Playwright
+    Com hedge (padrão: HTTP_HEDGE=1), a próxima estratégia começa em paralelo
+    quando a atual passa do próprio p90 sem responder.
+    """
+    hedge = HEDGE if hedge is None else hedge
+    pendentes = list(ESTRATEGIAS)
+    respostas = queue.Queue()
+    cancelado = threading.Event()
+
+    def lancar():
+        nome, funcao = pendentes.pop(0)
+        threading.Thread(
+            target=lambda: respostas.put((nome, _executar(nome, funcao, url, timeout, cancelado))),
+            name=f'http_client-{nome}', daemon=True
+        ).start()
+        return nome
+
+    atual = lancar()
+    em_curso = 1
+    while em_curso:
+        espera = limiar_hedge(atual) if hedge and pendentes else None
+        try:
+            nome, html = respostas.get(timeout=espera)
+        except queue.Empty:
+            print(f"  [http_client] ⏱️ {atual} sem resposta em {espera:.1f}s, disparando {pendentes[0][0]} em paralelo")
+            atual = lancar()
+            em_curso += 1
+            continue
+
+        em_curso -= 1
+        if html is not None:
+            # A vencedora leva; as demais descartam o resultado ao terminar
+            cancelado.set()
+            print(f"  [http_client] ✅ Sucesso com {nome} ({url[:50]}...)")
+            return html
+        if pendentes:
+            atual = lancar()
+            em_curso += 1
 
     # Se todas as estratégias falharem
     raise Exception(f"Bloqueio 403 detectado em {url}. Nenhuma estratégia de bypass funcionou.")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Métricas de execução dos scrapers
+Tempo por etapa, requisições por host (contagem, latência p50/p90/p99,
+bytes, status, retentativas), taxa de sucesso/bloqueio de cada estratégia
+do http_client e tempo dormindo x trabalhando. Gravado em dados/metricas.json
+com histórico das últimas execuções.
+"""
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+TIMEZONE = ZoneInfo('America/Sao_Paulo')
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DADOS_DIR = os.environ.get('DADOS_DIR') or os.path.join(SCRIPT_DIR, '..', 'dados')
+METRICAS_PATH = os.path.join(DADOS_DIR, 'metricas.json')
+
+# Quantas execuções manter no histórico
+HISTORICO_MAX = 90
+
+_lock = threading.Lock()
+_observadores = []   # funções chamadas a cada troca de etapa (ex.: perfil)
+
+def _estado_vazio():
+    return {
+        'inicio': time.monotonic(),
+        'etapas': defaultdict(float),
+        'etapa_atual': None,
+        'etapa_inicio': None,
+        'hosts': defaultdict(lambda: {'latencias': [], 'bytes': 0, 'status': defaultdict(int), 'retentativas': 0}),
+        'urls_vistas': set(),
+        'estrategias': defaultdict(lambda: {'latencias': [], 'resultados': defaultdict(int)}),
+        'fontes': defaultdict(lambda: {'latencias': [], 'completas': 0, 'vitorias': 0}),
+        'sono': defaultdict(float),
+        'intervalos_sono': [],
+    }
+
+_estado = _estado_vazio()
+
+# ============================================================
+# REGISTRO
+# ============================================================
+def reiniciar():
+    global _estado
+    with _lock:
+        _estado = _estado_vazio()
+
+def observar(funcao):
+    """funcao(nome) é chamada ao iniciar cada etapa e funcao(None) ao encerrá-la."""
+    _observadores.append(funcao)
+
+def deixar_de_observar(funcao):
+    if funcao in _observadores:
+        _observadores.remove(funcao)
+
+def etapa(nome):
+    """Marca o início de uma etapa (encerra a anterior). Nomes repetidos somam."""
+    encerrar_etapa()
+    with _lock:
+        _estado['etapa_atual'] = nome
+        _estado['etapa_inicio'] = time.monotonic()
+    for funcao in list(_observadores):
+        funcao(nome)
+
+def encerrar_etapa():
+    with _lock:
+        nome = _estado['etapa_atual']
+        if nome is None:
+            return
+        _estado['etapas'][nome] += time.monotonic() - _estado['etapa_inicio']
+        _estado['etapa_atual'] = None
+    for funcao in list(_observadores):
+        funcao(None)
+
+def registrar_requisicao(host, url, latencia, status, tamanho):
+    """Uma requisição real (não memorizada). Repetir a URL conta como retentativa."""
+    with _lock:
+        h = _estado['hosts'][host]
+        h['latencias'].append(latencia)
+        h['bytes'] += tamanho
+        h['status'][str(status)] += 1
+        if url in _estado['urls_vistas']:
+            h['retentativas'] += 1
+        _estado['urls_vistas'].add(url)
+
+def registrar_estrategia(nome, resultado, latencia):
+    """resultado: 'sucesso', 'bloqueio' (403/desafio), 'erro' ou 'cancelada'
+    (perdeu para outra estratégia no hedging)."""
+    with _lock:
+        e = _estado['estrategias'][nome]
+        e['latencias'].append(latencia)
+        e['resultados'][resultado] += 1
+
+def registrar_fonte(nome, latencia, completa):
+    """Uma consulta a uma fonte numa corrida (crawler.correr)."""
+    with _lock:
+        f = _estado['fontes'][nome]
+        f['latencias'].append(latencia)
+        f['completas'] += int(bool(completa))
+
+def registrar_vitoria(nome):
+    with _lock:
+        _estado['fontes'][nome]['vitorias'] += 1
+
+def registrar_sono(segundos, motivo):
+    """Chamado antes de dormir. Com buscas em paralelo, o tempo dormindo da
+    execução é a união dos intervalos (não a soma entre threads)."""
+    inicio = time.monotonic()
+    with _lock:
+        _estado['sono'][motivo] += segundos
+        _estado['intervalos_sono'].append((inicio, inicio + segundos))
+
+def _uniao(intervalos):
+    total = 0.0
+    fim_atual = float('-inf')
+    for inicio, fim in sorted(intervalos):
+        if fim <= fim_atual:
+            continue
+        total += fim - max(inicio, fim_atual)
+        fim_atual = fim
+    return total
+
+# ============================================================
+# RESUMO
+# ============================================================
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank (valores em qualquer ordem)."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+def _ms(segundos):
+    return round(segundos * 1000, 1) if segundos is not None else None
+
+def resumo():
+    """Resumo serializável da execução até agora."""
+    encerrar_etapa()
+    with _lock:
+        duracao = time.monotonic() - _estado['inicio']
+        sono_total = min(duracao, _uniao(_estado['intervalos_sono']))
+        hosts = {}
+        for host, h in sorted(_estado['hosts'].items()):
+            lat = h['latencias']
+            hosts[host] = {
+                'requisicoes': len(lat),
+                'retentativas': h['retentativas'],
+                'bytes': h['bytes'],
+                'status': dict(sorted(h['status'].items())),
+                'latencia_ms': {'p50': _ms(percentil(lat, 50)), 'p90': _ms(percentil(lat, 90)), 'p99': _ms(percentil(lat, 99))}
+            }
+        estrategias = {}
+        for nome, e in sorted(_estado['estrategias'].items()):
+            total = sum(e['resultados'].values())
+            estrategias[nome] = {
+                'tentativas': total,
+                'sucesso': e['resultados'].get('sucesso', 0),
+                'bloqueio': e['resultados'].get('bloqueio', 0),
+                'erro': e['resultados'].get('erro', 0),
+                'cancelada': e['resultados'].get('cancelada', 0),
+                'taxa_sucesso': round(e['resultados'].get('sucesso', 0) / total, 3) if total else None,
+                'taxa_bloqueio': round(e['resultados'].get('bloqueio', 0) / total, 3) if total else None,
+                'latencia_ms': {'p50': _ms(percentil(e['latencias'], 50)), 'p90': _ms(percentil(e['latencias'], 90))}
+            }
+        fontes = {
+            nome: {
+                'consultas': len(f['latencias']),
+                'completas': f['completas'],
+                'vitorias': f['vitorias'],
+                'latencia_ms': {'p50': _ms(percentil(f['latencias'], 50)), 'p90': _ms(percentil(f['latencias'], 90))}
+            }
+            for nome, f in sorted(_estado['fontes'].items())
+        }
+        return {
+            'data': datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S'),
+            'duracao_s': round(duracao, 1),
+            'dormindo_s': round(sono_total, 1),
+            'trabalhando_s': round(max(0.0, duracao - sono_total), 1),
+            'sono_por_motivo_s': {k: round(v, 1) for k, v in sorted(_estado['sono'].items())},
+            'etapas_s': {k: round(v, 2) for k, v in _estado['etapas'].items()},
+            'hosts': hosts,
+            'estrategias': estrategias,
+            'fontes': fontes
+        }
+
+def salvar(path=METRICAS_PATH):
+    """Grava a execução atual em metricas.json mantendo as últimas HISTORICO_MAX."""
+    atual = resumo()
+    historico = []
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                historico = json.load(f).get('historico', [])
+        except Exception:
+            pass
+    historico = (historico + [atual])[-HISTORICO_MAX:]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'ultima': atual, 'historico': historico}, f, ensure_ascii=False, indent=2)
+    return atual
+
+@contextlib.contextmanager
+def execucao(gravar=True):
+    """Envolve uma execução completa: zera os contadores e grava metricas.json no fim."""
+    reiniciar()
+    try:
+        yield
+    finally:
+        if gravar:
+            atual = salvar()
+            print(f"[metricas] 📊 {atual['duracao_s']}s ({atual['dormindo_s']}s dormindo) — dados/metricas.json")
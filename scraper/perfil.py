@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Modo de perfilamento dos scrapers (--profile)
+Cada etapa marcada em metricas.etapa() ganha seu próprio cProfile, pilhas
+amostradas de todas as threads (formato "collapsed", pronto para
+flamegraph.pl / speedscope) e um relatório das maiores alocações
+(tracemalloc). O tempo dentro de crawler.dormir() fica de fora, para que
+os pontos quentes reais apareçam.
+
+Arquivos gerados em DIR (padrão: perfil/):
+    <etapa>.prof         estatísticas do cProfile (pstats / snakeviz)
+    <etapa>.collapsed    pilhas amostradas da etapa
+    todas.collapsed      todas as etapas, com a etapa como raiz da pilha
+    funcoes.txt          top funções por tempo acumulado de cada etapa
+    alocacoes.txt        pico de memória e top alocações de cada etapa
+"""
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+import metricas
+import pipeline
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFIL_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '..', 'perfil'))
+
+# Intervalo entre amostras das pilhas (segundos)
+INTERVALO_AMOSTRA = 0.005
+# Linhas de cada relatório
+TOP_ALOCACOES = 15
+TOP_FUNCOES = 25
+
+_lock = threading.Lock()
+_ativo = False
+_diretorio = None
+_thread_perfil = None   # thread que chama metricas.etapa() (a do cProfile)
+_amostrador = None
+_parar = threading.Event()
+_dormindo = set()       # threads dentro de crawler.dormir()
+_etapa = None
+_perfis = {}            # etapa -> cProfile.Profile (etapas repetidas somam)
+_pilhas = defaultdict(lambda: defaultdict(int))   # etapa -> pilha -> amostras
+_alocacoes = defaultdict(lambda: defaultdict(lambda: [0, 0]))   # etapa -> linha -> [bytes, blocos]
+_picos = defaultdict(int)
+_retrato_inicio = None
+
+# ============================================================
+# AMOSTRAGEM DE PILHAS
+# ============================================================
+def _quadro(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _pilha(frame):
+    quadros = []
+    while frame is not None:
+        quadros.append(_quadro(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(quadros))
+
+def _amostrar():
+    proprio = threading.get_ident()
+    while not _parar.wait(INTERVALO_AMOSTRA):
+        with _lock:
+            etapa = _etapa
+            dormindo = set(_dormindo)
+        if etapa is None:
+            continue
+        for ident, frame in sys._current_frames().items():
+            if ident == proprio or ident in dormindo:
+                continue
+            pilha = _pilha(frame)
+            with _lock:
+                _pilhas[etapa][pilha] += 1
+
+# ============================================================
+# TROCA DE ETAPA (observador de metricas.etapa)
+# ============================================================
+def _filtrar(retrato):
+    return retrato.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+def _fechar_etapa():
+    global _etapa, _retrato_inicio
+    nome = _etapa
+    if nome is None:
+        return
+    _perfis[nome].disable()
+    # Sai da etapa antes do retrato, para o custo dele não entrar nas amostras
+    with _lock:
+        _etapa = None
+    _picos[nome] = max(_picos[nome], tracemalloc.get_traced_memory()[1])
+    retrato = _filtrar(tracemalloc.take_snapshot())
+    for diff in retrato.compare_to(_retrato_inicio, 'lineno'):
+        if diff.size_diff > 0:
+            linha = str(diff.traceback[0])
+            _alocacoes[nome][linha][0] += diff.size_diff
+            _alocacoes[nome][linha][1] += diff.count_diff
+    _retrato_inicio = None
+
+def _trocar_etapa(nome):
+    global _etapa, _retrato_inicio
+    if threading.get_ident() != _thread_perfil:
+        return
+    _fechar_etapa()
+    if nome is None:
+        return
+    _retrato_inicio = _filtrar(tracemalloc.take_snapshot())
+    tracemalloc.reset_peak()
+    with _lock:
+        _etapa = nome
+    _perfis.setdefault(nome, cProfile.Profile()).enable()
+
+@contextlib.contextmanager
+def pausa():
+    """Tira o trecho (sleeps) do cProfile e das amostras da thread atual."""
+    if not _ativo:
+        yield
+        return
+    ident = threading.get_ident()
+    perfil = _perfis.get(_etapa) if ident == _thread_perfil and _etapa else None
+    if perfil:
+        perfil.disable()
+    with _lock:
+        _dormindo.add(ident)
+    try:
+        yield
+    finally:
+        with _lock:
+            _dormindo.discard(ident)
+        if perfil:
+            perfil.enable()
+
+# ============================================================
+# INÍCIO / FIM
+# ============================================================
+def ativar(diretorio=PERFIL_DIR):
+    global _ativo, _diretorio, _thread_perfil, _amostrador
+    _diretorio = diretorio
+    _thread_perfil = threading.get_ident()
+    _perfis.clear()
+    _pilhas.clear()
+    _alocacoes.clear()
+    _picos.clear()
+    # cProfile não enxerga os processos filhos: o parsing roda neste processo
+    pipeline.NO_PROCESSO = True
+    tracemalloc.start()
+    metricas.observar(_trocar_etapa)
+    _parar.clear()
+    _amostrador = threading.Thread(target=_amostrar, name='perfil-amostrador', daemon=True)
+    _amostrador.start()
+    _ativo = True
+
+def finalizar():
+    """Encerra o perfilamento e grava os arquivos; retorna o diretório."""
+    global _ativo
+    _fechar_etapa()
+    _parar.set()
+    _amostrador.join()
+    metricas.deixar_de_observar(_trocar_etapa)
+    tracemalloc.stop()
+    pipeline.NO_PROCESSO = False
+    _ativo = False
+    _gravar()
+    return _diretorio
+
+def _arquivo(nome):
+    return os.path.join(_diretorio, nome)
+
+def _gravar():
+    os.makedirs(_diretorio, exist_ok=True)
+
+    with open(_arquivo('todas.collapsed'), 'w', encoding='utf-8') as todas:
+        for etapa, pilhas in _pilhas.items():
+            with open(_arquivo(f'{etapa}.collapsed'), 'w', encoding='utf-8') as f:
+                for pilha, n in sorted(pilhas.items()):
+                    f.write(f"{pilha} {n}\n")
+                    todas.write(f"{etapa};{pilha} {n}\n")
+
+    with open(_arquivo('funcoes.txt'), 'w', encoding='utf-8') as f:
+        for etapa, perfil in _perfis.items():
+            perfil.dump_stats(_arquivo(f'{etapa}.prof'))
+            texto = io.StringIO()
+            stats = pstats.Stats(perfil, stream=texto)
+            stats.sort_stats('cumulative').print_stats(TOP_FUNCOES)
+            f.write(f"{'=' * 70}\n{etapa}\n{'=' * 70}\n{texto.getvalue()}\n")
+
+    with open(_arquivo('alocacoes.txt'), 'w', encoding='utf-8') as f:
+        for etapa in _perfis:
+            linhas = sorted(_alocacoes[etapa].items(), key=lambda item: -item[1][0])[:TOP_ALOCACOES]
+            f.write(f"{'=' * 70}\n{etapa} — pico {_picos[etapa] / 1024 / 1024:.1f} MB\n{'=' * 70}\n")
+            for linha, (tamanho, blocos) in linhas:
+                f.write(f"{tamanho / 1024:>12.1f} KiB {blocos:>9} blocos  {linha}\n")
+            f.write("\n")
+
+# ============================================================
+# LINHA DE COMANDO
+# ============================================================
+def adicionar_argumentos(parser):
+    parser.add_argument('--profile', nargs='?', const=PERFIL_DIR, metavar='DIR',
+                        help="perfila cada etapa (cProfile, pilhas, alocações) e grava em DIR (padrão: perfil/)")
+
+@contextlib.contextmanager
+def sessao(args):
+    """Envolve uma execução conforme --profile."""
+    if not getattr(args, 'profile', None):
+        yield
+        return
+    ativar(args.profile)
+    inicio = time.monotonic()
+    try:
+        yield
+    finally:
+        diretorio = finalizar()
+        print(f"[perfil] 🔬 {len(_perfis)} etapas perfiladas em {time.monotonic() - inicio:.1f}s — {diretorio}")
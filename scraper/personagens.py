@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Arquivos por personagem
+Um JSON pequeno por personagem acompanhado (dados/personagens/<slug>.json):
+série diária de XP e posição no ranking de ontem, levels do roster e
+mortes recentes com os assassinos. O manifesto.json guarda o hash do
+conteúdo de cada um: a cada execução só são regravados os personagens cujo
+conteúdo mudou (quem não jogou nem morreu fica como está), e os arquivos de
+quem deixou de ser acompanhado são removidos.
+
+A página de um personagem lê o manifesto (nome -> arquivo) e um arquivo de
+poucos KB, em vez do ranking.json e do mortes_historico.json inteiros.
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+import analise
+import buscar_dados
+import buscar_mortes
+import roster
+from alvos import ALVOS_PATH, carregar_alvos, slug
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+PERSONAGENS_DIR = 'personagens'
+MANIFESTO_ARQUIVO = 'manifesto.json'
+# Dias de série de XP/posição/level em cada arquivo
+SERIE_DIAS = 365
+
+def log(msg, icon="ℹ️"):
+    buscar_dados.log(msg, icon)
+
+def _hash(conteudo):
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+
+def _ler_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def carregar_manifesto(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            pass
+    return {'personagens': {}}
+
+def salvar_manifesto(manifesto, path):
+    """Um personagem por linha, como o roster_historico.json."""
+    linhas = [
+        f"    {json.dumps(nome, ensure_ascii=False)}: {json.dumps(entrada, ensure_ascii=False, separators=(',', ':'))}"
+        for nome, entrada in sorted(manifesto.items())
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "personagens": {\n' + ',\n'.join(linhas) + ('\n' if linhas else '') + '  }\n}\n')
+
+# ============================================================
+# CONTEÚDO
+# ============================================================
+def posicoes(dias_xp):
+    """{dia: {nome: posição}} no ranking de XP de cada dia (empate pelo nome)."""
+    return {
+        dia: {nome: i for i, (nome, _) in enumerate(
+            sorted(((n, v[0]) for n, v in valores.items() if v[0] > 0), key=lambda item: (-item[1], item[0])), 1)}
+        for dia, valores in dias_xp.items()
+    }
+
+def series_de_level(dias_roster):
+    """{nome_lower: [[dia, level], ...]} só nos dias em que o level mudou."""
+    series = {}
+    for dia, niveis in sorted(dias_roster.items()):
+        for nome, level in niveis.items():
+            serie = series.setdefault(nome.lower(), [])
+            if not serie or serie[-1][1] != level:
+                serie.append([dia, level])
+    return series
+
+def montar(jogadores, dias_xp, dias_roster, mortes):
+    """{nome: conteúdo} de todos os personagens, sem campos que mudam sozinhos
+    (horário da execução, contagens relativas a hoje), para que o hash só
+    mude com atividade do personagem."""
+    rank = posicoes(dias_xp)
+    xp = {}
+    ranks = {}
+    for dia in sorted(dias_xp):
+        for nome, (valor, _) in dias_xp[dia].items():
+            if valor > 0:
+                xp.setdefault(nome.lower(), []).append([dia, valor])
+                ranks.setdefault(nome.lower(), []).append([dia, rank[dia][nome]])
+    levels = series_de_level(dias_roster)
+    mortes_por_nome = {}
+    for d in sorted(mortes, key=lambda m: m.get('time', ''), reverse=True):
+        mortes_por_nome.setdefault(d.get('character', '').lower(), []).append(
+            {k: d[k] for k in ('time', 'level', 'reason', 'is_pk', 'killers') if k in d})
+
+    return {
+        nome: {
+            'name': nome,
+            'vocation': info['vocation'],
+            'level': info['level'],
+            'is_extra': info['is_extra'],
+            'xp': xp.get(nome.lower(), []),
+            'ranks': ranks.get(nome.lower(), []),
+            'levels': levels.get(nome.lower(), []),
+            'mortes': mortes_por_nome.get(nome.lower(), [])
+        }
+        for nome, info in jogadores.items()
+    }
+
+# ============================================================
+# GRAVAÇÃO INCREMENTAL
+# ============================================================
+def _arquivos(nomes, anteriores):
+    """Nome -> arquivo, mantendo o de quem já tinha um e evitando colisão de slug."""
+    arquivos = {nome: anteriores[nome]['arquivo'] for nome in nomes if nome in anteriores}
+    usados = set(arquivos.values())
+    for nome in sorted(nomes):
+        if nome in arquivos:
+            continue
+        base = slug(nome) or 'personagem'
+        arquivo, n = f"{base}.json", 2
+        while arquivo in usados or arquivo == MANIFESTO_ARQUIVO:
+            arquivo, n = f"{base}-{n}.json", n + 1
+        arquivos[nome] = arquivo
+        usados.add(arquivo)
+    return arquivos
+
+def gravar(diretorio, conteudos):
+    """Grava só os arquivos cujo hash mudou (ou que sumiram do disco) e
+    remove os de quem saiu. Retorna (gravados, removidos)."""
+    os.makedirs(diretorio, exist_ok=True)
+    manifesto_path = os.path.join(diretorio, MANIFESTO_ARQUIVO)
+    anteriores = carregar_manifesto(manifesto_path)['personagens']
+    arquivos = _arquivos(conteudos, anteriores)
+
+    manifesto = {}
+    gravados = 0
+    for nome in sorted(conteudos):
+        texto = json.dumps(conteudos[nome], ensure_ascii=False, separators=(',', ':'))
+        hash_ = _hash(texto)
+        path = os.path.join(diretorio, arquivos[nome])
+        anterior = anteriores.get(nome)
+        if not anterior or anterior['hash'] != hash_ or anterior['arquivo'] != arquivos[nome] or not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(texto)
+            gravados += 1
+        manifesto[nome] = {'arquivo': arquivos[nome], 'hash': hash_}
+
+    removidos = 0
+    em_uso = set(arquivos.values())
+    for nome, entrada in anteriores.items():
+        if nome not in manifesto and entrada['arquivo'] not in em_uso:
+            path = os.path.join(diretorio, entrada['arquivo'])
+            if os.path.exists(path):
+                os.remove(path)
+            removidos += 1
+
+    if gravados or removidos or not os.path.exists(manifesto_path):
+        salvar_manifesto(manifesto, manifesto_path)
+    return gravados, removidos
+
+# ============================================================
+# FUNÇÃO PRINCIPAL
+# ============================================================
+def main(alvo):
+    """Atualiza dados/personagens/ do alvo a partir dos arquivos já gravados
+    (ranking, histórico de XP, roster e mortes)."""
+    ranking = _ler_json(os.path.join(alvo['dir'], 'ranking.json'))
+    if not ranking:
+        log(f"{alvo['guild']}: sem ranking.json, arquivos por personagem pulados", "⚠️")
+        return None
+    mortes_ranking = _ler_json(os.path.join(alvo['dir'], 'mortes_ranking.json'))
+    jogadores = analise.jogadores_do_alvo(alvo, ranking, mortes_ranking)
+
+    # Janela da série contada do dia do XP de ontem (como o xp_historico.json)
+    ultimo = datetime.strptime(ranking['last_update'], '%Y-%m-%d %H:%M:%S') - timedelta(days=1)
+    inicio = (ultimo - timedelta(days=SERIE_DIAS - 1)).strftime('%Y-%m-%d')
+    dias_xp = {d: v for d, v in analise.carregar(os.path.join(alvo['dir'], analise.HISTORICO_ARQUIVO))['dias'].items()
+               if d >= inicio}
+    dias_roster = {d: v for d, v in roster.carregar(os.path.join(alvo['dir'], roster.ROSTER_ARQUIVO))['dias'].items()
+                   if d >= inicio}
+    mortes = buscar_mortes.carregar_historico(os.path.join(alvo['dir'], 'mortes_historico.json'))
+
+    conteudos = montar(jogadores, dias_xp, dias_roster, mortes)
+    gravados, removidos = gravar(os.path.join(alvo['dir'], PERSONAGENS_DIR), conteudos)
+    log(f"{alvo['guild']}: {gravados}/{len(conteudos)} arquivos de personagem regravados, {removidos} removidos", "🗂️")
+    return gravados, removidos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Atualiza os arquivos por personagem de todos os alvos")
+    parser.add_argument('--config', default=ALVOS_PATH, help="arquivo de alvos (padrão: dados/alvos.json)")
+    args = parser.parse_args()
+    for alvo in carregar_alvos(args.config):
+        main(alvo)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Pipeline busca -> interpretação
+A busca (rede, sleeps do crawler) roda em threads e entrega o HTML numa fila;
+o parsing com BeautifulSoup (CPU) roda num ProcessPoolExecutor do tamanho
+dos núcleos. Assim as requisições continuam saindo enquanto as páginas
+anteriores são interpretadas.
+"""
+import atexit
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Interpreta no próprio processo em vez do pool (usado pelo --profile)
+NO_PROCESSO = False
+
+_FIM = object()
+_pool = None
+_pool_lock = threading.Lock()
+
+def _obter_pool():
+    """Pool único por processo, criado sob demanda e encerrado na saída."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+def interpretar(funcao, *args):
+    """Roda uma função de parsing no pool e espera o resultado."""
+    if NO_PROCESSO:
+        return funcao(*args)
+    return _obter_pool().submit(funcao, *args).result()
+
+def processar(tarefas, buscar, interpretar_fn, buscas=1):
+    """Busca e interpreta uma lista de tarefas em dois estágios.
+
+    tarefas: lista de (chave, argumento)
+    buscar(argumento): roda nas threads de busca; retorna o que será
+        interpretado ou None para pular
+    interpretar_fn(resultado_busca): função de nível de módulo (picklável)
+        que roda no pool de processos
+    buscas: threads de busca simultâneas
+
+    Retorna {chave: resultado interpretado}; falhas em qualquer estágio
+    viram None.
+    """
+    pool = None if NO_PROCESSO else _obter_pool()
+    fila = queue.Queue()
+
+    def buscar_um(tarefa):
+        chave, argumento = tarefa
+        try:
+            fila.put((chave, buscar(argumento)))
+        except Exception:
+            fila.put((chave, None))
+
+    def estagio_busca():
+        if buscas > 1:
+            with ThreadPoolExecutor(max_workers=buscas) as executor:
+                list(executor.map(buscar_um, tarefas))
+        else:
+            for tarefa in tarefas:
+                buscar_um(tarefa)
+        fila.put(_FIM)
+
+    thread = threading.Thread(target=estagio_busca, name='pipeline-busca', daemon=True)
+    thread.start()
+
+    futuros = {}
+    resultados = {}
+    while True:
+        item = fila.get()
+        if item is _FIM:
+            break
+        chave, bruto = item
+        if bruto is None:
+            resultados[chave] = None
+        elif pool is None:
+            try:
+                resultados[chave] = interpretar_fn(bruto)
+            except Exception:
+                resultados[chave] = None
+        else:
+            futuros[chave] = pool.submit(interpretar_fn, bruto)
+
+    for chave, futuro in futuros.items():
+        try:
+            resultados[chave] = futuro.result()
+        except Exception:
+            resultados[chave] = None
+
+    thread.join()
+    return resultados
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Fila de prioridade por valor esperado
+Ordena o trabalho por personagem (mortes, XP individual dos membros e
+extras) pelo valor esperado de cada busca, calculado só com o que já está
+gravado no alvo:
+  - atividade: dias com XP nos últimos 7 e 30 dias (xp_historico.json) e o
+    último login visto na TibiaData (ultimo_login.json);
+  - ranking: melhor posição recente no ranking de XP; o topo é o que mais
+    aparece no site;
+  - mortes: mortes nos últimos 30 dias (mortes_historico.json);
+  - novos: quem não tem nenhum registro (extra recém-adicionado) vai na
+    frente, porque sem a busca não há nada dele para publicar.
+
+As buscas saem em ordem decrescente de valor e as de valor baixo (sem XP,
+login ou morte nos últimos 30 dias) vão num lote no fim, na ordem original.
+Os resultados continuam sendo processados na ordem de sempre, então uma
+execução completa grava exatamente os mesmos arquivos.
+
+Com PRAZO_PERSONAGENS_MINUTOS cada fila tem um orçamento de tempo: passado
+o prazo, as buscas que faltam (as de menor valor) são puladas. Membros sem
+a busca individual ficam com a estimativa pelo roster, extras adiados
+mantêm a entrada da execução anterior e as mortes ficam para a próxima.
+"""
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import gravacao
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+LOGIN_ARQUIVO = 'ultimo_login.json'
+# Orçamento de cada fila em minutos (0 = sem prazo)
+PRAZO_MINUTOS = float(os.environ.get('PRAZO_PERSONAGENS_MINUTOS', '0') or 0)
+
+JANELA_DIAS = 30
+# Chance mínima de ter jogado desde a última execução para login recente
+ATIVIDADE_LOGIN = {1: 0.8, 7: 0.3}        # dias desde o login -> chance
+VALOR_NOVO = 10.0                          # acima de qualquer valor calculado
+LIMIAR_LOTE_FINAL = 0.05                   # abaixo disso: lote do fim
+
+def log(msg, icon="ℹ️"):
+    print(f"  [prioridade] {icon} {msg}")
+
+def _ler_json(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+# ============================================================
+# ÚLTIMO LOGIN
+# ============================================================
+def carregar_logins(path):
+    """{nome_lower: 'AAAA-MM-DDTHH:MM:SSZ'} do último login visto na TibiaData."""
+    return (_ler_json(path) or {}).get('logins', {})
+
+def salvar_logins(logins, path):
+    """Um personagem por linha, como o roster_historico.json."""
+    linhas = [f"    {json.dumps(nome, ensure_ascii=False)}: {json.dumps(login)}"
+              for nome, login in sorted(logins.items())]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "logins": {\n' + ',\n'.join(linhas) + ('\n' if linhas else '') + '  }\n}\n')
+
+def atualizar_logins(path, vistos, acompanhados):
+    """Junta os logins desta execução aos gravados, só para os personagens
+    ainda acompanhados (membros + extras)."""
+    anteriores = carregar_logins(path)
+    logins = {}
+    for nome in acompanhados:
+        login = vistos.get(nome.lower()) or anteriores.get(nome.lower())
+        if login:
+            logins[nome.lower()] = login
+    salvar_logins(logins, path)
+    return logins
+
+# ============================================================
+# VALOR ESPERADO
+# ============================================================
+def _dias_desde(login, referencia):
+    try:
+        quando = datetime.strptime(login, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+    return (referencia - quando).total_seconds() / 86400
+
+def _peso_posicao(posicao):
+    """1 fora do ranking, 2 no primeiro lugar, caindo devagar (1.5 no 3º)."""
+    return 1 + 1 / math.log2(1 + posicao) if posicao else 1
+
+def valores(diretorio, referencia, mortes=None):
+    """{nome_lower: valor} de quem tem algum registro no alvo; quem não
+    aparece é novo. mortes: histórico já carregado (senão lê o arquivo)."""
+    inicio_7 = (referencia - timedelta(days=7)).strftime('%Y-%m-%d')
+    inicio_30 = (referencia - timedelta(days=JANELA_DIAS)).strftime('%Y-%m-%d')
+    dias_xp = (_ler_json(os.path.join(diretorio, 'xp_historico.json')) or {}).get('dias', {})
+    if mortes is None:
+        mortes = (_ler_json(os.path.join(diretorio, 'mortes_historico.json')) or {}).get('deaths', [])
+    logins = carregar_logins(os.path.join(diretorio, LOGIN_ARQUIVO))
+
+    conhecidos = set(logins)
+    dias_7, dias_30, posicao, mortes_30 = {}, {}, {}, {}
+    for dia, valores_dia in dias_xp.items():
+        conhecidos.update(nome.lower() for nome in valores_dia)
+        if dia < inicio_30:
+            continue
+        com_xp = sorted(((v[0], n.lower()) for n, v in valores_dia.items() if v[0] > 0), key=lambda x: (-x[0], x[1]))
+        for pos, (_, nome) in enumerate(com_xp, 1):
+            dias_30[nome] = dias_30.get(nome, 0) + 1
+            if dia >= inicio_7:
+                dias_7[nome] = dias_7.get(nome, 0) + 1
+                posicao[nome] = min(posicao.get(nome, pos), pos)
+    for d in mortes:
+        nome = d.get('character', '').lower()
+        conhecidos.add(nome)
+        if d.get('time', '')[:10] >= inicio_30:
+            mortes_30[nome] = mortes_30.get(nome, 0) + 1
+
+    resultado = {}
+    for nome in conhecidos:
+        atividade = (2 * dias_7.get(nome, 0) / 7 + dias_30.get(nome, 0) / JANELA_DIAS) / 3
+        desde = _dias_desde(logins.get(nome), referencia)
+        if desde is not None:
+            atividade = max([atividade] + [chance for dias, chance in ATIVIDADE_LOGIN.items() if desde <= dias])
+        resultado[nome] = atividade * _peso_posicao(posicao.get(nome)) + min(1, mortes_30.get(nome, 0) / JANELA_DIAS)
+    return resultado
+
+def ordenar(chaves, valores_):
+    """Chaves na ordem das buscas: novos e depois valor decrescente (empate
+    na ordem original); as de valor baixo vão para o lote do fim."""
+    valor = {chave: valores_.get(chave.lower(), VALOR_NOVO) for chave in chaves}
+    primeiro = sorted((c for c in chaves if valor[c] >= LIMIAR_LOTE_FINAL), key=lambda c: -valor[c])
+    return primeiro + [c for c in chaves if valor[c] < LIMIAR_LOTE_FINAL]
+
+def resumo(ordem, valores_):
+    """Texto para o log: quantos novos, prioritários e no lote do fim."""
+    novos = sum(1 for c in ordem if c.lower() not in valores_)
+    lote = sum(1 for c in ordem if valores_.get(c.lower(), VALOR_NOVO) < LIMIAR_LOTE_FINAL)
+    return f"{novos} novos, {len(ordem) - novos - lote} por valor, {lote} no lote final"
+
+# ============================================================
+# PRAZO
+# ============================================================
+class Prazo:
+    """Orçamento de tempo de uma fila, contado da criação. prazo(funcao)
+    devolve funcao(chave) que, passado o prazo, retorna `adiado` (padrão
+    None, como uma falha) sem buscar. A decisão de pular vai para o
+    --record, para o --replay repetir."""
+    def __init__(self, nome, minutos=None):
+        self.nome = nome
+        self.minutos = PRAZO_MINUTOS if minutos is None else minutos
+        self.limite = time.monotonic() + self.minutos * 60
+        self.adiadas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, funcao, adiado=None):
+        if not self.minutos:
+            return funcao
+
+        def buscar(chave):
+            gravado, pular = gravacao.decisao_gravada(f"prazo {self.nome} {chave}")
+            if not gravado:
+                pular = time.monotonic() > self.limite
+                gravacao.registrar_decisao(f"prazo {self.nome} {chave}", pular)
+            if not pular:
+                return funcao(chave)
+            with self._lock:
+                self.adiadas += 1
+                if self.adiadas == 1:
+                    log(f"{self.nome}: prazo de {self.minutos:g} min esgotado, pulando as buscas de menor valor", "⏰")
+            return adiado
+        return buscar
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Controle adaptativo de ritmo por host (AIMD)
+Cada host tem um intervalo mínimo entre o início de duas requisições e um
+limite de requisições simultâneas. Respostas limpas e rápidas aumentam a
+taxa e a concorrência aos poucos (aumento aditivo); 429, desafio 403,
+5xx, timeout/erro de conexão ou latência muito acima da habitual cortam
+as duas pela metade (redução multiplicativa). Retry-After é respeitado.
+Também guarda a latência média de cada fonte de dados (ex.: TibiaData x
+GuildStats nos extras), para a mais rápida ser a preferida. O ritmo e as
+latências aprendidos ficam em dados/ritmo.json e são o ponto de partida da
+execução seguinte.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from zoneinfo import ZoneInfo
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+TIMEZONE = ZoneInfo('America/Sao_Paulo')
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DADOS_DIR = os.environ.get('DADOS_DIR') or os.path.join(SCRIPT_DIR, '..', 'dados')
+RITMO_PATH = os.path.join(DADOS_DIR, 'ritmo.json')
+
+# Intervalo inicial entre requisições (segundos) quando não há ritmo salvo;
+# só os hosts listados aqui têm o ritmo persistido
+INTERVALOS_HOST = {
+    'api.tibiadata.com': 1.5,
+    'guildstats.eu': 1.0,
+}
+INTERVALO_PADRAO = 1.0
+
+# Piso do intervalo: por mais saudável que o host esteja, não passa disso
+INTERVALOS_MINIMOS = {
+    'api.tibiadata.com': 0.5,
+    'guildstats.eu': 0.5,
+}
+INTERVALO_MINIMO_PADRAO = 0.05
+INTERVALO_MAXIMO = 30.0
+
+CONCORRENCIA_MAXIMA = 4
+
+# Aumento aditivo: +AUMENTO_TAXA req/s por resposta limpa
+AUMENTO_TAXA = 0.05
+# Redução multiplicativa (taxa e concorrência) em sinal de sobrecarga
+FATOR_REDUCAO = 0.5
+# Uma rajada de falhas simultâneas conta como uma redução só
+CARENCIA_REDUCAO = 2.0
+
+# Latência acima de LATENCIA_FATOR × a média móvel conta como sobrecarga
+LATENCIA_FATOR = 3.0
+ALFA_LATENCIA = 0.2
+AMOSTRAS_MINIMAS = 5
+
+RETRY_AFTER_MAXIMO = 300
+
+_lock = threading.Lock()
+_controles = {}     # host -> Controle
+_fontes = {}        # fonte -> latência média (segundos)
+_salvos = None      # conteúdo de ritmo.json (carregado sob demanda)
+
+# ============================================================
+# CONTROLE POR HOST
+# ============================================================
+class Controle:
+    def __init__(self, host, intervalo, concorrencia):
+        self.host = host
+        self.minimo = INTERVALOS_MINIMOS.get(host, INTERVALO_MINIMO_PADRAO)
+        self.intervalo = min(INTERVALO_MAXIMO, max(self.minimo, intervalo))
+        self.concorrencia = min(CONCORRENCIA_MAXIMA, max(1.0, concorrencia))
+        self.latencia_media = None
+        self.amostras = 0
+        self.em_voo = 0
+        self.proxima_vez = 0.0
+        self.ultima_reducao = float('-inf')
+        self.reducoes = 0
+        self._cond = threading.Condition()
+
+    def reservar(self):
+        """Espera uma vaga de concorrência e reserva o próximo horário livre.
+        Retorna quantos segundos faltam até ele (quem chama dorme)."""
+        with self._cond:
+            while self.em_voo >= int(self.concorrencia):
+                self._cond.wait()
+            self.em_voo += 1
+            agora_ = time.monotonic()
+            vez = max(agora_, self.proxima_vez)
+            self.proxima_vez = vez + self.intervalo
+            return vez - agora_
+
+    def concluir(self, sinal, latencia=None, retry_after=None):
+        """Libera a vaga e ajusta o ritmo.
+
+        sinal: 'ok' (resposta limpa), 'neutro' (ex.: 404) ou 'sobrecarga'
+        retry_after: segundos pedidos pelo servidor antes da próxima requisição
+        """
+        with self._cond:
+            self.em_voo -= 1
+            agora_ = time.monotonic()
+
+            if sinal == 'ok' and latencia is not None:
+                if self.amostras >= AMOSTRAS_MINIMAS and latencia > LATENCIA_FATOR * self.latencia_media:
+                    sinal = 'sobrecarga'
+                if self.latencia_media is None:
+                    self.latencia_media = latencia
+                else:
+                    self.latencia_media += ALFA_LATENCIA * (latencia - self.latencia_media)
+                self.amostras += 1
+
+            if sinal == 'ok':
+                if self.intervalo > self.minimo:
+                    self.intervalo = max(self.minimo, 1 / (1 / self.intervalo + AUMENTO_TAXA))
+                self.concorrencia = min(CONCORRENCIA_MAXIMA, self.concorrencia + 1 / self.concorrencia)
+            elif sinal == 'sobrecarga':
+                if agora_ - self.ultima_reducao >= CARENCIA_REDUCAO:
+                    self.intervalo = min(INTERVALO_MAXIMO, max(self.minimo, self.intervalo / FATOR_REDUCAO))
+                    self.concorrencia = max(1.0, self.concorrencia * FATOR_REDUCAO)
+                    self.ultima_reducao = agora_
+                    self.reducoes += 1
+                # O host descansa o Retry-After (ou o novo intervalo) antes da próxima
+                pausa = retry_after if retry_after is not None else self.intervalo
+                self.proxima_vez = max(self.proxima_vez, agora_ + pausa)
+
+            self._cond.notify_all()
+
+    def estado(self):
+        with self._cond:
+            return {'intervalo': round(self.intervalo, 3), 'concorrencia': round(self.concorrencia, 2)}
+
+# ============================================================
+# API PÚBLICA
+# ============================================================
+def _carregar_salvos(path=RITMO_PATH):
+    global _salvos
+    if _salvos is None:
+        _salvos = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    _salvos = json.load(f)
+            except Exception:
+                pass
+    return _salvos
+
+def controle(host):
+    """Controle do host, criado com o ritmo salvo (ou o inicial) na primeira vez."""
+    with _lock:
+        if host not in _controles:
+            salvo = _carregar_salvos().get('hosts', {}).get(host, {}) if host in INTERVALOS_HOST else {}
+            _controles[host] = Controle(
+                host,
+                salvo.get('intervalo', INTERVALOS_HOST.get(host, INTERVALO_PADRAO)),
+                salvo.get('concorrencia', 1.0)
+            )
+        return _controles[host]
+
+def retry_after(headers):
+    """Segundos do cabeçalho Retry-After (número ou data HTTP); None se ausente."""
+    # Respostas gravadas trazem um dict comum: busca sem diferenciar maiúsculas
+    valor = next((v for k, v in (headers or {}).items() if k.lower() == 'retry-after'), None)
+    if not valor:
+        return None
+    try:
+        segundos = float(valor)
+    except ValueError:
+        try:
+            segundos = (parsedate_to_datetime(valor) - datetime.now(ZoneInfo('UTC'))).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(RETRY_AFTER_MAXIMO, max(0.0, segundos))
+
+def registrar_fonte(nome, latencia):
+    """Latência de uma consulta completa a uma fonte (média móvel)."""
+    with _lock:
+        if nome not in _fontes:
+            _fontes[nome] = _carregar_salvos().get('fontes', {}).get(nome, {}).get('latencia_s')
+        media = _fontes[nome]
+        _fontes[nome] = latencia if media is None else media + ALFA_LATENCIA * (latencia - media)
+
+def ordenar_fontes(nomes):
+    """Fontes da mais rápida para a mais lenta; sem histórico mantém a ordem dada."""
+    with _lock:
+        salvas = _carregar_salvos().get('fontes', {})
+        medias = [_fontes.get(nome, salvas.get(nome, {}).get('latencia_s')) for nome in nomes]
+    return [nome for _, _, nome in sorted(
+        (media if media is not None else float('inf'), i, nome) for i, (nome, media) in enumerate(zip(nomes, medias))
+    )]
+
+def estados():
+    """Ritmo atual de cada host usado nesta execução."""
+    with _lock:
+        controles = dict(_controles)
+    return {host: c.estado() for host, c in sorted(controles.items())}
+
+def reiniciar():
+    global _salvos
+    with _lock:
+        _controles.clear()
+        _fontes.clear()
+        _salvos = None
+
+def salvar(path=RITMO_PATH):
+    """Grava o ritmo aprendido das APIs reais (hosts de INTERVALOS_HOST) e a
+    latência das fontes."""
+    with _lock:
+        salvos = _carregar_salvos(path)
+        hosts = dict(salvos.get('hosts', {}))
+        fontes = dict(salvos.get('fontes', {}))
+        controles = [c for h, c in _controles.items() if h in INTERVALOS_HOST]
+        medias = {nome: media for nome, media in _fontes.items() if media is not None}
+    if not controles and not medias:
+        return
+    data = datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+    for c in controles:
+        hosts[c.host] = {**c.estado(), 'reducoes': c.reducoes, 'atualizado': data}
+    for nome, media in medias.items():
+        fontes[nome] = {'latencia_s': round(media, 3), 'atualizado': data}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'hosts': dict(sorted(hosts.items())), 'fontes': dict(sorted(fontes.items()))},
+                  f, ensure_ascii=False, indent=2)
+
+@contextlib.contextmanager
+def execucao(gravar=True):
+    """Envolve uma execução: parte do ritmo salvo e grava o aprendido no fim."""
+    reiniciar()
+    try:
+        yield
+    finally:
+        if gravar:
+            salvar()
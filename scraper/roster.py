@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Retratos diários do roster da guild e estimativa de XP por variação de level
+O /v4/guild da TibiaData traz o level atual de cada membro. Guardando um
+retrato por dia (nome -> level), a diferença entre dois dias dá limites
+inferior e superior para o XP ganho, pela fórmula de experiência do Tibia.
+
+O modo ao vivo acrescenta, por dia do servidor, o primeiro e o último level
+vistos nos level-ups de cada membro ("ao_vivo"): um mínimo de XP ganho no
+dia mesmo sem retrato. Quem morreu no dia fica com null (a perda de XP
+desfaz o mínimo). O retrato diário continua sendo o da execução completa.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+ROSTER_ARQUIVO = 'roster_historico.json'
+
+# Retratos mantidos (30 dias de janela + hoje)
+RETENCAO_DIAS = 31
+
+def exp_para_level(level):
+    """XP total para alcançar o level: 50/3 · (L³ − 6L² + 17L − 12)."""
+    return 50 * (level ** 3 - 6 * level ** 2 + 17 * level - 12) // 3
+
+def faixa_ganho(level_antes, level_depois):
+    """(mínimo, máximo) de XP ganho entre dois retratos.
+
+    No level L o XP está entre exp(L) e exp(L+1) − 1; mortes fazem o
+    mínimo (e até o máximo) ficar negativo.
+    """
+    minimo = exp_para_level(level_depois) - (exp_para_level(level_antes + 1) - 1)
+    maximo = (exp_para_level(level_depois + 1) - 1) - exp_para_level(level_antes)
+    return minimo, maximo
+
+def estimativa(faixa):
+    """XP usado no lugar do GuildStats: meio da faixa, só com ganho certo."""
+    minimo, maximo = faixa
+    return (minimo + maximo) // 2 if minimo > 0 else 0
+
+def carregar(path):
+    """{'dias': {'AAAA-MM-DD': {nome: level}}, 'ao_vivo': {'AAAA-MM-DD': {nome: [de, para] ou None}}}"""
+    historico = None
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                historico = json.load(f)
+        except Exception:
+            pass
+    historico = historico or {'dias': {}}
+    historico.setdefault('ao_vivo', {})
+    return historico
+
+def salvar(historico, path):
+    """Um retrato por linha, para o arquivo ficar compacto e o diff legível."""
+    def _linhas(secao):
+        return [
+            f"    {json.dumps(data)}: {json.dumps(dict(sorted(valores.items())), ensure_ascii=False, separators=(',', ':'))}"
+            for data, valores in sorted(secao.items())
+        ]
+    secoes = []
+    for nome in ('dias', 'ao_vivo'):
+        linhas = _linhas(historico.get(nome, {}))
+        secoes.append(f'  "{nome}": {{\n' + ',\n'.join(linhas) + ('\n' if linhas else '') + '  }')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n' + ',\n'.join(secoes) + '\n}\n')
+
+def _podar(historico, data):
+    limite = (datetime.strptime(data, '%Y-%m-%d') - timedelta(days=RETENCAO_DIAS)).strftime('%Y-%m-%d')
+    for secao in ('dias', 'ao_vivo'):
+        historico[secao] = {d: n for d, n in historico.get(secao, {}).items() if d >= limite}
+
+def registrar(historico, data, membros):
+    """Guarda o retrato de hoje (membros de buscar_membros_guild) e descarta os antigos."""
+    if not membros:
+        return
+    historico['dias'][data] = {m['name']: m['level'] for m in membros.values() if m.get('level')}
+    _podar(historico, data)
+
+def registrar_ao_vivo(historico, dia, nome, de=None, para=None, morreu=False):
+    """Level-up (de -> para) ou morte de um membro visto no modo ao vivo,
+    no dia do servidor `dia`."""
+    vistos = historico['ao_vivo'].setdefault(dia, {})
+    if morreu:
+        vistos[nome] = None
+    elif nome not in vistos:
+        vistos[nome] = [de, para]
+    elif vistos[nome] is not None:
+        vistos[nome][1] = para
+    _podar(historico, dia)
+
+def minimo_ao_vivo(historico, dia):
+    """{nome_lower: XP mínimo ganho em `dia`} pelos level-ups vistos ao vivo
+    (só quem não morreu no dia)."""
+    return {
+        nome.lower(): faixa_ganho(*vistos)[0]
+        for nome, vistos in historico.get('ao_vivo', {}).get(dia, {}).items()
+        if vistos is not None
+    }
+
+def faixas(historico, data, dias):
+    """{nome_lower: (mínimo, máximo)} entre o retrato de `data` e o de
+    `dias` dias antes; vazio se algum dos dois não existir."""
+    anterior = (datetime.strptime(data, '%Y-%m-%d') - timedelta(days=dias)).strftime('%Y-%m-%d')
+    antes = historico['dias'].get(anterior)
+    depois = historico['dias'].get(data)
+    if not antes or not depois:
+        return {}
+    return {
+        nome.lower(): faixa_ganho(antes[nome], level)
+        for nome, level in depois.items()
+        if nome in antes
+    }
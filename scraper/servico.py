@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Modo serviço (daemon) com API HTTP local
+Um processo só, sempre no ar: roda a atualização completa (executar.py) no
+horário diário e, entre uma e outra, os ciclos do modo ao vivo, mantendo
+sessões HTTP, ritmo, roster, séries de level e o índice de mortes em
+memória. Os JSONs de dados/ continuam sendo gravados para o site.
+
+API (JSON, GET):
+    /status                        status de XP e mortes de todos os alvos
+    /alvos                         alvos e seus ids (<guild>-<mundo>)
+    /ranking/<alvo>[/<periodo>]    ranking de XP (yesterday, 7days, 30days)
+    /mortes/<alvo>[/<periodo>]     ranking de mortes (+ alltime)
+    /causas/<alvo>[/<periodo>]     top criaturas, jogadores e assistências
+    /personagem/<nome>             XP, levels, mortes e eventos do personagem
+    /eventos/<alvo>?desde=ISO      feed do modo ao vivo
+
+As respostas ficam em cache até a próxima atualização (com ETag).
+
+Uso:
+    python scraper/servico.py --porta 8080 [--agora] [--sem-ao-vivo]
+"""
+import argparse
+import json
+import os
+import threading
+import urllib.parse
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import analise
+import ao_vivo
+import buscar_dados
+import causas
+import crawler
+import executar
+import metricas
+import ritmo
+import roster
+from alvos import ALVOS_PATH, carregar_alvos, slug
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+PORTA_PADRAO = 8080
+HORA_PADRAO = '07:00'           # horário (Brasília) da atualização completa
+
+ARQUIVOS = {
+    'ranking': 'ranking.json',
+    'status': 'status.json',
+    'mortes_ranking': 'mortes_ranking.json',
+    'mortes_status': 'mortes_status.json',
+    'mortes_historico': 'mortes_historico.json',
+    'mortes_indice': causas.INDICE_ARQUIVO,
+    'roster': roster.ROSTER_ARQUIVO,
+    'eventos': ao_vivo.EVENTOS_ARQUIVO,
+    'analise': analise.ANALISE_ARQUIVO,
+}
+
+def agora():
+    return buscar_dados.agora()
+
+def log(msg, icon="ℹ️"):
+    buscar_dados.log(msg, icon)
+
+def id_alvo(alvo):
+    return f"{slug(alvo['guild'])}-{slug(alvo['world'])}"
+
+# ============================================================
+# ESTADO EM MEMÓRIA
+# ============================================================
+def _ler(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(linha) for linha in f if linha.strip()]
+        return json.load(f)
+
+def _indice_xp(ranking):
+    xp = {}
+    for periodo, entradas in ((ranking or {}).get('rankings') or {}).items():
+        for e in entradas:
+            xp.setdefault(e['name'].lower(), {'name': e['name'], 'vocation': e['vocation'],
+                                              'level': e['level'], 'is_extra': e['is_extra']})[periodo] = {
+                'rank': e['rank'], 'points': e['points']}
+    return xp
+
+def _indice_mortes(historico):
+    mortes = {}
+    for morte in (historico or {}).get('deaths', []):
+        mortes.setdefault(morte.get('character', '').lower(), []).append(morte)
+    for lista in mortes.values():
+        lista.sort(key=lambda m: m.get('time', ''), reverse=True)
+    return mortes
+
+def _indice_levels(retratos):
+    levels = {}
+    for dia, niveis in sorted(((retratos or {}).get('dias') or {}).items()):
+        for nome, level in niveis.items():
+            levels.setdefault(nome.lower(), []).append({'dia': dia, 'level': level})
+    return levels
+
+def _indice_eventos(lista):
+    eventos = {}
+    for evento in lista or []:
+        eventos.setdefault(evento.get('nome', '').lower(), []).append(evento)
+    return eventos
+
+# Arquivo -> (índice por personagem que depende só dele, como montar)
+INDICES = {
+    'ranking': ('xp', _indice_xp),
+    'mortes_historico': ('mortes', _indice_mortes),
+    'roster': ('levels', _indice_levels),
+    'eventos': ('eventos_por_personagem', _indice_eventos),
+}
+
+def indexar(alvo, arquivos, anterior=None, mudados=None):
+    """Dados de um alvo com os índices por personagem (nome minúsculo).
+    Com `anterior`, só os índices dos arquivos em `mudados` são refeitos."""
+    dados = {
+        'id': id_alvo(alvo),
+        'guild': alvo['guild'],
+        'world': alvo['world'],
+        **arquivos,
+    }
+    for chave, (indice, montar) in INDICES.items():
+        if anterior is not None and chave not in mudados:
+            dados[indice] = anterior[indice]
+        else:
+            dados[indice] = montar(arquivos[chave])
+    return dados
+
+class Memoria:
+    """Arquivos de todos os alvos carregados e indexados. A cada atualização
+    só os arquivos com mtime diferente são relidos, e só os índices que
+    dependem deles são refeitos."""
+    def __init__(self, config):
+        self.config = config
+        self.alvos = {}
+        self.versao = 0
+        self.atualizado = None
+        self._mtimes = {}       # id do alvo -> {chave do arquivo: mtime}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def atualizar(self):
+        alvos = {}
+        mudou = False
+        for alvo in carregar_alvos(self.config):
+            id_ = id_alvo(alvo)
+            caminhos = {chave: os.path.join(alvo['dir'], nome) for chave, nome in ARQUIVOS.items()}
+            mtimes = {chave: os.path.getmtime(p) if os.path.exists(p) else None for chave, p in caminhos.items()}
+            anterior = self.alvos.get(id_)
+            vistos = self._mtimes.get(id_, {}) if anterior else {}
+            mudados = {chave for chave in caminhos if chave not in vistos or vistos[chave] != mtimes[chave]}
+            if not mudados:
+                alvos[id_] = anterior
+                continue
+            arquivos = {chave: _ler(p) if chave in mudados else anterior[chave] for chave, p in caminhos.items()}
+            alvos[id_] = indexar(alvo, arquivos, anterior, mudados)
+            self._mtimes[id_] = mtimes
+            mudou = True
+        mudou = mudou or set(alvos) != set(self.alvos)
+        if mudou:
+            with self._lock:
+                self.alvos = alvos
+                self.versao += 1
+                self.atualizado = agora().strftime('%Y-%m-%d %H:%M:%S')
+                self._cache.clear()
+        return mudou
+
+    def resposta(self, caminho, consulta):
+        """(status, corpo em bytes, versão) com cache por URL."""
+        chave = (caminho, consulta)
+        with self._lock:
+            if chave in self._cache:
+                return self._cache[chave]
+            alvos, versao = self.alvos, self.versao
+        status, corpo = rotear(alvos, caminho, urllib.parse.parse_qs(consulta), self)
+        resultado = (status, json.dumps(corpo, ensure_ascii=False).encode('utf-8'), versao)
+        with self._lock:
+            if versao == self.versao:
+                self._cache[chave] = resultado
+        return resultado
+
+# ============================================================
+# API
+# ============================================================
+def _alvo(alvos, partes):
+    """Alvo pedido na URL; com um alvo só ele pode ser omitido."""
+    if partes and partes[0] in alvos:
+        return alvos[partes[0]], partes[1:]
+    if len(alvos) == 1:
+        return next(iter(alvos.values())), partes
+    return None, partes
+
+def _ranking(dados, periodo):
+    if dados is None:
+        return 404, {'erro': 'ranking ainda não gerado'}
+    if not periodo:
+        return 200, dados
+    if periodo not in dados.get('rankings', {}):
+        return 404, {'erro': f"período desconhecido: {periodo}"}
+    return 200, dados['rankings'][periodo]
+
+def rotear(alvos, caminho, consulta, memoria):
+    partes = [urllib.parse.unquote(p) for p in caminho.strip('/').split('/') if p]
+    if not partes:
+        return 200, {'endpoints': ['/status', '/alvos', '/ranking/<alvo>[/<periodo>]', '/mortes/<alvo>[/<periodo>]',
+                                   '/causas/<alvo>[/<periodo>]', '/analise/<alvo>[/<periodo>]', '/personagem/<nome>', '/eventos/<alvo>?desde=ISO']}
+    recurso, resto = partes[0], partes[1:]
+
+    if recurso == 'status':
+        return 200, {
+            'servico': {'versao': memoria.versao, 'atualizado': memoria.atualizado},
+            'alvos': {id_: {'xp': a['status'], 'mortes': a['mortes_status']} for id_, a in alvos.items()}
+        }
+    if recurso == 'alvos':
+        return 200, [{'id': a['id'], 'guild': a['guild'], 'world': a['world']} for a in alvos.values()]
+    if recurso == 'personagem' and len(resto) == 1:
+        nome = resto[0].lower()
+        encontrado = {}
+        for id_, a in alvos.items():
+            dados = {
+                'xp': a['xp'].get(nome),
+                'levels': a['levels'].get(nome, []),
+                'mortes': a['mortes'].get(nome, []),
+                'eventos': a['eventos_por_personagem'].get(nome, []),
+            }
+            if any(dados.values()):
+                encontrado[id_] = dados
+        if not encontrado:
+            return 404, {'erro': f"personagem não acompanhado: {resto[0]}"}
+        return 200, {'nome': resto[0], 'alvos': encontrado}
+
+    if recurso in ('ranking', 'mortes', 'causas', 'analise', 'eventos'):
+        alvo, resto = _alvo(alvos, resto)
+        if alvo is None:
+            return 404, {'erro': 'alvo desconhecido', 'alvos': sorted(alvos)}
+        if recurso == 'ranking':
+            return _ranking(alvo['ranking'], resto[0] if resto else None)
+        if recurso == 'mortes':
+            return _ranking(alvo['mortes_ranking'], resto[0] if resto else None)
+        if recurso == 'causas':
+            indice = alvo['mortes_indice']
+            if indice is None:
+                return 404, {'erro': 'índice de mortes ainda não gerado'}
+            if not resto:
+                return 200, {k: indice[k] for k in ('last_update', 'mortes', 'periodos', 'pks')}
+            if resto[0] not in indice['periodos']:
+                return 404, {'erro': f"período desconhecido: {resto[0]}"}
+            return 200, indice['periodos'][resto[0]]
+        if recurso == 'analise':
+            dados = alvo['analise']
+            if dados is None:
+                return 404, {'erro': 'análise ainda não gerada'}
+            if not resto:
+                return 200, dados
+            if resto[0] not in dados['periodos']:
+                return 404, {'erro': f"período desconhecido: {resto[0]}"}
+            return 200, dados['periodos'][resto[0]]
+        desde = consulta.get('desde', [''])[0]
+        return 200, [e for e in alvo['eventos'] or [] if e.get('quando', '') >= desde]
+
+    return 404, {'erro': f"caminho desconhecido: {caminho}"}
+
+def criar_handler(memoria):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, formato, *args):
+            pass
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            status, corpo, versao = memoria.resposta(url.path, url.query)
+            etag = f'"{versao}"'
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    return Handler
+
+# ============================================================
+# AGENDA
+# ============================================================
+def proxima_execucao(hora, depois_de):
+    """Próximo horário HH:MM (Brasília) depois de depois_de."""
+    h, m = (int(x) for x in hora.split(':'))
+    alvo = depois_de.replace(hour=h, minute=m, second=0, microsecond=0)
+    return alvo if alvo > depois_de else alvo + timedelta(days=1)
+
+def atualizacao_completa(config):
+    """executar.py no mesmo processo: respostas memorizadas são esquecidas,
+    sessões, imports e ritmo aprendido continuam quentes."""
+    crawler.reiniciar()
+    try:
+        with metricas.execucao():
+            executar.executar(config)
+    except Exception as e:
+        log(f"Atualização completa falhou: {e}", "❌")
+    finally:
+        ritmo.salvar()
+
+def servir(config, porta, hora, intervalo, com_ao_vivo, ja):
+    memoria = Memoria(config)
+    memoria.atualizar()
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), criar_handler(memoria))
+    threading.Thread(target=servidor.serve_forever, name='servico-http', daemon=True).start()
+    log(f"API em http://127.0.0.1:{porta} ({len(memoria.alvos)} alvos)", "🛰️")
+
+    proxima = agora() if ja else proxima_execucao(hora, agora())
+    mundos = ao_vivo.preparar(carregar_alvos(config)) if com_ao_vivo else {}
+    anteriores = ao_vivo.carregar_estado() if com_ao_vivo else {}
+    log(f"Próxima atualização completa: {proxima.strftime('%d/%m %H:%M')}", "🗓️")
+
+    try:
+        while True:
+            if agora() >= proxima:
+                atualizacao_completa(config)
+                proxima = proxima_execucao(hora, agora())
+                log(f"Próxima atualização completa: {proxima.strftime('%d/%m %H:%M')}", "🗓️")
+            elif mundos:
+                ao_vivo.ciclo(mundos, anteriores)
+                ao_vivo.salvar_estado(anteriores)
+            if memoria.atualizar():
+                log(f"Dados recarregados (versão {memoria.versao})", "♻️")
+            espera = (proxima - agora()).total_seconds()
+            if mundos:
+                espera = min(espera, intervalo)
+            crawler.dormir(max(0.0, espera), 'servico')
+    except KeyboardInterrupt:
+        log("Encerrando", "⏹️")
+    finally:
+        servidor.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço com atualização agendada e API HTTP local")
+    parser.add_argument('--config', default=ALVOS_PATH, help="arquivo de alvos (padrão: dados/alvos.json)")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--hora', default=HORA_PADRAO, help="horário da atualização completa (HH:MM, Brasília)")
+    parser.add_argument('--intervalo', type=float, default=ao_vivo.INTERVALO_PADRAO,
+                        help="segundos entre ciclos do modo ao vivo")
+    parser.add_argument('--sem-ao-vivo', action='store_true', help="só a atualização diária")
+    parser.add_argument('--agora', action='store_true', help="roda uma atualização completa ao iniciar")
+    args = parser.parse_args()
+    servir(args.config, args.porta, args.hora, args.intervalo, not args.sem_ao_vivo, args.agora)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita GuildStats e TibiaData para testes de carga
+Usa tab_timeonline.html, tab_members.html e char_page.html da raiz como
+modelos e gera o resto (membros extras, XP diário, mortes) de forma
+determinística a partir do nome do personagem.
+
+Com --sessao S o mundo "vive": a cada S segundos parte dos personagens
+entra/sai da lista de online (/v4/world), alguns sobem de level e alguns
+morrem ao sair (para testar o ao_vivo.py).
+
+Uso:
+    python scraper/servidor_mock.py --membros 1000 --latencia 200 --erro 0.05 --desafio 0.1
+    python scraper/servidor_mock.py --liberacao 600   # exige o cf_clearance do desafio JS
+    GUILDSTATS_BASE_URL=http://127.0.0.1:8765 TIBIADATA_BASE_URL=http://127.0.0.1:8765 \\
+        python scraper/executar.py
+"""
+import argparse
+import collections
+import html
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================================================
+# CONFIGURAÇÕES
+# ============================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RAIZ_DIR = os.path.join(SCRIPT_DIR, '..')
+TAB_TIMEONLINE_PATH = os.path.join(RAIZ_DIR, 'tab_timeonline.html')
+TAB_MEMBERS_PATH = os.path.join(RAIZ_DIR, 'tab_members.html')
+CHAR_PAGE_PATH = os.path.join(RAIZ_DIR, 'char_page.html')
+
+# Nome do personagem gravado no char_page.html de exemplo
+CHAR_MODELO = "Lord Froilan"
+
+VOCACOES = ['Elite Knight', 'Royal Paladin', 'Elder Druid', 'Master Sorcerer', 'Exalted Monk']
+CRIATURAS = ['a dragon lord', 'a hellflayer', 'The Pale Worm', 'a mean lost soul', 'a two-headed turtle']
+
+# Mundo vivo (--sessao): chance de estar online num intervalo, de subir de
+# level enquanto online e de morrer ao sair
+CHANCE_ONLINE = 0.3
+CHANCE_LEVEL = 0.5
+CHANCE_MORTE = 0.3
+
+PAGINA_DESAFIO = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+    "<body><noscript>Enable JavaScript and cookies to continue</noscript></body></html>"
+)
+# Desafio que se resolve com JS (--liberacao): grava um cf_clearance com a
+# expiração no valor e recarrega, como o do Cloudflare num navegador
+PAGINA_DESAFIO_JS = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>"
+    "<noscript>Enable JavaScript and cookies to continue</noscript><script>"
+    "var expira = Math.floor(Date.now() / 1000) + {validade};"
+    "document.cookie = 'cf_clearance=mock-' + expira + '; path=/; expires=' + new Date(expira * 1000).toUTCString();"
+    "setTimeout(function () {{ location.reload(); }}, 500);"
+    "</script></body></html>"
+)
+
+# ============================================================
+# DADOS SINTÉTICOS
+# ============================================================
+def _rng(nome):
+    """Gerador determinístico por personagem (mesmos dados a cada requisição)."""
+    return random.Random(zlib.crc32(nome.lower().encode('utf-8')))
+
+def perfil(nome, world):
+    """Level, vocação, XP dos últimos 30 dias e mortes de um personagem."""
+    rng = _rng(nome)
+    level = rng.randint(100, 1300)
+    hoje = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # ~60% dos dias com XP, valores proporcionais ao level
+    xp_diaria = []
+    for dia in range(1, 31):
+        valor = rng.randint(level * 2000, level * 60000) if rng.random() < 0.6 else 0
+        xp_diaria.append(((hoje - timedelta(days=dia)).strftime('%Y-%m-%d'), valor))
+
+    mortes = []
+    for _ in range(rng.choice([0, 0, 0, 1, 1, 2, 3])):
+        quando = hoje - timedelta(days=rng.randint(0, 40), seconds=rng.randint(0, 86399))
+        if rng.random() < 0.2:
+            assassinos = [{'name': f"Pker {rng.randint(1, 50)}", 'player': True, 'traded': False, 'summon': ''}]
+        else:
+            assassinos = [{'name': rng.choice(CRIATURAS), 'player': False, 'traded': False, 'summon': ''}]
+        nomes = ' and '.join(a['name'] for a in assassinos)
+        verbo = 'Killed' if assassinos[0]['player'] else 'Died'
+        mortes.append({
+            'time': quando.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'level': level,
+            'reason': f"{verbo} at Level {level} by {nomes}.",
+            'involved': assassinos
+        })
+
+    vocacao = rng.choice(VOCACOES)
+    # Último login no dia mais recente com XP (ou antes da janela)
+    dias_com_xp = [dia for dia, (_, valor) in enumerate(xp_diaria, 1) if valor]
+    ultimo_login = hoje - timedelta(days=dias_com_xp[0] if dias_com_xp else 35) + timedelta(seconds=rng.randint(0, 86399))
+
+    return {
+        'name': nome,
+        'level': level,
+        'vocation': vocacao,
+        'world': world,
+        'ultimo_login': ultimo_login.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'xp_diaria': xp_diaria,
+        'mortes': sorted(mortes, key=lambda m: m['time'], reverse=True)
+    }
+
+def _nomes_modelo(trecho):
+    return [urllib.parse.unquote_plus(n) for n in re.findall(r'href="character/([^"]+)"', trecho)]
+
+class Modelos:
+    """Templates carregados uma vez e roster escalado para N membros."""
+    def __init__(self, membros, world, sessao=0):
+        with open(TAB_TIMEONLINE_PATH, 'r', encoding='utf-8') as f:
+            timeonline = f.read()
+        with open(TAB_MEMBERS_PATH, 'r', encoding='utf-8') as f:
+            self.tab_members = f.read()
+        with open(CHAR_PAGE_PATH, 'r', encoding='utf-8') as f:
+            self.char_page = f.read()
+
+        inicio = timeonline.index('<tbody')
+        inicio = timeonline.index('>', inicio) + 1
+        fim = timeonline.index('</tbody>', inicio)
+        self._cabecalho = timeonline[:inicio]
+        self._rodape = timeonline[fim:]
+        self._linhas = re.findall(r'<tr\b.*?</tr>', timeonline[inicio:fim], re.S)
+
+        reais = []
+        for linha in self._linhas:
+            nomes = _nomes_modelo(linha)
+            reais.append(nomes[0] if nomes else None)
+
+        self.world = world
+        self.membros = []
+        for i in range(membros):
+            if i < len(reais) and reais[i]:
+                self.membros.append(reais[i])
+            else:
+                self.membros.append(f"Mock Player {i:04d}")
+        self._reais = reais
+        self._timeonline = None
+        self.sessao = sessao
+        self.inicio = time.time()
+
+    # ---------- mundo vivo ----------
+    def _intervalo(self):
+        return int((time.time() - self.inicio) // self.sessao) if self.sessao else 0
+
+    def _online(self, nome, intervalo):
+        return bool(self.sessao) and _rng(f"{nome}|{intervalo}").random() < CHANCE_ONLINE
+
+    def vida(self, nome):
+        """Level atual e mortes ocorridas desde o início do servidor."""
+        p = perfil(nome, self.world)
+        level = p['level']
+        mortes = []
+        atual = self._intervalo()
+        for i in range(atual + 1):
+            if not self._online(nome, i):
+                continue
+            rng = _rng(f"{nome}|{i}|vida")
+            if rng.random() < CHANCE_LEVEL:
+                level += 1
+            # Morre ao sair (intervalo seguinte já terminado ou em curso)
+            if i < atual and not self._online(nome, i + 1) and rng.random() < CHANCE_MORTE:
+                quando = datetime.fromtimestamp(self.inicio + (i + 1) * self.sessao, timezone.utc)
+                criatura = rng.choice(CRIATURAS)
+                mortes.append({
+                    'time': quando.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'level': level,
+                    'reason': f"Died at Level {level} by {criatura}.",
+                    'involved': [{'name': criatura, 'player': False, 'traded': False, 'summon': ''}]
+                })
+        return level, mortes
+
+    def world_json(self, world):
+        atual = self._intervalo()
+        online = []
+        for nome in self.membros:
+            if self._online(nome, atual):
+                online.append({'name': nome, 'level': self.vida(nome)[0], 'vocation': perfil(nome, self.world)['vocation']})
+        return {'world': {'name': world, 'status': 'online', 'players_online': len(online),
+                          'online_players': online},
+                'information': {'api': {'version': 4}, 'status': {'http_code': 200}}}
+
+    def timeonline(self):
+        """Tabela timeonline com uma linha por membro (linhas do modelo reaproveitadas)."""
+        if self._timeonline is None:
+            linhas = []
+            for i, nome in enumerate(self.membros):
+                j = i % len(self._linhas)
+                linha = self._linhas[j]
+                original = self._reais[j]
+                if original and original != nome:
+                    linha = linha.replace(urllib.parse.quote_plus(original), urllib.parse.quote_plus(nome))
+                    linha = linha.replace(original, nome)
+                linhas.append(linha)
+            self._timeonline = self._cabecalho + '\n'.join(linhas) + self._rodape
+        return self._timeonline
+
+    def pagina_personagem(self, nome):
+        p = perfil(nome, self.world)
+        pagina = self.char_page.replace(urllib.parse.quote_plus(CHAR_MODELO), urllib.parse.quote_plus(nome))
+        pagina = pagina.replace(CHAR_MODELO, nome)
+        pagina = re.sub(
+            r'(<span class="text-gray-400">Vocation:</span>\s*<span class="text-white">)[^<]*',
+            lambda m: m.group(1) + p['vocation'], pagina)
+        pagina = re.sub(
+            r'(<span class="text-sm text-gray-400">Level</span>\s*<span class="text-white font-semibold">)\d+',
+            lambda m: m.group(1) + str(p['level']), pagina)
+        pagina = re.sub(
+            r'(<span class="text-gray-400">World:</span>\s*<span class="text-white">\s*<a href="guilds/)[^"]*("[^>]*>\s*)\w+',
+            lambda m: m.group(1) + self.world + m.group(2) + self.world, pagina)
+        return pagina
+
+    def aba_experiencia(self, nome):
+        linhas = ''.join(
+            f'<tr><td>{data}</td><td data-sort-value="{valor}">{valor:,}</td></tr>'
+            for data, valor in perfil(nome, self.world)['xp_diaria']
+        )
+        return f'<table class="w-full text-sm"><tbody>{linhas}</tbody></table>'
+
+    def guild_json(self, guild):
+        membros = []
+        for nome in self.membros:
+            p = perfil(nome, self.world)
+            membros.append({'name': nome, 'title': '', 'rank': 'Member', 'vocation': p['vocation'],
+                            'level': self.vida(nome)[0], 'joined': '2024-01-01', 'status': 'offline'})
+        return {'guild': {'name': guild, 'world': self.world, 'members': membros},
+                'information': {'api': {'version': 4}, 'status': {'http_code': 200}}}
+
+    def personagem_json(self, nome):
+        p = perfil(nome, self.world)
+        level, mortes_vivas = self.vida(nome)
+        mortes = sorted(mortes_vivas + p['mortes'], key=lambda m: m['time'], reverse=True)
+        return {
+            'character': {
+                'character': {'name': p['name'], 'vocation': p['vocation'], 'level': level,
+                              'world': p['world'], 'last_login': p['ultimo_login']},
+                'deaths': [{k: m[k] for k in ('time', 'level', 'reason', 'involved')} for m in mortes]
+            },
+            'information': {'api': {'version': 4}, 'status': {'http_code': 200}}
+        }
+
+# ============================================================
+# SERVIDOR
+# ============================================================
+class Comportamento:
+    """Latência, falhas, desafios anti-bot e limite de taxa configuráveis."""
+    def __init__(self, latencia_ms, jitter_ms, erro, desafio, limite, liberacao=0):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.erro = erro
+        self.desafio = desafio
+        self.limite = limite
+        self.liberacao = liberacao
+        self._lock = threading.Lock()
+        self._janela = collections.deque()
+        self.contagem = collections.Counter()
+
+    def excedeu_limite(self):
+        if not self.limite:
+            return False
+        with self._lock:
+            agora_ = time.monotonic()
+            while self._janela and agora_ - self._janela[0] > 1.0:
+                self._janela.popleft()
+            if len(self._janela) >= self.limite:
+                return True
+            self._janela.append(agora_)
+            return False
+
+    def liberado(self, cookies):
+        """Com --liberacao, o GuildStats só responde a quem traz um
+        cf_clearance do desafio ainda não expirado."""
+        if not self.liberacao:
+            return True
+        valor = re.search(r'(?:^|;)\s*cf_clearance=mock-(\d+)', cookies or '')
+        return bool(valor) and int(valor.group(1)) > time.time()
+
+    def esperar(self):
+        atraso = self.latencia_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if atraso > 0:
+            time.sleep(atraso / 1000)
+
+def html_unescape_nick(nick):
+    """Desfaz as codificações de nick que o scraper tenta (quote e &apos;/&amp;)."""
+    return html.unescape(nick.replace('+', ' '))
+
+def criar_handler(modelos, comportamento):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, formato, *args):
+            pass
+
+        def _responder(self, status, corpo, tipo='text/html; charset=utf-8', headers=None):
+            dados = corpo.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(dados)))
+            for chave, valor in (headers or {}).items():
+                self.send_header(chave, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+            comportamento.contagem[status] += 1
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            query = urllib.parse.parse_qs(url.query)
+            caminho = urllib.parse.unquote(url.path)
+            guildstats = not caminho.startswith('/v4/')
+
+            comportamento.esperar()
+            if comportamento.excedeu_limite():
+                return self._responder(429, 'Too Many Requests', 'text/plain', {'Retry-After': '1'})
+            if random.random() < comportamento.erro:
+                return self._responder(502, 'Bad Gateway', 'text/plain')
+            if guildstats and not comportamento.liberado(self.headers.get('Cookie')):
+                return self._responder(403, PAGINA_DESAFIO_JS.format(validade=comportamento.liberacao))
+            if guildstats and random.random() < comportamento.desafio:
+                return self._responder(403, PAGINA_DESAFIO)
+
+            if caminho == '/include/guild/tab.php':
+                tab = query.get('tab', [''])[0]
+                if tab == 'timeonline':
+                    return self._responder(200, modelos.timeonline())
+                if tab == 'members':
+                    return self._responder(200, modelos.tab_members)
+            elif caminho == '/include/character/tab.php' and query.get('tab') == ['experience']:
+                nome = html_unescape_nick(query.get('nick', [''])[0])
+                return self._responder(200, modelos.aba_experiencia(nome))
+            elif caminho.startswith('/character/'):
+                return self._responder(200, modelos.pagina_personagem(caminho[len('/character/'):]))
+            elif caminho.startswith('/v4/guild/'):
+                corpo = modelos.guild_json(caminho[len('/v4/guild/'):])
+                return self._responder(200, json.dumps(corpo), 'application/json')
+            elif caminho.startswith('/v4/world/'):
+                corpo = modelos.world_json(caminho[len('/v4/world/'):])
+                return self._responder(200, json.dumps(corpo), 'application/json')
+            elif caminho.startswith('/v4/character/'):
+                corpo = modelos.personagem_json(caminho[len('/v4/character/'):])
+                return self._responder(200, json.dumps(corpo), 'application/json')
+
+            return self._responder(404, 'Not Found', 'text/plain')
+
+    return Handler
+
+def gerar_extras(caminho, quantidade):
+    """Escreve um extras.json com N personagens sintéticos."""
+    extras = [{'nome': f"Mock Extra {i:04d}"} for i in range(quantidade)]
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'extras': extras}, f, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="GuildStats/TibiaData falsos para testes locais")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--membros', type=int, default=160, help="tamanho do roster da guild")
+    parser.add_argument('--world', default='Luminera')
+    parser.add_argument('--latencia', type=float, default=0, help="latência média (ms)")
+    parser.add_argument('--jitter', type=float, default=0, help="variação da latência (± ms)")
+    parser.add_argument('--erro', type=float, default=0, help="fração de respostas 502")
+    parser.add_argument('--desafio', type=float, default=0, help="fração de desafios Cloudflare (403) no GuildStats")
+    parser.add_argument('--liberacao', type=int, default=0, metavar='SEG',
+                        help="GuildStats exige o cf_clearance do desafio JS, válido por SEG segundos (0 = não exige)")
+    parser.add_argument('--limite', type=int, default=0, help="requisições/s antes de responder 429 (0 = sem limite)")
+    parser.add_argument('--sessao', type=float, default=0,
+                        help="segundos entre mudanças da lista de online (0 = mundo parado, ninguém online)")
+    parser.add_argument('--gerar-extras', metavar='ARQ', help="escreve um extras.json sintético e sai")
+    parser.add_argument('--extras', type=int, default=300, help="quantidade para --gerar-extras")
+    args = parser.parse_args()
+
+    if args.gerar_extras:
+        gerar_extras(args.gerar_extras, args.extras)
+        print(f"✅ {args.extras} extras sintéticos em {args.gerar_extras}")
+        return
+
+    modelos = Modelos(args.membros, args.world, args.sessao)
+    comportamento = Comportamento(args.latencia, args.jitter, args.erro, args.desafio, args.limite, args.liberacao)
+    servidor = ThreadingHTTPServer(('127.0.0.1', args.porta), criar_handler(modelos, comportamento))
+
+    base = f"http://127.0.0.1:{args.porta}"
+    print(f"🧪 Servidor mock em {base} ({args.membros} membros, {args.world})")
+    print(f"   GUILDSTATS_BASE_URL={base} TIBIADATA_BASE_URL={base} python scraper/executar.py")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(f"Respostas por status: {dict(comportamento.contagem)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+
+# Os scripts importam os módulos irmãos de scraper/ diretamente
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper'))
+
+import causas
+
+
+class AnalisarTest(unittest.TestCase):
+    def test_outros_verbos(self):
+        for verbo in ('Annihilated', 'Eliminated', 'Slain', 'Crushed'):
+            with self.subTest(verbo=verbo):
+                self.assertEqual(
+                    causas.analisar(f"{verbo} at Level 500 by Bob and Tim.", is_pk=True),
+                    [{'name': 'Bob', 'player': True, 'assist': False},
+                     {'name': 'Tim', 'player': True, 'assist': False}])
+
+    def test_assistencia_com_outro_verbo(self):
+        involved = [{'name': 'Bob', 'player': True}, {'name': 'Zed', 'player': True}]
+        self.assertEqual(
+            causas.analisar("Eliminated at Level 400 by Bob. Assisted by Zed.", involved),
+            [{'name': 'Bob', 'player': True, 'assist': False},
+             {'name': 'Zed', 'player': True, 'assist': True}])
+
+    def test_invocador_separado(self):
+        involved = [{'name': 'Bob', 'player': True}, {'name': 'Tim', 'player': True}]
+        self.assertEqual(
+            causas.analisar("Killed at Level 500 by a fire elemental (summoned by Bob) and Tim.", involved),
+            [{'name': 'a fire elemental', 'player': False, 'assist': False, 'summoner': 'Bob'},
+             {'name': 'Tim', 'player': True, 'assist': False}])
+
+    def test_invocacoes_contam_pela_criatura(self):
+        historico = [
+            {'character': 'Ana', 'time': '2026-10-01T10:00:00Z',
+             'reason': "Killed at Level 300 by a fire elemental (summoned by Bob).", 'is_pk': False},
+            {'character': 'Ana', 'time': '2026-10-02T10:00:00Z',
+             'reason': "Died at Level 301 by a fire elemental.", 'is_pk': False},
+        ]
+        causas.completar(historico)
+        dias = causas.reconstruir(historico)
+        criaturas = {}
+        for contagem in dias.values():
+            for nome, n in contagem['criaturas'].items():
+                criaturas[nome] = criaturas.get(nome, 0) + n
+        self.assertEqual(criaturas, {'fire elemental': 2})
+
+    def test_completar_refaz_mortes_antigas(self):
+        historico = [
+            {'reason': "Annihilated at Level 500 by Bob.", 'is_pk': True, 'killers': []},
+            {'reason': "Killed at Level 500 by a demon (summoned by Bob).", 'is_pk': False,
+             'killers': [{'name': 'a demon (summoned by Bob)', 'player': False, 'assist': False}]},
+        ]
+        causas.completar(historico)
+        self.assertEqual(historico[0]['killers'], [{'name': 'Bob', 'player': True, 'assist': False}])
+        self.assertEqual(historico[1]['killers'],
+                         [{'name': 'a demon', 'player': False, 'assist': False, 'summoner': 'Bob'}])
+
+
+if __name__ == '__main__':
+    unittest.main()